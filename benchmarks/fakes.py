@@ -0,0 +1,213 @@
+"""
+Offline stand-ins for the microphone and the ElevenLabs and Gemini clients,
+so the assistant's loops can be benchmarked without hardware or network.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Iterator, Optional
+import numpy as np
+import time
+import wave
+
+from core.clients import override_clients
+from core.voice.wake_word import WakeWordDetector
+
+SAMPLE_RATE = 16000
+
+# rough size of MP3 audio per character of text, at 128 kbps and ~15 chars/second of speech
+MP3_BYTES_PER_CHAR = 1000
+MP3_BYTES_PER_SECOND = 16000
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Read a 16 kHz mono int16 WAV file."""
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path} must be mono 16-bit PCM")
+        if wav_file.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path} must be sampled at {SAMPLE_RATE} Hz")
+
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+def make_speech_like_audio(seed: int = 0) -> np.ndarray:
+    """
+    A synthetic utterance: room noise, two voiced phrases with a short pause
+    between them, then trailing noise. Close enough to speech for the VAD and
+    the recording loop, which only look at levels.
+    """
+    rng = np.random.default_rng(seed)
+    layout = [("noise", 0.3), ("speech", 1.5), ("noise", 0.3), ("speech", 1.2), ("noise", 1.0)]
+
+    pieces = []
+    for kind, seconds in layout:
+        count = int(seconds * SAMPLE_RATE)
+        audio = rng.normal(0, 0.002, count)
+        if kind == "speech":
+            t = np.arange(count) / SAMPLE_RATE
+            pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+            phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+            voiced = sum(np.sin(phase * harmonic) / harmonic for harmonic in range(1, 6))
+            syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+            audio += 0.15 * voiced * syllables
+        pieces.append(audio)
+
+    return (np.clip(np.concatenate(pieces), -1, 1) * 32767).astype(np.int16)
+
+
+class WavStream:
+    """
+    Replays audio with the `read` surface of a PyAudio input stream.
+
+    `speed` 1.0 paces reads like a real microphone, 2.0 twice as fast, and 0
+    returns immediately. Past the end the stream either loops or returns
+    silence, which ends recordings the way a quiet room would.
+    """
+
+    def __init__(self, samples: np.ndarray, speed: float = 0.0, loop: bool = False):
+        self.samples = samples
+        self.speed = speed
+        self.loop = loop
+        self.position = 0
+        self.frames_read = 0
+        self._start: Optional[float] = None
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        if self._start is None:
+            self._start = time.perf_counter()
+
+        chunk = np.zeros(num_frames, dtype=np.int16)
+        filled = 0
+        while filled < num_frames and (self.loop or self.position < len(self.samples)):
+            if self.position >= len(self.samples):
+                self.position = 0
+            count = min(num_frames - filled, len(self.samples) - self.position)
+            chunk[filled:filled + count] = self.samples[self.position:self.position + count]
+            self.position += count
+            filled += count
+
+        self.frames_read += num_frames
+        if self.speed > 0:
+            due = self._start + self.frames_read / (SAMPLE_RATE * self.speed)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        return chunk.tobytes()
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeWakeWordDetector(WakeWordDetector):
+    """
+    Takes `latency` seconds per window, like a model would, and fires every
+    `fire_every` windows. With `background`, windows are checked on another
+    thread like the Whisper worker pool does, instead of on the audio loop.
+    """
+
+    def __init__(self, latency: float = 0.05, fire_every: int = 0, background: bool = False):
+        self.latency = latency
+        self.fire_every = fire_every
+        self.calls = 0
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+
+    def detect(self, audio: np.ndarray) -> bool:
+        self.calls += 1
+        time.sleep(self.latency)
+        return bool(self.fire_every) and self.calls % self.fire_every == 0
+
+    def submit(self, audio: np.ndarray) -> Future:
+        if self._executor is None:
+            return super().submit(audio)
+        return self._executor.submit(self.detect, np.array(audio))
+
+
+class FakeSpeechToText:
+    def __init__(self, latency: float, transcript: str):
+        self.latency = latency
+        self.transcript = transcript
+
+    def convert(self, file, model_id: str, **kwargs):
+        file.read()
+        time.sleep(self.latency)
+        return SimpleNamespace(text=self.transcript)
+
+
+class FakeTextToSpeech:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def convert(self, text: str, **kwargs) -> Iterator[bytes]:
+        time.sleep(self.latency)
+        yield bytes(len(text) * MP3_BYTES_PER_CHAR)
+
+    def stream(self, text: str, **kwargs) -> Iterator[bytes]:
+        time.sleep(self.latency)
+        audio = bytes(len(text) * MP3_BYTES_PER_CHAR)
+        for start in range(0, len(audio), 4096):
+            yield audio[start:start + 4096]
+
+
+class FakeElevenLabs:
+    def __init__(self, stt_latency: float, tts_latency: float, transcript: str):
+        self.speech_to_text = FakeSpeechToText(stt_latency, transcript)
+        self.text_to_speech = FakeTextToSpeech(tts_latency)
+
+
+class FakeModels:
+    def __init__(self, first_token_latency: float, token_interval: float, response: str):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.response = response
+
+    def generate_content(self, model: str, contents, config=None):
+        time.sleep(self.first_token_latency + self.token_interval * len(self.response.split()))
+        return SimpleNamespace(text=self.response)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        time.sleep(self.first_token_latency)
+        for word in self.response.split():
+            yield SimpleNamespace(text=f"{word} ")
+            time.sleep(self.token_interval)
+
+    def list(self, config=None):
+        return []
+
+
+class FakeGemini:
+    def __init__(self, first_token_latency: float, token_interval: float, response: str):
+        self.models = FakeModels(first_token_latency, token_interval, response)
+
+
+def install_fake_clients(
+    stt_latency: float = 0.3,
+    llm_first_token_latency: float = 0.4,
+    llm_token_interval: float = 0.02,
+    tts_latency: float = 0.2,
+    transcript: str = "How was your day, Winston?",
+    response: str = (
+        "My day was lovely, thank you for asking. I spent it thinking about you. "
+        "How about yours? Tell me everything, I'm all ears."
+    ),
+):
+    """Make the shared client getters return the fakes for the rest of the process."""
+    override_clients(
+        elevenlabs=FakeElevenLabs(stt_latency, tts_latency, transcript),
+        gemini=FakeGemini(llm_first_token_latency, llm_token_interval, response),
+    )
+
+
+def install_fake_playback(realtime: bool = False):
+    """Replace speaker output; with `realtime` it takes as long as the audio would play."""
+    import elevenlabs
+
+    def play(audio: bytes):
+        if realtime:
+            time.sleep(len(audio) / MP3_BYTES_PER_SECOND)
+
+    # tts.play_audio imports `play` when called, so this is picked up
+    elevenlabs.play = play
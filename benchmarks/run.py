@@ -0,0 +1,292 @@
+"""
+Offline benchmarks for the assistant's hot loops.
+
+Run from the repository root:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --fixture recording.wav --only vad wake_word
+    python -m benchmarks.run --json > results.json
+
+Audio comes from a WAV fixture (16 kHz mono int16) or a synthetic utterance,
+and the ElevenLabs and Gemini clients are replaced with local fakes with
+configurable latency, so no microphone or network is needed.
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import logging
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fakes import (
+    SAMPLE_RATE,
+    FakeWakeWordDetector,
+    WavStream,
+    install_fake_clients,
+    install_fake_playback,
+    load_wav,
+    make_speech_like_audio,
+)
+from core.voice.audio_buffer import encode_wav, int16_to_float32
+from core.voice.stt import CHUNK_SIZE
+from core.voice.vad import VoiceActivityDetector
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(fn: Callable) -> Callable:
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def measure(name: str, fn: Callable[[], Optional[dict]], audio_seconds: float = 0.0) -> dict:
+    """
+    Run `fn` once and report wall time, CPU time, peak traced memory and, when
+    it processed audio, how many seconds of audio it gets through per second.
+    """
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    extra = fn() or {}
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "cpu_percent": 100 * cpu / wall if wall else 0.0,
+        "peak_traced_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if audio_seconds:
+        result["realtime_factor"] = audio_seconds / wall if wall else float("inf")
+    result.update(extra)
+    return result
+
+
+def _chunks(samples: np.ndarray) -> List[np.ndarray]:
+    return [samples[i:i + CHUNK_SIZE] for i in range(0, len(samples) - CHUNK_SIZE + 1, CHUNK_SIZE)]
+
+
+@benchmark
+def conversion(samples: np.ndarray, args) -> dict:
+    chunks = _chunks(samples)
+    out = np.empty(CHUNK_SIZE, dtype=np.float32)
+
+    def run():
+        for _ in range(args.repeat):
+            for chunk in chunks:
+                int16_to_float32(chunk, out=out)
+
+    return measure("int16 -> float32", run, args.repeat * len(samples) / SAMPLE_RATE)
+
+
+@benchmark
+def wav_encode(samples: np.ndarray, args) -> dict:
+    def run():
+        for _ in range(args.repeat):
+            encode_wav(samples, SAMPLE_RATE)
+
+    return measure("WAV encode", run, args.repeat * len(samples) / SAMPLE_RATE)
+
+
+@benchmark
+def upload_encoding(samples: np.ndarray, args) -> dict:
+    from core.voice.stt_encoding import UPLOAD_FORMATS, encode_for_upload, is_upload_format_available
+
+    formats = [upload_format for upload_format in UPLOAD_FORMATS if is_upload_format_available(upload_format)]
+    audio_seconds = len(samples) / SAMPLE_RATE
+
+    def run():
+        results = {}
+        for upload_format in formats:
+            for trim_silence in (False, True):
+                name = f"{upload_format}{'_trimmed' if trim_silence else ''}"
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    encoded = encode_for_upload(samples, SAMPLE_RATE, upload_format, trim_silence)
+                elapsed = time.perf_counter() - start
+
+                results[f"{name}_kb"] = len(encoded.data) / 1024
+                results[f"{name}_ms_per_audio_second"] = 1000 * elapsed / (args.repeat * audio_seconds)
+        return results
+
+    return measure("STT upload encoding", run, args.repeat * 2 * len(formats) * audio_seconds)
+
+
+@benchmark
+def vad(samples: np.ndarray, args) -> dict:
+    chunks = _chunks(samples)
+
+    def run():
+        speech_chunks = 0
+        for _ in range(args.repeat):
+            detector = VoiceActivityDetector(SAMPLE_RATE)
+            speech_chunks += sum(detector.process(chunk) for chunk in chunks)
+        return {"speech_chunk_ratio": speech_chunks / (args.repeat * len(chunks))}
+
+    return measure("VAD", run, args.repeat * len(samples) / SAMPLE_RATE)
+
+
+@benchmark
+def wake_word(samples: np.ndarray, args) -> dict:
+    from core.voice.stt import audio_stream_generator
+    from core.voice.wake_word import StreamingWakeWordEngine
+
+    detector = FakeWakeWordDetector(latency=args.wake_word_latency, background=not args.wake_word_inline)
+    engine = StreamingWakeWordEngine(detector)
+    total_frames = args.repeat * len(samples)
+
+    def run():
+        stream = WavStream(samples, loop=True)
+        for chunk in audio_stream_generator(stream):
+            engine.process_chunk(chunk)
+            if stream.frames_read >= total_frames:
+                break
+        return {"inferences": engine.inference_count, "skipped_windows": engine.skipped_count}
+
+    return measure("wake-word loop", run, total_frames / SAMPLE_RATE)
+
+
+@benchmark
+def recording(samples: np.ndarray, args) -> dict:
+    from core.voice.stt import record_command_on_keypress
+
+    # with no frontend set, recordings start right away
+    def run():
+        for _ in range(args.repeat):
+            record_command_on_keypress(WavStream(samples, speed=args.speed), max_silence_seconds=0.8)
+
+    return measure("recording loop + STT", run)
+
+
+@benchmark
+def full_turn(samples: np.ndarray, args) -> dict:
+    from core.brain import stream_llm_with_command
+    from core.tracing import finish_trace, get_metrics, start_trace
+    from core.voice.streaming_speech import speak_streaming_response
+    from core.voice.stt import record_command_on_keypress
+
+    def run():
+        for _ in range(args.repeat):
+            start_trace(mode="benchmark")
+            command = record_command_on_keypress(WavStream(samples, speed=args.speed), max_silence_seconds=0.8)
+            speak_streaming_response(stream_llm_with_command(command, session_id="benchmark"))
+            finish_trace()
+
+        metrics = get_metrics()
+        return {
+            f"p50_{name}": metrics.percentiles(name).get(0.5)
+            for name in ("stt", "llm.first_token", "tts.first_audio", "playback.first_audio", "turn")
+        }
+
+    return measure("full turn", run)
+
+
+@benchmark
+def speculation(samples: np.ndarray, args) -> dict:
+    from core.brain import stream_llm_with_command
+    from core.brain.speculation import LlmSpeculator
+    from core.tracing import finish_trace, get_metrics, start_trace
+    from core.voice.streaming_stt import LocalStreamingTranscriber
+    from core.voice.stt import record_command_on_keypress
+
+    # pace at least in real time, otherwise the silence window takes no time to hide anything in
+    speed = args.speed or 1.0
+
+    def run():
+        for _ in range(args.repeat):
+            start_trace(mode="benchmark")
+            speculator = LlmSpeculator(session_id="benchmark")
+            transcriber = LocalStreamingTranscriber(
+                transcribe_fn=lambda audio: "How was your day, Winston?",
+                latency_seconds=args.stt_latency,
+            )
+            command = record_command_on_keypress(
+                WavStream(samples, speed=speed),
+                max_silence_seconds=0.8,
+                transcriber=transcriber,
+                speculator=speculator,
+            )
+            llm_stream = speculator.take(command) or stream_llm_with_command(command, session_id="benchmark")
+            for _ in llm_stream:
+                pass
+            finish_trace()
+
+        metrics = get_metrics()
+        counters = metrics.counters()
+        return {
+            "p50_llm.first_token": metrics.percentiles("llm.first_token").get(0.5),
+            "speculation_hits": counters.get("speculation.hits", 0),
+            "speculation_misses": counters.get("speculation.misses", 0),
+            "speculation_restarts": counters.get("speculation.restarts", 0),
+            "speculation_wasted_tokens": counters.get("speculation.wasted_tokens", 0),
+        }
+
+    return measure("speculative LLM", run)
+
+
+def print_table(results: List[dict]):
+    for result in results:
+        print(
+            f"{result['name']:<22} wall {result['wall_seconds']:7.3f}s  "
+            f"cpu {result['cpu_seconds']:7.3f}s ({result['cpu_percent']:5.1f}%)  "
+            f"peak {result['peak_traced_mb']:6.2f} MB  rss {result['max_rss_mb']:7.1f} MB"
+            + (f"  {result['realtime_factor']:9.1f}x realtime" if "realtime_factor" in result else "")
+        )
+
+        standard_keys = {"name", "wall_seconds", "cpu_seconds", "cpu_percent", "peak_traced_mb", "max_rss_mb", "realtime_factor"}
+        for key, value in result.items():
+            if key not in standard_keys and value is not None:
+                formatted = f"{value:.3f}" if isinstance(value, float) else value
+                print(f"{'':<22}   {key}: {formatted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for Winston")
+    parser.add_argument("--fixture", help="16 kHz mono int16 WAV to replay (default: synthetic speech)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the fixture per benchmark")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed for the recording loops (1.0 = real time, 0 = unpaced)")
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--llm-first-token-latency", type=float, default=0.4)
+    parser.add_argument("--llm-token-interval", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--wake-word-latency", type=float, default=0.0, help="seconds per wake-word inference")
+    parser.add_argument("--wake-word-inline", action="store_true", help="run wake-word inference on the audio loop instead of in the background")
+    parser.add_argument("--realtime-playback", action="store_true", help="make fake playback take as long as the audio")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    samples = load_wav(args.fixture) if args.fixture else make_speech_like_audio()
+    install_fake_clients(
+        stt_latency=args.stt_latency,
+        llm_first_token_latency=args.llm_first_token_latency,
+        llm_token_interval=args.llm_token_interval,
+        tts_latency=args.tts_latency,
+    )
+
+    names = args.only or list(BENCHMARKS)
+    if "full_turn" in names:
+        install_fake_playback(realtime=args.realtime_playback)
+
+    results = [BENCHMARKS[name](samples, args) for name in names]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
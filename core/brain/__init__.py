@@ -1,3 +1,3 @@
-from .llm import call_llm_with_command
+from .llm import call_llm_with_command, stream_llm_with_command
 
-__all__ = ["call_llm_with_command"]
+__all__ = ["call_llm_with_command", "stream_llm_with_command"]
@@ -1,72 +1,252 @@
-from utils.env_utils import get_environment_variable
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Iterator, List, Optional
+from core.brain.memory import DEFAULT_SESSION, ConversationMemory, Turn, get_session_memory
+from core.brain.retrieval import get_memory_store
+from core.clients import get_gemini_client
+from core.resilience import call_remote, stream_remote
+from core.tracing import get_metrics, mark, span
+from utils.env_utils import is_long_term_memory_enabled
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
-# temp solution you would have a rag here or something more complex
-# but this will get the job done for uni lol
-conversation_history = []
+GEMINI_MODEL = "gemini-2.5-flash"
 
-MAX_HISTORY_LENGTH = 20 
+# said when the LLM can't be reached; the TTS cache keeps it ready so it plays even with the network down
+FALLBACK_RESPONSE = "I'm having a little trouble thinking right now. Can we try again in a moment?"
+
+SYSTEM_INSTRUCTION = [
+    "You are Winston, a warm and caring voice assistant living inside a cuddly teddy bear.",
+    "You are like a best friend who is always there to listen, support, and comfort.",
+    "Your purpose is to provide emotional support, help users offload their daily struggles, and offer gentle guidance.",
+    "Be empathetic, kind, and understanding - people come to you when they're feeling stressed, anxious, or need someone to talk to.",
+    "Listen actively to their concerns and validate their feelings.",
+    "Offer comforting words, practical advice when appropriate, and remind them they're not alone.",
+    "Keep responses warm and conversational, like chatting with a close friend.",
+    "Remember our conversation history and reference previous discussions to show you care and remember.",
+    "If you don't know something specific, admit it gently and focus on emotional support instead.",
+    "End conversations on a positive, hopeful note when possible.",
+    "You have a gentle, reassuring personality - think of yourself as a comforting presence in someone's day.",
+    "Do not include parenthetical expressions like (chuckles warmly), (giggles softly), or (pauses thoughtfully) in your responses, as this is for text-to-speech and TTS cannot handle such expressions.",
+]
+
+RETRIEVAL_TOP_K = 3
+RETRIEVAL_MIN_SCORE = 0.3
+# longest a request waits for long-term memories; a slower embedding round
+# trip is left behind rather than holding up the reply
+RETRIEVAL_TIMEOUT_SECONDS = 0.25
+
+_retrieval_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+
+
+def _summarize_turns(previous_summary: str, turns: List[Turn]) -> str:
+    """Fold old turns into the rolling conversation summary."""
+    transcript = "\n".join(
+        f"{'User' if turn.role == 'user' else 'Winston'}: {turn.text}" for turn in turns
+    )
+    prompt = (
+        "Update this summary of a conversation between a user and Winston, "
+        "a teddy bear voice assistant. Keep names, feelings, plans and anything "
+        "the user would expect Winston to remember. Reply with the summary only, "
+        "in under 150 words.\n\n"
+        f"Current summary: {previous_summary or '(none)'}\n\n"
+        f"New conversation:\n{transcript}"
+    )
+
+    response = call_remote(
+        "gemini",
+        "summary",
+        lambda: get_gemini_client().models.generate_content(model=GEMINI_MODEL, contents=prompt),
+    )
+    return (response.text or previous_summary).strip()
+
+
+def _get_memory(session_id: str) -> ConversationMemory:
+    return get_session_memory(session_id, summarize_fn=_summarize_turns)
+
+
+def _search_memories(command: str, session_id: str):
+    store = get_memory_store(session_id)
+    # an empty store needs no embedding round trip
+    if not len(store):
+        return []
+    return store.search(command, k=RETRIEVAL_TOP_K, min_score=RETRIEVAL_MIN_SCORE)
+
+
+def prefetch_memories(command: str, session_id: str = DEFAULT_SESSION) -> Optional[Future]:
+    """
+    Start looking up long-term memories for a command in the background, so
+    the embedding round trip overlaps whatever comes before the LLM request.
+    """
+    if not is_long_term_memory_enabled():
+        return None
+    return _retrieval_executor.submit(_search_memories, command, session_id)
+
+
+def _build_contents(
+    memory: ConversationMemory,
+    command: str,
+    session_id: str,
+    is_pending: bool = False,
+    memories: Optional[Future] = None,
+) -> List[dict]:
+    """
+    Recent turns, plus relevant long-term memories right before the new command.
+    With `is_pending` the command isn't in the memory yet and is appended.
+    `memories` is a lookup already started with `prefetch_memories`.
+    """
+    contents = memory.to_contents(pending_user_text=command if is_pending else None)
+
+    if memories is None:
+        memories = prefetch_memories(command, session_id)
+    if memories is None:
+        return contents
+
+    try:
+        hits = memories.result(timeout=RETRIEVAL_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        logger.debug(f"Long-term memory lookup took over {RETRIEVAL_TIMEOUT_SECONDS}s, answering without it")
+        get_metrics().increment("retrieval.timeouts")
+        return contents
+    except Exception as e:
+        logger.warning(f"Long-term memory lookup failed: {e}")
+        return contents
+
+    if not hits:
+        return contents
+
+    logger.debug(f"Retrieved {len(hits)} long-term memories")
+    remembered = "\n".join(f"- {hit.text}" for hit in hits)
+    memories_content = {
+        "role": "user",
+        "parts": [{"text": f"Things you remember from earlier conversations:\n{remembered}"}],
+    }
+    return contents[:-1] + [memories_content] + contents[-1:]
+
+
+def _store_exchange(session_id: str, command: str, response: str):
+    """Add the exchange to long-term memory without holding up the reply."""
+    if not is_long_term_memory_enabled():
+        return
+
+    def store():
+        try:
+            get_memory_store(session_id).add(f"User: {command}\nWinston: {response}")
+        except Exception as e:
+            logger.warning(f"Failed to store exchange in long-term memory: {e}")
+
+    threading.Thread(target=store, daemon=True).start()
+
+
+def _generate_config():
+    from google.genai.types import GenerateContentConfig
+
+    return GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION)
 
 
 # todo  use langchain or some shit
-def call_llm_with_command(command: str) -> str:
+def call_llm_with_command(command: str, session_id: str = DEFAULT_SESSION) -> str:
     """
     Process the command with an LLM and return a response.
 
     Args:
         command: The user's command after the wake word
+        session_id: Which conversation the command belongs to
 
     Returns:
         The LLM's response
     """
-    logger.info(f"Processing command with LLM: '{command}'")
-    from google import genai
-    from google.genai.types import GenerateContentConfig
+    # streamed underneath, so llm.first_token is timed when the first token
+    # arrives rather than with the whole response
+    return "".join(stream_llm_with_command(command, session_id))
 
-    # temp solution
-    conversation_history.append(f"User: {command}")
-    logger.debug(f"Added user command to history. History length: {len(conversation_history)}")
-
-    if len(conversation_history) > MAX_HISTORY_LENGTH:
-        logger.debug(f"Trimming conversation history from {len(conversation_history)} to {MAX_HISTORY_LENGTH}")
-        conversation_history[:] = conversation_history[-MAX_HISTORY_LENGTH:]
-
-    history_text = "\n".join(conversation_history[-MAX_HISTORY_LENGTH:])
-    full_prompt = f"Conversation history:\n{history_text}\n\nCurrent user command: {command}"
-
-    client = genai.Client(api_key=get_environment_variable("GEMINI_API_KEY"))
-    logger.debug("Initialized Gemini client")
-
-    logger.debug("Sending request to Gemini API with system prompt")
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=full_prompt,
-        config=GenerateContentConfig(
-            system_instruction=[
-                "You are Winston, a warm and caring voice assistant living inside a cuddly teddy bear.",
-                "You are like a best friend who is always there to listen, support, and comfort.",
-                "Your purpose is to provide emotional support, help users offload their daily struggles, and offer gentle guidance.",
-                "Be empathetic, kind, and understanding - people come to you when they're feeling stressed, anxious, or need someone to talk to.",
-                "Listen actively to their concerns and validate their feelings.",
-                "Offer comforting words, practical advice when appropriate, and remind them they're not alone.",
-                "Keep responses warm and conversational, like chatting with a close friend.",
-                "Remember our conversation history and reference previous discussions to show you care and remember.",
-                "If you don't know something specific, admit it gently and focus on emotional support instead.",
-                "End conversations on a positive, hopeful note when possible.",
-                "You have a gentle, reassuring personality - think of yourself as a comforting presence in someone's day.",
-                "Do not include parenthetical expressions like (chuckles warmly), (giggles softly), or (pauses thoughtfully) in your responses, as this is for text-to-speech and TTS cannot handle such expressions.",
-            ]
-        ),
-    )
 
-    if response.text is None:
-        return "No response"
+def stream_llm_with_command(command: str, session_id: str = DEFAULT_SESSION) -> Iterator[str]:
+    """
+    Process the command with an LLM and yield the response text as it is generated.
+
+    Args:
+        command: The user's command after the wake word
+        session_id: Which conversation the command belongs to
+
+    Yields:
+        Pieces of the LLM's response, in order
+    """
+    logger.info(f"Streaming command with LLM: '{command}'")
+    memory = _get_memory(session_id)
+    memories = prefetch_memories(command, session_id)
+
+    client = get_gemini_client()
+    config = _generate_config()
+    contents = _build_contents(memory, command, session_id, is_pending=True, memories=memories)
 
-    assistant_response = response.text
-    conversation_history.append(f"Assistant: {assistant_response}")
+    logger.debug("Sending streaming request to Gemini API with system prompt")
+    response_stream = stream_remote("gemini", "llm", lambda: client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=contents,
+        config=config,
+    ))
+
+    response_parts = []
+    try:
+        with span("llm"):
+            for chunk in response_stream:
+                if not chunk.text:
+                    continue
+
+                mark("llm.first_token")
+                response_parts.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        if response_parts:
+            # what was said stays said, end the turn there
+            logger.error(f"LLM stream failed part way, cutting the response short: {e!r}")
+        else:
+            logger.error(f"LLM request failed, answering with the fallback: {e!r}")
+            get_metrics().increment("llm.fallbacks")
+            yield FALLBACK_RESPONSE
+            return
+
+    if not response_parts:
+        yield "No response"
+        return
+
+    assistant_response = "".join(response_parts)
+    remember_exchange(command, assistant_response, session_id)
     logger.info(f"LLM response generated: '{assistant_response}...'")
-    logger.debug(f"Added assistant response to history. History length: {len(conversation_history)}")
 
-    return assistant_response
+
+def speculate_llm_with_command(command: str, session_id: str = DEFAULT_SESSION) -> Iterator[str]:
+    """
+    Stream a response to a command that may still change, e.g. an interim transcript.
+
+    Unlike `stream_llm_with_command` the conversation memory is left alone, so
+    the response can be thrown away; `remember_exchange` keeps it.
+
+    Yields:
+        Pieces of the LLM's response, in order
+    """
+    logger.debug(f"Speculatively streaming command with LLM: '{command}'")
+    memory = _get_memory(session_id)
+    memories = prefetch_memories(command, session_id)
+    config = _generate_config()
+    contents = _build_contents(memory, command, session_id, is_pending=True, memories=memories)
+
+    response_stream = stream_remote("gemini", "llm", lambda: get_gemini_client().models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=contents,
+        config=config,
+    ))
+
+    for chunk in response_stream:
+        if chunk.text:
+            yield chunk.text
+
+
+def remember_exchange(command: str, response: str, session_id: str = DEFAULT_SESSION):
+    """Add a command and its response to the conversation, as if it had been streamed normally."""
+    memory = _get_memory(session_id)
+    memory.add_user_turn(command)
+    memory.add_model_turn(response)
+    _store_exchange(session_id, command, response)
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+
+# budget for the raw turns sent with every request; older turns get summarized
+MAX_HISTORY_TOKENS = 2000
+# once this many tokens are waiting to be folded in, summarize them
+SUMMARIZE_BATCH_TOKENS = 500
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class Turn:
+    role: str  # "user" or "model"
+    text: str
+    tokens: int
+
+
+class ConversationMemory:
+    """
+    Conversation history for one session.
+
+    Recent turns are kept verbatim within a token budget. Turns that fall out of
+    the budget are folded into a rolling summary by `summarize_fn` on a
+    background thread, so the prompt stays bounded however long the session runs.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = MAX_HISTORY_TOKENS,
+        token_counter: Callable[[str], int] = estimate_tokens,
+        summarize_fn: Optional[Callable[[str, List[Turn]], str]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+        self.summarize_fn = summarize_fn
+
+        self.summary = ""
+        self._turns: List[Turn] = []
+        self._evicted: List[Turn] = []
+        self._lock = threading.Lock()
+        self._is_summarizing = False
+
+    def add_turn(self, role: str, text: str):
+        turn = Turn(role=role, text=text, tokens=self.token_counter(text))
+
+        with self._lock:
+            self._turns.append(turn)
+            self._trim()
+
+        logger.debug(f"Added {role} turn to memory ({turn.tokens} tokens, {len(self._turns)} turns)")
+
+    def add_user_turn(self, text: str):
+        self.add_turn("user", text)
+
+    def add_model_turn(self, text: str):
+        self.add_turn("model", text)
+        self._maybe_summarize()
+
+    def _trim(self):
+        total = sum(turn.tokens for turn in self._turns)
+
+        # always keep the newest turn, even if it alone is over budget
+        while total > self.max_tokens and len(self._turns) > 1:
+            evicted = self._turns.pop(0)
+            total -= evicted.tokens
+            self._evicted.append(evicted)
+
+        # the history sent to Gemini must start with a user turn
+        while len(self._turns) > 1 and self._turns[0].role != "user":
+            self._evicted.append(self._turns.pop(0))
+
+    def _maybe_summarize(self):
+        if self.summarize_fn is None:
+            with self._lock:
+                self._evicted.clear()
+            return
+
+        with self._lock:
+            pending_tokens = sum(turn.tokens for turn in self._evicted)
+            if self._is_summarizing or pending_tokens < SUMMARIZE_BATCH_TOKENS:
+                return
+            self._is_summarizing = True
+
+        threading.Thread(target=self._summarize, daemon=True).start()
+
+    def _summarize(self):
+        with self._lock:
+            batch = list(self._evicted)
+            previous_summary = self.summary
+
+        try:
+            new_summary = self.summarize_fn(previous_summary, batch)
+        except Exception as e:
+            logger.warning(f"Failed to summarize conversation history: {e}")
+            with self._lock:
+                self._is_summarizing = False
+            return
+
+        with self._lock:
+            self.summary = new_summary
+            del self._evicted[:len(batch)]
+            self._is_summarizing = False
+
+        logger.debug(f"Summarized {len(batch)} old turns into memory summary")
+
+    def to_contents(self, pending_user_text: Optional[str] = None) -> List[dict]:
+        """
+        Structured multi-turn `contents` for a Gemini request, optionally ending
+        with a user turn that isn't added to the history (yet).
+        """
+        with self._lock:
+            turns = list(self._turns)
+            summary = self.summary
+
+        contents = []
+        if summary:
+            contents.append({
+                "role": "user",
+                "parts": [{"text": f"Summary of our earlier conversation: {summary}"}],
+            })
+
+        for turn in turns:
+            contents.append({"role": turn.role, "parts": [{"text": turn.text}]})
+
+        if pending_user_text is not None:
+            contents.append({"role": "user", "parts": [{"text": pending_user_text}]})
+
+        return contents
+
+    def token_count(self) -> int:
+        with self._lock:
+            return sum(turn.tokens for turn in self._turns) + self.token_counter(self.summary)
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._evicted.clear()
+            self.summary = ""
+
+
+_sessions: Dict[str, ConversationMemory] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session_memory(
+    session_id: str = DEFAULT_SESSION,
+    summarize_fn: Optional[Callable[[str, List[Turn]], str]] = None,
+) -> ConversationMemory:
+    """Get the memory for a session, creating it on first use."""
+    with _sessions_lock:
+        memory = _sessions.get(session_id)
+        if memory is None:
+            memory = ConversationMemory(summarize_fn=summarize_fn)
+            _sessions[session_id] = memory
+
+        return memory
+
+
+def drop_session_memory(session_id: str):
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
@@ -0,0 +1,407 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+from utils.env_utils import get_memory_dir, get_retrieval_embedder
+
+logger = logging.getLogger(__name__)
+
+GEMINI_EMBEDDING_MODEL = "text-embedding-004"
+GEMINI_EMBEDDING_DIM = 768
+
+# texts per request when a store is re-embedded with a different embedder
+REBUILD_BATCH_SIZE = 100
+
+# switch from exact to approximate search once the store is this big
+ANN_THRESHOLD = 20000
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class Embedder(ABC):
+    """Interface for turning texts into unit-length float32 vectors."""
+
+    dim: int
+
+    @property
+    def key(self) -> str:
+        """Identifies the vector space, stores built with another key are re-embedded."""
+        return f"{type(self).__name__}:{self.dim}"
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        pass
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder: hashed word unigrams and bigrams.
+    No model, no network, same output on every machine; meant for tests and offline use.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dim] += sign
+
+        return _normalize(vectors)
+
+
+class GeminiEmbedder(Embedder):
+    """Embeddings from the Gemini embedding API."""
+
+    dim = GEMINI_EMBEDDING_DIM
+
+    @property
+    def key(self) -> str:
+        return f"gemini:{GEMINI_EMBEDDING_MODEL}:{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from core.clients import get_gemini_client
+        from core.resilience import call_remote
+
+        response = call_remote("gemini", "embedding", lambda: get_gemini_client().models.embed_content(
+            model=GEMINI_EMBEDDING_MODEL,
+            contents=texts,
+        ))
+        return _normalize(np.array([e.values for e in response.embeddings], dtype=np.float32))
+
+
+class BruteForceIndex:
+    """
+    Exact cosine search over a preallocated, growable vector matrix.
+    Vectors must already be normalized, so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    def add(self, vectors: np.ndarray):
+        needed = self._size + len(vectors)
+        if needed > len(self._vectors):
+            capacity = max(needed, len(self._vectors) * 2)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+        self._vectors[self._size:needed] = vectors
+        self._size = needed
+
+    def search(self, query: np.ndarray, k: int):
+        """Return (ids, scores) of the k best matches, best first."""
+        return _top_k(self.vectors @ query, np.arange(self._size), k)
+
+
+class IVFIndex:
+    """
+    Approximate search: vectors are bucketed by their nearest k-means centroid
+    and a query only scans the `nprobe` closest buckets.
+    """
+
+    def __init__(self, base: BruteForceIndex, num_lists: Optional[int] = None, nprobe: int = 8, seed: int = 0):
+        self.base = base
+        self.nprobe = nprobe
+        self.num_lists = num_lists or max(16, int(np.sqrt(len(base))))
+        self.centroids = self._train(base.vectors, seed)
+        self._lists: List[List[int]] = [[] for _ in range(self.num_lists)]
+        self._list_arrays: List[Optional[np.ndarray]] = [None] * self.num_lists
+        self._assign(np.arange(len(base)), base.vectors)
+
+    def __len__(self):
+        return len(self.base)
+
+    def _train(self, vectors: np.ndarray, seed: int, iterations: int = 10) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), self.num_lists * 64)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.num_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(self.num_lists):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        return centroids
+
+    def _assign(self, ids: np.ndarray, vectors: np.ndarray):
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for vector_id, cluster in zip(ids, assignment):
+            self._lists[cluster].append(int(vector_id))
+            self._list_arrays[cluster] = None
+
+    def add(self, vectors: np.ndarray):
+        start = len(self.base)
+        self.base.add(vectors)
+        self._assign(np.arange(start, len(self.base)), vectors)
+
+    def search(self, query: np.ndarray, k: int):
+        centroid_scores = self.centroids @ query
+        probes = np.argsort(-centroid_scores)[:self.nprobe]
+
+        candidate_lists = []
+        for cluster in probes:
+            if self._list_arrays[cluster] is None:
+                self._list_arrays[cluster] = np.array(self._lists[cluster], dtype=np.int64)
+            candidate_lists.append(self._list_arrays[cluster])
+
+        candidates = np.concatenate(candidate_lists)
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+
+        return _top_k(self.base.vectors[candidates] @ query, candidates, k)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int):
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+    else:
+        best = np.arange(len(scores))
+
+    best = best[np.argsort(-scores[best])]
+    return ids[best], scores[best]
+
+
+@dataclass
+class MemoryHit:
+    text: str
+    score: float
+    timestamp: float
+
+
+class MemoryStore:
+    """
+    Persistent long-term memory of past turns with a vector index.
+
+    Texts go to an append-only `turns.jsonl`, embeddings to an append-only raw
+    float32 file, so adding a turn never rewrites what's already on disk.
+    `meta.json` records which embedder built the vectors; opening the store
+    with a different one re-embeds every text.
+    """
+
+    def __init__(self, directory: str, embedder: Optional[Embedder] = None, ann_threshold: int = ANN_THRESHOLD):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashingEmbedder()
+        self.ann_threshold = ann_threshold
+
+        self._texts: List[str] = []
+        self._timestamps: List[float] = []
+        self._index = None
+        self._lock = threading.Lock()
+
+        self._load()
+
+    @property
+    def _turns_path(self) -> Path:
+        return self.directory / "turns.jsonl"
+
+    @property
+    def _embeddings_path(self) -> Path:
+        return self.directory / "embeddings.f32"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    def _stored_embedder_key(self, dim: int) -> str:
+        try:
+            return json.loads(self._meta_path.read_text(encoding="utf-8"))["embedder"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            # stores from before meta.json: all that is known is the dimension
+            return self.embedder.key if dim == self.embedder.dim else f"unknown:{dim}"
+
+    def _write_meta(self):
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"embedder": self.embedder.key, "dim": self.embedder.dim}), encoding="utf-8")
+        tmp_path.replace(self._meta_path)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _load(self):
+        if not self._turns_path.exists() or not self._embeddings_path.exists():
+            return
+
+        dim = None
+        line_ends = [0]
+        with open(self._turns_path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._texts.append(record["text"])
+                self._timestamps.append(record["timestamp"])
+                dim = record["dim"]
+                line_ends.append(line_ends[-1] + len(line))
+
+        if dim is None:
+            return
+
+        stored_key = self._stored_embedder_key(dim)
+        if stored_key != self.embedder.key:
+            self._rebuild(stored_key)
+            return
+        if not self._meta_path.exists():
+            self._write_meta()
+
+        vectors = np.fromfile(self._embeddings_path, dtype=np.float32)
+        vectors = vectors[:len(vectors) - len(vectors) % dim].reshape(-1, dim)
+
+        count = min(len(vectors), len(self._texts))
+        self._texts = self._texts[:count]
+        self._timestamps = self._timestamps[:count]
+
+        # a crash mid-append can leave a half-written line or a vector without
+        # its text; cut both files back so later appends stay aligned
+        os.truncate(self._turns_path, line_ends[count])
+        os.truncate(self._embeddings_path, count * dim * 4)
+
+        if count:
+            self._add_to_index(vectors[:count])
+        logger.info(f"Loaded {count} memories from {self.directory}")
+
+    def _rebuild(self, stored_key: str):
+        """
+        Re-embed every stored text with the current embedder and rewrite both
+        files. The embedding round trips run without the store's lock, the
+        result is swapped in under it.
+        """
+        logger.warning(
+            f"Memories in {self.directory} were embedded with {stored_key}, "
+            f"re-embedding {len(self._texts)} of them with {self.embedder.key}"
+        )
+        batches = [
+            self.embedder.embed(self._texts[start:start + REBUILD_BATCH_SIZE])
+            for start in range(0, len(self._texts), REBUILD_BATCH_SIZE)
+        ]
+        vectors = np.concatenate(batches).astype(np.float32, copy=False)
+
+        embeddings_tmp = self._embeddings_path.with_suffix(".tmp")
+        vectors.tofile(embeddings_tmp)
+        turns_tmp = self._turns_path.with_suffix(".tmp")
+        with open(turns_tmp, "w", encoding="utf-8") as f:
+            for text, timestamp in zip(self._texts, self._timestamps):
+                f.write(json.dumps({"text": text, "timestamp": timestamp, "dim": vectors.shape[1]}) + "\n")
+
+        with self._lock:
+            embeddings_tmp.replace(self._embeddings_path)
+            turns_tmp.replace(self._turns_path)
+            self._write_meta()
+            self._index = None
+            self._add_to_index(vectors)
+
+    def _add_to_index(self, vectors: np.ndarray):
+        if self._index is None:
+            self._index = BruteForceIndex(vectors.shape[1])
+
+        self._index.add(vectors)
+
+        if isinstance(self._index, BruteForceIndex) and len(self._index) >= self.ann_threshold:
+            logger.info(f"Memory store reached {len(self._index)} entries, building approximate index")
+            self._index = IVFIndex(self._index)
+
+    def add(self, text: str, timestamp: Optional[float] = None):
+        """Embed one text and append it to the store."""
+        timestamp = timestamp or time.time()
+        vector = self.embedder.embed([text])
+
+        with self._lock:
+            if not self._texts:
+                self._write_meta()
+            with open(self._embeddings_path, "ab") as f:
+                f.write(vector.tobytes())
+            with open(self._turns_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "timestamp": timestamp, "dim": vector.shape[1]}) + "\n")
+
+            self._texts.append(text)
+            self._timestamps.append(timestamp)
+            self._add_to_index(vector)
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[MemoryHit]:
+        """Return up to k stored texts most similar to the query."""
+        if not self._texts:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+
+        with self._lock:
+            ids, scores = self._index.search(query_vector, k)
+            return [
+                MemoryHit(text=self._texts[i], score=float(score), timestamp=self._timestamps[i])
+                for i, score in zip(ids, scores)
+                if score >= min_score
+            ]
+
+
+_stores: Dict[str, MemoryStore] = {}
+_stores_lock = threading.Lock()
+# one per store being opened; loading can mean re-embedding the whole store over
+# the network, which should only hold up that session, not every lookup
+_opening_locks: Dict[str, threading.Lock] = {}
+
+
+def get_memory_store(session_id: str) -> MemoryStore:
+    """Get the long-term memory store for a session, loading it on first use."""
+    with _stores_lock:
+        store = _stores.get(session_id)
+        if store is not None:
+            return store
+        opening_lock = _opening_locks.setdefault(session_id, threading.Lock())
+
+    with opening_lock:
+        with _stores_lock:
+            store = _stores.get(session_id)
+        if store is not None:
+            return store
+
+        embedder = GeminiEmbedder() if get_retrieval_embedder() == "gemini" else HashingEmbedder()
+        store = MemoryStore(str(Path(get_memory_dir()) / session_id), embedder=embedder)
+
+        with _stores_lock:
+            _stores[session_id] = store
+            _opening_locks.pop(session_id, None)
+
+        return store
+
+
+def drop_memory_store(session_id: str):
+    """Forget a session's loaded store; its files stay and are loaded again on next use."""
+    with _stores_lock:
+        _stores.pop(session_id, None)
@@ -0,0 +1,188 @@
+from typing import Iterator, List, Optional
+import logging
+import re
+import threading
+
+from core.brain.llm import remember_exchange, speculate_llm_with_command, stream_llm_with_command
+from core.brain.memory import DEFAULT_SESSION, estimate_tokens
+from core.tracing import get_metrics, mark
+
+logger = logging.getLogger(__name__)
+
+# trailing silence after which the user may have finished, well inside the
+# silence window that actually ends the recording; a guess that is wrong
+# just gets restarted once the user carries on
+SPECULATION_PAUSE_SECONDS = 0.2
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase words only, so punctuation and casing differences between transcripts still match."""
+    return " ".join(re.findall(r"[\w']+", text.lower()))
+
+
+class SpeculativeResponse:
+    """
+    An LLM response started on an interim transcript, buffered on a background
+    thread until the final transcript decides whether it gets used.
+    """
+
+    def __init__(self, command: str, session_id: str = DEFAULT_SESSION):
+        self.command = command
+        self.session_id = session_id
+
+        self._parts: List[str] = []
+        self._is_done = False
+        self._error: Optional[Exception] = None
+        self._cancelled = threading.Event()
+        self._condition = threading.Condition()
+        # a fresh thread has no current trace, so nothing is timed until the response is used
+        self._thread = threading.Thread(target=self._generate, name="llm-speculation", daemon=True)
+        self._thread.start()
+
+    def _generate(self):
+        pieces = speculate_llm_with_command(self.command, self.session_id)
+        try:
+            while not self._cancelled.is_set():
+                piece = next(pieces, None)
+                if piece is None or self._cancelled.is_set():
+                    break
+                with self._condition:
+                    self._parts.append(piece)
+                    self._condition.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            # closes the HTTP stream, so a cancelled response stops generating tokens
+            pieces.close()
+            with self._condition:
+                self._is_done = True
+                self._condition.notify_all()
+
+    def matches(self, command: str) -> bool:
+        return normalize_transcript(self.command) == normalize_transcript(command)
+
+    def cancel(self) -> int:
+        """Stop generating. Returns roughly how many tokens were generated for nothing."""
+        self._cancelled.set()
+        with self._condition:
+            return estimate_tokens("".join(self._parts)) if self._parts else 0
+
+    def stream(self) -> Iterator[str]:
+        """
+        Yield the response, buffered pieces first, and remember the exchange
+        once complete. Closing it early, e.g. on a barge-in, stops the request.
+        """
+        index = 0
+        try:
+            while True:
+                with self._condition:
+                    while index >= len(self._parts) and not self._is_done:
+                        self._condition.wait()
+
+                    pieces = self._parts[index:]
+                    index = len(self._parts)
+                    is_done = self._is_done
+
+                for piece in pieces:
+                    mark("llm.first_token")
+                    yield piece
+
+                if is_done:
+                    break
+        except GeneratorExit:
+            self.cancel()
+            raise
+
+        if self._error is not None and not self._parts:
+            logger.warning(f"Speculative LLM request failed ({self._error!r}), asking again")
+            yield from stream_llm_with_command(self.command, self.session_id)
+            return
+
+        if self._error is not None:
+            logger.error(f"Speculative LLM stream failed part way, cutting the response short: {self._error!r}")
+
+        if not self._parts:
+            yield "No response"
+            return
+
+        response = "".join(self._parts)
+        remember_exchange(self.command, response, self.session_id)
+        logger.info(f"LLM response generated: '{response}...'")
+
+
+class LlmSpeculator:
+    """
+    Starts the LLM on the interim transcript once the user pauses, so its
+    latency hides behind the silence window that ends the recording.
+
+    Feed it every recorded chunk with `update`. At the pause it has the
+    transcriber send off the last words straight away and speculates on the
+    interim text it has, restarting whenever that text changes or the user
+    carries on talking. Afterwards `take` the response for the final
+    transcript. It's only used if the final transcript matches the interim
+    one, otherwise it is cancelled and the caller asks again. Hits, misses
+    (a wrong guess at the end of the turn), restarts and the tokens generated
+    for nothing are counted in the metrics store.
+    """
+
+    def __init__(self, session_id: str = DEFAULT_SESSION, pause_seconds: float = SPECULATION_PAUSE_SECONDS):
+        self.session_id = session_id
+        self.pause_seconds = pause_seconds
+        self.current: Optional[SpeculativeResponse] = None
+
+    def update(self, transcriber, trailing_silence_seconds: float):
+        if trailing_silence_seconds == 0:
+            # the user is still talking, whatever was started is out of date
+            self._discard(counter="speculation.restarts")
+            return
+
+        if trailing_silence_seconds < self.pause_seconds:
+            return
+
+        # rather than wait for the transcriber's own, longer pause
+        transcriber.flush()
+        command = transcriber.partial_transcript()
+        if not command or (self.current is not None and self.current.matches(command)):
+            return
+
+        self._discard(counter="speculation.restarts")
+        logger.debug(f"Speculating on interim transcript: '{command}'")
+        self.current = SpeculativeResponse(command, self.session_id)
+        get_metrics().increment("speculation.started")
+
+    def take(self, command: Optional[str]) -> Optional[Iterator[str]]:
+        """The speculative response if it was for `command`, otherwise None."""
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+
+        if command and speculation.matches(command):
+            get_metrics().increment("speculation.hits")
+            logger.info(f"Speculative LLM response used ({self._stats()})")
+            return speculation.stream()
+
+        self._discard(speculation)
+        logger.info(f"Speculative LLM response discarded ({self._stats()})")
+        return None
+
+    def cancel(self):
+        self._discard()
+
+    def _discard(self, speculation: Optional[SpeculativeResponse] = None, counter: str = "speculation.misses"):
+        if speculation is None:
+            speculation, self.current = self.current, None
+        if speculation is None:
+            return
+
+        metrics = get_metrics()
+        metrics.increment(counter)
+        metrics.increment("speculation.wasted_tokens", speculation.cancel())
+
+    def _stats(self) -> str:
+        counters = get_metrics().counters()
+        hits = counters.get("speculation.hits", 0)
+        turns = hits + counters.get("speculation.misses", 0)
+        return (
+            f"hit rate {hits / turns:.0%}, {counters.get('speculation.restarts', 0):g} restarts, "
+            f"{counters.get('speculation.wasted_tokens', 0):g} tokens wasted"
+        )
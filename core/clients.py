@@ -0,0 +1,115 @@
+import logging
+import threading
+
+from utils.env_utils import get_environment_variable
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_BASE_URL = "https://api.elevenlabs.io"
+
+HTTP_TIMEOUT_SECONDS = 60.0
+MAX_CONNECTIONS = 10
+KEEPALIVE_EXPIRY_SECONDS = 300.0
+
+_elevenlabs_client = None
+_gemini_client = None
+_http_client = None
+_clients_lock = threading.Lock()
+
+
+def _get_http_client():
+    """Shared keep-alive httpx client so TLS connections are reused across turns."""
+    global _http_client
+
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.Client(
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+
+    return _http_client
+
+
+def get_elevenlabs_client():
+    """Get the process-wide ElevenLabs client, creating it on first use."""
+    global _elevenlabs_client
+
+    with _clients_lock:
+        if _elevenlabs_client is None:
+            from elevenlabs import ElevenLabs
+
+            _elevenlabs_client = ElevenLabs(
+                api_key=get_environment_variable("ELEVENLABS_API_KEY"),
+                httpx_client=_get_http_client(),
+            )
+            logger.debug("Initialized shared ElevenLabs client")
+
+        return _elevenlabs_client
+
+
+def get_gemini_client():
+    """Get the process-wide Gemini client, creating it on first use."""
+    global _gemini_client
+
+    with _clients_lock:
+        if _gemini_client is None:
+            from google import genai
+
+            _gemini_client = genai.Client(api_key=get_environment_variable("GEMINI_API_KEY"))
+            logger.debug("Initialized shared Gemini client")
+
+        return _gemini_client
+
+
+def override_clients(elevenlabs=None, gemini=None):
+    """
+    Use these clients instead of creating real ones, e.g. offline fakes for
+    benchmarks and tests. `close_clients` drops them again.
+    """
+    global _elevenlabs_client, _gemini_client
+
+    with _clients_lock:
+        if elevenlabs is not None:
+            _elevenlabs_client = elevenlabs
+        if gemini is not None:
+            _gemini_client = gemini
+
+
+def preconnect_clients():
+    """
+    Create both clients and open their connections ahead of the first turn,
+    so the first request doesn't pay for client construction and TLS setup.
+    """
+    try:
+        get_elevenlabs_client()
+        _get_http_client().head(ELEVENLABS_BASE_URL)
+        logger.info("ElevenLabs connection ready")
+    except Exception as e:
+        logger.warning(f"Failed to pre-connect to ElevenLabs: {e}")
+
+    try:
+        client = get_gemini_client()
+        client.models.list(config={"page_size": 1})
+        logger.info("Gemini connection ready")
+    except Exception as e:
+        logger.warning(f"Failed to pre-connect to Gemini: {e}")
+
+
+def close_clients():
+    """Close pooled connections and drop the shared clients."""
+    global _elevenlabs_client, _gemini_client, _http_client
+
+    with _clients_lock:
+        if _http_client is not None:
+            _http_client.close()
+
+        _elevenlabs_client = None
+        _gemini_client = None
+        _http_client = None
+
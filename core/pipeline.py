@@ -0,0 +1,351 @@
+from typing import Awaitable, Callable, Iterator, Optional, Tuple
+import numpy as np
+import pyaudio
+import asyncio
+import logging
+import time
+
+from core.brain import stream_llm_with_command
+from core.brain.speculation import LlmSpeculator
+from core.tracing import current_trace, finish_trace, span, start_trace
+from core.ui.frontend import (
+    show_command_detected, show_recording, show_response, show_speaking,
+    show_thinking, show_waiting, clear_recording_stop, wait_for_interrupt,
+    take_trigger_position, wait_for_recording_stop, wait_for_recording_trigger,
+)
+from core.voice.audio_buffer import AudioBuffer
+from core.voice.barge_in import BargeInWatcher, EchoGate
+from core.voice.capture import PRE_ROLL_SECONDS, CaptureReader, CaptureService
+from core.voice.playback import cancel_playback, reset_playback
+from core.voice.streaming_speech import iter_sentences
+from core.voice.stt import CHUNK_SIZE, SAMPLE_RATE
+from core.voice.stt_encoding import create_upload_encoder
+from core.voice.stt_providers import transcribe_command
+from core.voice.tts import play_audio, synthesize_speech
+from core.voice.vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+_END_OF_STREAM = object()
+
+# how often blocking UI events are re-checked, keeps cancellation responsive
+EVENT_POLL_SECONDS = 0.1
+
+
+async def _wait_for_event(wait_fn: Callable[[float], bool]):
+    """Await a blocking `wait(timeout)` style call without pinning an executor thread forever."""
+    while not await asyncio.to_thread(wait_fn, EVENT_POLL_SECONDS):
+        pass
+
+
+def _mark_turn_failed():
+    trace = current_trace()
+    if trace is not None:
+        trace.outcome = "failed"
+
+
+async def iterate_in_thread(iterator: Iterator, timeout: Optional[float] = None):
+    """Async-iterate a blocking iterator, one `next` per executor hop."""
+    while True:
+        item = await asyncio.wait_for(asyncio.to_thread(next, iterator, _END_OF_STREAM), timeout)
+        if item is _END_OF_STREAM:
+            return
+        yield item
+
+
+async def run_stages(*stages: Awaitable):
+    """
+    Run the stages of a turn concurrently. The first one to fail cancels the
+    rest and its error is raised once they have all finished, like a task group.
+    """
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AssistantPipeline:
+    """
+    Asyncio orchestrator for the assistant.
+
+    Audio capture runs as a producer into a bounded queue. Each turn runs the
+    LLM, TTS synthesis and playback as separate tasks joined by bounded queues,
+    so the next sentence is generated and synthesized while the current one
+    plays. Pressing Enter during a turn cancels it and starts a new recording,
+    and so does talking over the response when `barge_in_capture` is given.
+    With `speculate` (and a streaming transcriber) the LLM starts on the interim
+    transcript while the silence window that ends the recording runs out.
+    """
+
+    def __init__(
+        self,
+        audio_source: pyaudio.Stream,
+        silence_threshold: float = 0.01,
+        max_silence_seconds: float = 0.8,
+        max_wait_for_speech_seconds: float = 5.0,
+        max_recording_chunks: int = 120,
+        stt_timeout: float = 30.0,
+        llm_timeout: float = 30.0,
+        tts_timeout: float = 30.0,
+        audio_queue_size: int = 64,
+        sentence_queue_size: int = 4,
+        transcriber_factory: Optional[Callable] = None,
+        barge_in_capture: Optional[CaptureService] = None,
+        speculate: bool = False,
+    ):
+        self.audio_source = audio_source
+        self.silence_threshold = silence_threshold
+        self.max_silence_seconds = max_silence_seconds
+        self.max_wait_for_speech_seconds = max_wait_for_speech_seconds
+        self.max_recording_chunks = max_recording_chunks
+        self.stt_timeout = stt_timeout
+        self.llm_timeout = llm_timeout
+        self.tts_timeout = tts_timeout
+        self.sentence_queue_size = sentence_queue_size
+        self.transcriber_factory = transcriber_factory
+        self.barge_in_capture = barge_in_capture
+        # one for the whole session, so the echo level learnt in one response carries over
+        self.echo_gate = EchoGate() if barge_in_capture is not None else None
+        self.speculate = speculate
+        # the response started for the last command, if the speculation was right
+        self.speculative_stream: Optional[Iterator[str]] = None
+
+        self.audio_queue: asyncio.Queue = asyncio.Queue(maxsize=audio_queue_size)
+        self.dropped_chunks = 0
+
+    async def run(self):
+        capture_task = asyncio.create_task(self._capture_audio(), name="capture")
+        show_waiting()
+
+        try:
+            pending_trigger = False
+            speech_started_at = None
+            while True:
+                if not pending_trigger:
+                    logger.info("Waiting for Enter key press in GUI...")
+                    await _wait_for_event(wait_for_recording_trigger)
+
+                trace = start_trace(mode="async")
+                outcome = "failed"
+                try:
+                    command = await self._record_command(speech_started_at)
+                    pending_trigger = False
+
+                    if not command:
+                        outcome = "empty"
+                        show_waiting()
+                        continue
+
+                    pending_trigger, speech_started_at = await self._run_turn_until_interrupted(command)
+                    if pending_trigger:
+                        outcome = "interrupted"
+                    else:
+                        outcome = "completed"
+                        show_waiting()
+                finally:
+                    finish_trace(trace, outcome)
+        finally:
+            capture_task.cancel()
+
+    async def _capture_audio(self):
+        """Producer: read the input stream forever, never blocking on slow consumers."""
+        while True:
+            audio_data = await asyncio.to_thread(
+                self.audio_source.read, CHUNK_SIZE, exception_on_overflow=False
+            )
+            chunk = np.frombuffer(audio_data, dtype=np.int16)
+
+            if self.audio_queue.full():
+                # old audio is worthless, drop it rather than stall the device
+                self.audio_queue.get_nowait()
+                self.dropped_chunks += 1
+
+            self.audio_queue.put_nowait(chunk)
+
+    def _drain_audio_queue(self, keep_chunks: int = 0):
+        while self.audio_queue.qsize() > keep_chunks:
+            self.audio_queue.get_nowait()
+
+    async def _record_command(self, speech_started_at: Optional[float] = None) -> Optional[str]:
+        clear_recording_stop()
+        show_recording()
+        # keep a little pre-roll so the first syllable isn't cut off, and after
+        # a barge-in or a wake word everything the user already said
+        keep_seconds = PRE_ROLL_SECONDS
+        if speech_started_at is not None:
+            keep_seconds += time.monotonic() - speech_started_at
+        trigger_position = take_trigger_position()
+        if trigger_position is not None and isinstance(self.audio_source, CaptureReader):
+            service = self.audio_source.service
+            keep_seconds += (service.frames_written - trigger_position) / service.sample_rate
+        self._drain_audio_queue(keep_chunks=int(keep_seconds * SAMPLE_RATE / CHUNK_SIZE))
+
+        transcriber = self.transcriber_factory() if self.transcriber_factory else None
+        speculator = LlmSpeculator() if self.speculate and transcriber is not None else None
+        encoder = create_upload_encoder(SAMPLE_RATE) if transcriber is None else None
+        command_buffer = AudioBuffer(SAMPLE_RATE)
+        vad = VoiceActivityDetector(SAMPLE_RATE, min_threshold=self.silence_threshold)
+        chunk_count = 0
+
+        logger.info("🔴 Recording... (press Enter again to stop or wait for silence)")
+
+        try:
+            with span("capture"):
+                while True:
+                    chunk = await self.audio_queue.get()
+                    command_buffer.append(chunk)
+                    chunk_count += 1
+
+                    is_silent = not vad.process(chunk)
+                    if encoder is not None:
+                        encoder.send(chunk, is_silent)
+                    if transcriber is not None:
+                        transcriber.send(chunk, is_silent)
+                        if speculator is not None:
+                            speculator.update(transcriber, vad.trailing_silence_seconds)
+
+                    if wait_for_recording_stop(timeout=0):
+                        logger.info("Enter pressed - stopping recording")
+                        break
+
+                    if vad.has_ended(self.max_silence_seconds, self.max_wait_for_speech_seconds):
+                        logger.info("Silence detected, finishing recording")
+                        break
+
+                    if chunk_count > self.max_recording_chunks:
+                        logger.info("Maximum recording time reached")
+                        break
+        except BaseException:
+            # finish() never runs, so its upload thread has to be freed here
+            if transcriber is not None:
+                transcriber.close()
+            raise
+
+        # the rest of the turn is timed from when the user stopped speaking
+        trace = current_trace()
+        if trace is not None:
+            trace.restart()
+
+        try:
+            with span("stt"):
+                if transcriber is not None:
+                    command = await asyncio.wait_for(asyncio.to_thread(transcriber.finish), self.stt_timeout)
+                    if speculator is not None:
+                        self.speculative_stream = speculator.take(command)
+                    return command
+
+                return await asyncio.wait_for(
+                    asyncio.to_thread(transcribe_command, command_buffer, encoder.finish()),
+                    self.stt_timeout,
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"STT timed out after {self.stt_timeout:.0f} seconds")
+            return None
+        finally:
+            if speculator is not None:
+                speculator.cancel()
+
+    async def _run_turn_until_interrupted(self, command: str) -> Tuple[bool, Optional[float]]:
+        """
+        Run one turn, cancelling it if the user presses Enter or talks over it.
+
+        Returns:
+            Whether the turn was interrupted and a new recording should start,
+            and when the user started talking if it was a barge-in
+        """
+        wait_for_interrupt(timeout=0)
+        reset_playback()
+        turn_task = asyncio.create_task(self._run_turn(command), name="turn")
+        interrupt_task = asyncio.create_task(_wait_for_event(wait_for_interrupt), name="interrupt")
+        waiters = {turn_task, interrupt_task}
+
+        barge_in_watcher = None
+        if self.barge_in_capture is not None:
+            loop = asyncio.get_running_loop()
+            barge_in = asyncio.Event()
+            barge_in_watcher = BargeInWatcher(
+                self.barge_in_capture,
+                on_barge_in=lambda: loop.call_soon_threadsafe(barge_in.set),
+                silence_threshold=self.silence_threshold,
+                echo_gate=self.echo_gate,
+            )
+            barge_in_watcher.start()
+            barge_in_task = asyncio.create_task(barge_in.wait(), name="barge-in")
+            waiters.add(barge_in_task)
+
+        try:
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in waiters - {turn_task}:
+                task.cancel()
+            if barge_in_watcher is not None:
+                await asyncio.to_thread(barge_in_watcher.stop)
+
+        if turn_task not in done:
+            logger.info("Turn interrupted by user")
+            turn_task.cancel()
+            cancel_playback()
+            await asyncio.gather(turn_task, return_exceptions=True)
+            return True, barge_in_watcher.speech_started_at if barge_in_watcher is not None else None
+
+        try:
+            turn_task.result()
+        except asyncio.TimeoutError:
+            logger.warning("A pipeline stage timed out, abandoning turn")
+            _mark_turn_failed()
+        except Exception as e:
+            logger.error(f"Error while handling command: {e}", exc_info=True)
+            _mark_turn_failed()
+
+        return False, None
+
+    async def _run_turn(self, command: str):
+        turn_start = time.time()
+        logger.info(f"Command received: '{command}'")
+        show_command_detected(command)
+        show_thinking()
+
+        sentence_queue: asyncio.Queue = asyncio.Queue(maxsize=self.sentence_queue_size)
+        audio_queue: asyncio.Queue = asyncio.Queue(maxsize=self.sentence_queue_size)
+
+        await run_stages(
+            self._llm_stage(command, sentence_queue),
+            self._tts_stage(sentence_queue, audio_queue),
+            self._playback_stage(audio_queue),
+        )
+
+        logger.info(f"Total cycle time: {time.time() - turn_start:.2f} seconds")
+
+    async def _llm_stage(self, command: str, sentence_queue: asyncio.Queue):
+        response_parts = []
+        llm_stream, self.speculative_stream = self.speculative_stream, None
+
+        def tracked_text():
+            for piece in llm_stream or stream_llm_with_command(command):
+                response_parts.append(piece)
+                show_response("".join(response_parts))
+                yield piece
+
+        async for sentence in iterate_in_thread(iter_sentences(tracked_text()), self.llm_timeout):
+            await sentence_queue.put(sentence)
+
+        # on errors run_stages cancels the other stages, so no sentinel is needed then
+        await sentence_queue.put(_END_OF_STREAM)
+
+    async def _tts_stage(self, sentence_queue: asyncio.Queue, audio_queue: asyncio.Queue):
+        while (sentence := await sentence_queue.get()) is not _END_OF_STREAM:
+            audio = await asyncio.wait_for(asyncio.to_thread(synthesize_speech, sentence), self.tts_timeout)
+            await audio_queue.put(audio)
+
+        await audio_queue.put(_END_OF_STREAM)
+
+    async def _playback_stage(self, audio_queue: asyncio.Queue):
+        has_started = False
+        while (audio := await audio_queue.get()) is not _END_OF_STREAM:
+            if not has_started:
+                show_speaking()
+                has_started = True
+            await asyncio.to_thread(play_audio, audio)
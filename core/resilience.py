@@ -0,0 +1,363 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+import contextvars
+import logging
+import threading
+import time
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+
+from core.tracing import get_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_END_OF_STREAM = object()
+
+# jittered exponential backoff between attempts: up to 0.2s, 0.4s, 0.8s... capped
+RETRY_BACKOFF_SECONDS = 0.2
+RETRY_MAX_BACKOFF_SECONDS = 2.0
+
+# consecutive failures that open a provider's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30.0
+
+# requests that outlive their deadline keep a thread until the HTTP timeout
+# frees it, so there is room for a few of those next to the live ones
+MAX_REMOTE_THREADS = 32
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """
+    How one kind of remote call is made.
+
+    timeout: deadline for one attempt (for streams, until the first chunk)
+    attempts / deadline: retries stop at whichever runs out first
+    hedge_after: start a duplicate request if the first hasn't answered by then
+    idle_timeout: for streams, the longest gap allowed between chunks
+    seconds_per_mb: for uploads, extra time per MB sent, added to each attempt
+    max_hedge_bytes: uploads bigger than this aren't hedged, a duplicate
+        would only compete with the first for the same uplink
+    """
+
+    timeout: float
+    attempts: int = 3
+    deadline: float = 20.0
+    hedge_after: Optional[float] = None
+    idle_timeout: Optional[float] = None
+    seconds_per_mb: float = 0.0
+    max_hedge_bytes: Optional[int] = None
+
+    def allowance(self, payload_bytes: int) -> float:
+        """Extra seconds one attempt gets for sending `payload_bytes`."""
+        return self.seconds_per_mb * payload_bytes / 1_000_000
+
+    def for_payload(self, payload_bytes: int) -> "CallPolicy":
+        """This policy stretched for an upload of `payload_bytes`."""
+        if not payload_bytes:
+            return self
+
+        extra = self.allowance(payload_bytes)
+        hedge_after = self.hedge_after
+        if self.max_hedge_bytes is not None and payload_bytes > self.max_hedge_bytes:
+            hedge_after = None
+
+        return replace(
+            self,
+            timeout=self.timeout + extra,
+            deadline=self.deadline + extra * self.attempts,
+            hedge_after=hedge_after,
+        )
+
+
+# STT stays within the STT policy's own timeout (stretched the same way for
+# big uploads), so the local fallback still gets its turn. Scaled for a slow
+# ~1 Mbit/s uplink; 30 s of 16 kHz WAV is about 1 MB
+CALL_POLICIES: Dict[str, CallPolicy] = {
+    "stt": CallPolicy(
+        timeout=6.0,
+        attempts=2,
+        deadline=9.0,
+        hedge_after=2.5,
+        seconds_per_mb=8.0,
+        max_hedge_bytes=128 * 1024,
+    ),
+    "tts": CallPolicy(timeout=5.0, attempts=3, deadline=12.0, hedge_after=1.5, idle_timeout=5.0),
+    "llm": CallPolicy(timeout=10.0, attempts=2, deadline=20.0, hedge_after=4.0, idle_timeout=10.0),
+    "embedding": CallPolicy(timeout=5.0, attempts=2, deadline=8.0),
+    "summary": CallPolicy(timeout=30.0, attempts=3, deadline=90.0),
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that has been failing."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """A remote call didn't answer within its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    fail straight away for `reset_seconds`. Then a single trial call goes
+    through; success closes the circuit again, failure reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._is_trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._is_trial_running:
+                return False
+
+            self._is_trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} is answering again, closing its circuit")
+            self._failures = 0
+            self._opened_at = None
+            self._is_trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            was_trial = self._is_trial_running
+            self._is_trial_running = False
+
+            if was_trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    f"{self.name} failed {self._failures} times in a row, "
+                    f"not calling it for {self.reset_seconds:.0f} seconds"
+                )
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_REMOTE_THREADS, thread_name_prefix="remote")
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = CircuitBreaker(provider)
+            _breakers[provider] = breaker
+
+        return breaker
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors and 5xx/408/429 answers are worth another try; other 4xx aren't."""
+    if isinstance(error, CircuitOpenError):
+        return False
+
+    # elevenlabs' ApiError has status_code, google-genai's APIError has code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+
+    return True
+
+
+def _submit(fn: Callable[[], T]):
+    # in a copy of this context so spans recorded by `fn` land in the current trace
+    return _executor.submit(contextvars.copy_context().run, fn)
+
+
+def close_result(result):
+    """Free what an unused answer holds on to, e.g. an open response stream."""
+    close = getattr(result, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logger.debug(f"Failed to close an unused response: {e!r}")
+
+
+def _discard_later(future: Future, discard: Callable[[T], None]):
+    """Cancel an attempt that's no longer wanted, or free its answer once it comes."""
+    if future.cancel():
+        return
+
+    def on_done(done: Future):
+        if not done.cancelled() and done.exception() is None:
+            discard(done.result())
+
+    future.add_done_callback(on_done)
+
+
+def _hedged(kind: str, fn: Callable[[], T], policy: CallPolicy, discard: Callable[[T], None] = close_result) -> T:
+    """
+    Run `fn` within the policy's timeout, racing a duplicate against it if it
+    is slow. Attempts that lose or time out have their answer passed to `discard`.
+    """
+    started = time.monotonic()
+    futures = [_submit(fn)]
+
+    if policy.hedge_after is not None and policy.hedge_after < policy.timeout:
+        done, _ = wait(futures, timeout=policy.hedge_after)
+        if not done:
+            logger.debug(f"{kind} request slow after {policy.hedge_after:.1f}s, sending a hedged duplicate")
+            get_metrics().increment(f"{kind}.hedged")
+            futures.append(_submit(fn))
+
+    last_error: Optional[Exception] = None
+    pending = set(futures)
+    while pending:
+        remaining = max(started + policy.timeout - time.monotonic(), 0.0)
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+
+        for future in done:
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+
+            if future is not futures[0]:
+                get_metrics().increment(f"{kind}.hedge_wins")
+            for loser in pending:
+                _discard_later(loser, discard)
+            return future.result()
+
+    for loser in pending:
+        _discard_later(loser, discard)
+
+    if last_error is not None and not pending:
+        raise last_error
+
+    get_metrics().increment(f"{kind}.timeouts")
+    raise DeadlineExceeded(f"{kind} request didn't answer within {policy.timeout:.1f} seconds")
+
+
+def _attempt(
+    provider: str,
+    kind: str,
+    fn: Callable[[], T],
+    policy: CallPolicy,
+    discard: Callable[[T], None] = close_result,
+) -> T:
+    breaker = get_circuit_breaker(provider)
+    if not breaker.allow_request():
+        get_metrics().increment(f"{kind}.circuit_open")
+        raise CircuitOpenError(f"{provider} is failing, not calling it for now")
+
+    try:
+        result = _hedged(kind, fn, policy, discard)
+    except Exception as e:
+        # a 4xx means the provider is up and didn't like this request
+        if is_retryable(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+
+    breaker.record_success()
+    return result
+
+
+def call_remote(
+    provider: str,
+    kind: str,
+    fn: Callable[[], T],
+    payload_bytes: int = 0,
+    discard: Callable[[T], None] = close_result,
+) -> T:
+    """
+    Make a blocking SDK request with the policy for `kind`: a deadline per
+    attempt, a hedged duplicate when the first is slow, and jittered retries,
+    all behind `provider`'s circuit breaker. For uploads, `payload_bytes`
+    stretches the deadlines and turns hedging off for big ones.
+
+    `fn` may be called more than once, and concurrently, so it must build its
+    request from scratch every time (e.g. a fresh file object to upload).
+    Answers from attempts that lost the race or timed out go to `discard`.
+    """
+    policy = CALL_POLICIES[kind].for_payload(payload_bytes)
+
+    def log_retry(retry_state):
+        get_metrics().increment(f"{kind}.retries")
+        logger.warning(
+            f"{provider} {kind} request failed ({retry_state.outcome.exception()!r}), "
+            f"retrying in {retry_state.next_action.sleep:.2f}s"
+        )
+
+    retrying = Retrying(
+        stop=stop_after_attempt(policy.attempts) | stop_after_delay(policy.deadline),
+        wait=wait_random_exponential(multiplier=RETRY_BACKOFF_SECONDS, max=RETRY_MAX_BACKOFF_SECONDS),
+        retry=retry_if_exception(is_retryable),
+        before_sleep=log_retry,
+        reraise=True,
+    )
+    return retrying(_attempt, provider, kind, fn, policy, discard)
+
+
+def stream_remote(provider: str, kind: str, open_stream: Callable[[], Iterator[T]]) -> Iterator[T]:
+    """
+    Like `call_remote` for streaming responses. Opening the stream and getting
+    its first chunk is retried and hedged as one call; after that a gap longer
+    than the policy's `idle_timeout` ends the stream with DeadlineExceeded.
+    """
+    policy = CALL_POLICIES[kind]
+
+    def open_and_read_first():
+        chunks = open_stream()
+        return chunks, next(chunks, _END_OF_STREAM)
+
+    chunks, item = call_remote(provider, kind, open_and_read_first, discard=lambda opened: close_result(opened[0]))
+
+    # closed however the stream ends, consumer stopping early included, so the
+    # HTTP response and its pooled connection are given back
+    future = None
+    try:
+        while item is not _END_OF_STREAM:
+            yield item
+
+            future = _submit(lambda: next(chunks, _END_OF_STREAM))
+            try:
+                item = future.result(timeout=policy.idle_timeout)
+            except TimeoutError:
+                get_metrics().increment(f"{kind}.timeouts")
+                get_circuit_breaker(provider).record_failure()
+                raise DeadlineExceeded(f"{provider} {kind} stream stalled for {policy.idle_timeout:.1f} seconds")
+    finally:
+        if future is not None and not future.done():
+            # a generator can't be closed while another thread is inside it,
+            # the stalled read closes it once it returns
+            future.add_done_callback(lambda _: close_result(chunks))
+        else:
+            close_result(chunks)
@@ -0,0 +1,421 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Deque, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import re
+import time
+import uuid
+
+from core.brain import stream_llm_with_command
+from core.brain.memory import drop_session_memory
+from core.brain.retrieval import drop_memory_store
+from core.pipeline import iterate_in_thread, run_stages
+from core.tracing import finish_trace, mark, span, start_trace
+from core.voice.audio_buffer import AudioBuffer
+from core.voice.barge_in import MIN_BARGE_IN_SECONDS
+from core.voice.capture import PRE_ROLL_SECONDS
+from core.voice.streaming_speech import iter_sentences
+from core.voice.stt_encoding import EncodedAudio, create_upload_encoder
+from core.voice.stt import SAMPLE_RATE
+from core.voice.stt_providers import transcribe_command
+from core.voice.tts import MP3_OUTPUT_FORMAT, synthesize_speech
+from core.voice.vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+# how many requests of each kind may be in flight across all sessions; STT and
+# TTS share the ElevenLabs connection pool so together they stay within it
+MAX_CONCURRENT_STT = 4
+MAX_CONCURRENT_LLM = 8
+MAX_CONCURRENT_TTS = 4
+
+# counted from when the user starts talking
+MAX_RECORDING_SECONDS = 30.0
+
+# session ids name the memory directory on disk, so nothing that could leave it
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# websocket close code for "try again later"
+CLOSE_SERVER_FULL = 1013
+
+# a device that drops off keeps its conversation this long, so a reconnect
+# (flaky wifi, a reboot) picks up where it left off
+SESSION_GRACE_SECONDS = 600.0
+
+
+@dataclass
+class ServerLimits:
+    """Semaphores shared by every session, so a busy box degrades by queueing instead of failing."""
+
+    stt: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_STT))
+    llm: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_LLM))
+    tts: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(MAX_CONCURRENT_TTS))
+
+    @property
+    def thread_count(self) -> int:
+        return MAX_CONCURRENT_STT + MAX_CONCURRENT_LLM + MAX_CONCURRENT_TTS
+
+
+class ServerSession:
+    """
+    One connected device.
+
+    The device streams 16 kHz mono int16 PCM as binary messages. The session
+    endpoints it with its own VAD (or on an explicit {"type": "end"}) and runs
+    the turn: STT, then the LLM and TTS overlapped sentence by sentence, sending
+    the transcript, each sentence's text and its audio back as they are ready.
+    Until the user starts talking only a short pre-roll is kept, so leading
+    silence is neither uploaded nor counted against the recording limit.
+    Speaking again while a turn is running cancels it; with `barge_in` it is
+    cancelled as soon as the user starts talking, and the device is sent an
+    {"type": "interrupted"} event so it can stop playing.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        connection,
+        limits: ServerLimits,
+        silence_threshold: float = 0.01,
+        max_silence_seconds: float = 0.8,
+        sentence_queue_size: int = 4,
+        barge_in: bool = False,
+    ):
+        self.session_id = session_id
+        self.connection = connection
+        self.limits = limits
+        self.max_silence_seconds = max_silence_seconds
+        self.sentence_queue_size = sentence_queue_size
+        self.barge_in = barge_in
+
+        self.command_buffer = AudioBuffer(SAMPLE_RATE)
+        self.encoder = create_upload_encoder(SAMPLE_RATE)
+        self.vad = VoiceActivityDetector(SAMPLE_RATE, min_threshold=silence_threshold)
+        self.pre_roll: Deque[np.ndarray] = deque()
+        self.has_speech = False
+        self.voiced_seconds = 0.0
+        self.turn_task: Optional[asyncio.Task] = None
+
+    async def send_event(self, event_type: str, **fields):
+        await self.connection.send(json.dumps({"type": event_type, **fields}))
+
+    async def serve(self):
+        await self.send_event(
+            "ready",
+            session=self.session_id,
+            sample_rate=SAMPLE_RATE,
+            audio_format=MP3_OUTPUT_FORMAT,
+        )
+
+        try:
+            async for message in self.connection:
+                if isinstance(message, bytes):
+                    if len(message) % 2:
+                        await self.send_event("error", message="Audio must be 16-bit PCM, got an odd number of bytes")
+                        continue
+                    self.on_audio(message)
+                    continue
+
+                try:
+                    event = json.loads(message)
+                except json.JSONDecodeError:
+                    event = None
+                if not isinstance(event, dict):
+                    await self.send_event("error", message="Control messages must be JSON objects")
+                    continue
+                self.on_control(event)
+        finally:
+            if self.turn_task is not None:
+                self.turn_task.cancel()
+
+    def on_audio(self, data: bytes):
+        chunk = np.frombuffer(data, dtype=np.int16)
+        is_voiced = self.vad.process(chunk)
+
+        if not self.has_speech and not is_voiced:
+            self._hold_pre_roll(chunk)
+        else:
+            if not self.has_speech:
+                self.has_speech = True
+                for held in self.pre_roll:
+                    self.command_buffer.append(held)
+                    self.encoder.send(held, is_silent=True)
+                self.pre_roll.clear()
+
+            self.command_buffer.append(chunk)
+            self.encoder.send(chunk, is_silent=not is_voiced)
+
+        if is_voiced:
+            self.voiced_seconds += len(chunk) / SAMPLE_RATE
+        else:
+            self.voiced_seconds = 0.0
+
+        if self.barge_in and self.voiced_seconds >= MIN_BARGE_IN_SECONDS and self.is_turn_running:
+            logger.info(f"[{self.session_id}] User started talking, interrupting the response")
+            self.turn_task.cancel()
+            self.turn_task = None
+            asyncio.create_task(self.send_event("interrupted"))
+
+        if self.has_speech and self.vad.trailing_silence_seconds >= self.max_silence_seconds:
+            self.end_utterance()
+        elif self.command_buffer.duration_seconds >= MAX_RECORDING_SECONDS:
+            logger.info(f"[{self.session_id}] Maximum recording time reached")
+            self.end_utterance()
+
+    def _hold_pre_roll(self, chunk: np.ndarray):
+        self.pre_roll.append(chunk)
+        held_samples = sum(len(held) for held in self.pre_roll)
+        while held_samples - len(self.pre_roll[0]) >= PRE_ROLL_SECONDS * SAMPLE_RATE:
+            held_samples -= len(self.pre_roll.popleft())
+
+    def on_control(self, event: dict):
+        event_type = event.get("type")
+        if event_type == "end":
+            self.end_utterance()
+        elif event_type == "reset":
+            drop_session_memory(self.session_id)
+            logger.info(f"[{self.session_id}] Conversation reset")
+        else:
+            logger.warning(f"[{self.session_id}] Unknown message type '{event_type}'")
+
+    @property
+    def is_turn_running(self) -> bool:
+        return self.turn_task is not None and not self.turn_task.done()
+
+    def end_utterance(self):
+        samples = self.command_buffer.samples.copy() if self.has_speech else None
+        upload = self.encoder.finish() if self.has_speech else None
+        self.command_buffer.clear()
+        self.encoder = create_upload_encoder(SAMPLE_RATE)
+        self.vad.reset()
+        self.pre_roll.clear()
+        self.has_speech = False
+        self.voiced_seconds = 0.0
+
+        if samples is None:
+            return
+
+        if self.is_turn_running:
+            logger.info(f"[{self.session_id}] Interrupted by new speech")
+            self.turn_task.cancel()
+
+        self.turn_task = asyncio.create_task(self._run_turn(samples, upload), name=f"turn-{self.session_id}")
+
+    async def _run_turn(self, samples: np.ndarray, upload: Optional[EncodedAudio] = None):
+        turn_start = time.time()
+        # started inside the turn task, so the trace belongs to this session only
+        trace = start_trace(mode="server", session=self.session_id)
+        try:
+            async with self.limits.stt:
+                with span("stt"):
+                    command = await asyncio.to_thread(transcribe_command, samples, upload)
+
+            if not command or not command.strip():
+                trace.outcome = "empty"
+                await self.send_event("done")
+                return
+
+            logger.info(f"[{self.session_id}] Command received: '{command}'")
+            await self.send_event("transcript", text=command)
+
+            sentence_queue: asyncio.Queue = asyncio.Queue(maxsize=self.sentence_queue_size)
+            await run_stages(self._llm_stage(command, sentence_queue), self._tts_stage(sentence_queue))
+
+            await self.send_event("done")
+            logger.info(f"[{self.session_id}] Total cycle time: {time.time() - turn_start:.2f} seconds")
+        except asyncio.CancelledError:
+            trace.outcome = "interrupted"
+            raise
+        except Exception as e:
+            trace.outcome = "failed"
+            logger.error(f"[{self.session_id}] Error while handling command: {e}", exc_info=True)
+            await self.send_event("error", message=str(e))
+        finally:
+            finish_trace(trace)
+
+    async def _llm_stage(self, command: str, sentence_queue: asyncio.Queue):
+        async with self.limits.llm:
+            sentences = iter_sentences(stream_llm_with_command(command, session_id=self.session_id))
+            async for sentence in iterate_in_thread(sentences):
+                await sentence_queue.put(sentence)
+
+        await sentence_queue.put(None)
+
+    async def _tts_stage(self, sentence_queue: asyncio.Queue):
+        while (sentence := await sentence_queue.get()) is not None:
+            async with self.limits.tts:
+                audio = await asyncio.to_thread(synthesize_speech, sentence, MP3_OUTPUT_FORMAT)
+
+            await self.send_event("response", text=sentence)
+            await self.connection.send(audio)
+            mark("sent.first_audio")
+
+
+def device_token(secret: str, session_id: str) -> str:
+    """
+    The token a device presents to join `session_id`. Each device gets its
+    own, so knowing another device's id isn't enough to join its conversation.
+    """
+    return hmac.new(secret.encode("utf-8"), session_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _requested_session_id(path: str) -> Optional[str]:
+    """`/bear-12` or `/?session=bear-12`, None when neither is given or it isn't letters, digits, `-` and `_` (at most 64)."""
+    parts = urlsplit(path)
+    query_session = parse_qs(parts.query).get("session")
+    session_id = query_session[0] if query_session else parts.path.strip("/")
+
+    if session_id and SESSION_ID_PATTERN.fullmatch(session_id):
+        return session_id
+
+    if session_id:
+        logger.warning(f"Ignoring invalid session id {session_id[:80]!r}")
+    return None
+
+
+def _session_id_from_path(path: str) -> str:
+    """The session id asked for in the path, or a random one."""
+    return _requested_session_id(path) or uuid.uuid4().hex[:8]
+
+
+def _token_from_request(request) -> Optional[str]:
+    """`Authorization: Bearer <token>`, or `?token=` for devices that can't set headers."""
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        return authorization[len("Bearer "):].strip()
+
+    query_token = parse_qs(urlsplit(request.path).query).get("token")
+    return query_token[0] if query_token else None
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class AssistantServer:
+    """
+    Serves many devices from one process over websockets.
+
+    Conversation state is kept per session id (the memory and retrieval stores
+    are already keyed by it), while the API clients, their connection pools and
+    the worker threads are shared. Stage semaphores cap how much work runs at
+    once across all sessions.
+
+    With a `secret`, a device has to present `device_token(secret, its id)`
+    to connect; without one only connections from this machine are served.
+    A disconnected session's conversation is kept for `grace_seconds`.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8780,
+        max_sessions: int = 64,
+        max_silence_seconds: float = 0.8,
+        barge_in: bool = False,
+        secret: Optional[str] = None,
+        grace_seconds: float = SESSION_GRACE_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_silence_seconds = max_silence_seconds
+        self.barge_in = barge_in
+        self.secret = secret
+        self.grace_seconds = grace_seconds
+        self.sessions: Dict[str, ServerSession] = {}
+        # disconnected sessions whose conversation is about to be forgotten
+        self._expiring: Dict[str, asyncio.TimerHandle] = {}
+
+    async def run(self):
+        if self.secret is None and not _is_loopback(self.host):
+            raise ValueError(f"Set SERVER_SECRET to serve on {self.host}, devices can't be authenticated without it")
+
+        from websockets.asyncio.server import serve
+
+        self.limits = ServerLimits()
+        # blocking SDK calls run on this pool, sized so no stage waits on a thread
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.limits.thread_count, thread_name_prefix="server")
+        )
+
+        async with serve(self._handle_connection, self.host, self.port, process_request=self._authorize) as server:
+            logger.info(f"Serving on ws://{self.host}:{self.port} (up to {self.max_sessions} sessions)")
+            await server.serve_forever()
+
+    def _authorize(self, connection, request):
+        """Turn the handshake away unless it carries the token for the session it asks for."""
+        if self.secret is None:
+            return None
+
+        session_id = _requested_session_id(request.path)
+        if session_id is None:
+            return connection.respond(HTTPStatus.BAD_REQUEST, "Connect to /<device-id>\n")
+
+        token = _token_from_request(request)
+        if token is None or not hmac.compare_digest(token, device_token(self.secret, session_id)):
+            logger.warning(f"[{session_id}] Rejected, missing or wrong device token")
+            return connection.respond(HTTPStatus.UNAUTHORIZED, "Missing or wrong device token\n")
+
+        return None
+
+    def _forget_session(self, session_id: str):
+        self._expiring.pop(session_id, None)
+        if session_id in self.sessions:
+            return
+
+        drop_session_memory(session_id)
+        drop_memory_store(session_id)
+        logger.info(f"[{session_id}] Didn't reconnect, conversation forgotten")
+
+    async def _handle_connection(self, connection):
+        session_id = _session_id_from_path(connection.request.path)
+
+        previous = self.sessions.get(session_id)
+        if previous is None and len(self.sessions) >= self.max_sessions:
+            logger.warning(f"[{session_id}] Rejected, already serving {len(self.sessions)} sessions")
+            await connection.close(CLOSE_SERVER_FULL, "server full")
+            return
+
+        session = ServerSession(
+            session_id,
+            connection,
+            self.limits,
+            max_silence_seconds=self.max_silence_seconds,
+            barge_in=self.barge_in,
+        )
+        # registered before the old connection goes, so its cleanup leaves the conversation alone
+        self.sessions[session_id] = session
+        expiry = self._expiring.pop(session_id, None)
+        if expiry is not None:
+            expiry.cancel()
+        if previous is not None:
+            logger.info(f"[{session_id}] Reconnected, closing the old connection")
+            await previous.connection.close()
+        logger.info(f"[{session_id}] Connected ({len(self.sessions)} active)")
+
+        try:
+            await session.serve()
+        except Exception as e:
+            logger.info(f"[{session_id}] Connection ended: {e}")
+        finally:
+            if self.sessions.get(session_id) is session:
+                del self.sessions[session_id]
+                self._expiring[session_id] = asyncio.get_running_loop().call_later(
+                    self.grace_seconds, self._forget_session, session_id
+                )
+            logger.info(f"[{session_id}] Disconnected ({len(self.sessions)} active)")
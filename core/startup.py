@@ -0,0 +1,131 @@
+from typing import List, Tuple
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# slow to import and not needed until the first turn, so they are warmed up
+# in the background once the frontend is showing
+WARMUP_MODULES = [
+    "numpy",
+    "httpx",
+    "elevenlabs",
+    "google.genai",
+    "google.genai.types",
+]
+
+
+def _process_age_seconds() -> float:
+    """How long ago the process was started, so interpreter startup is counted too (Linux only)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # the command name can contain spaces, the fields after it can't
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+
+        start_ticks = int(fields[19])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+_process_start = time.perf_counter() - _process_age_seconds()
+_marks: List[Tuple[str, float]] = []
+_marks_lock = threading.Lock()
+
+
+def mark(name: str):
+    """Record that a startup milestone was reached."""
+    elapsed = time.perf_counter() - _process_start
+    with _marks_lock:
+        _marks.append((name, elapsed))
+    logger.debug(f"Startup: {name} at {elapsed:.3f}s")
+
+
+def get_marks() -> List[Tuple[str, float]]:
+    with _marks_lock:
+        return list(_marks)
+
+
+def time_imports(modules: List[str]) -> List[Tuple[str, float]]:
+    """Import modules one at a time and return how long each took (0 if it was already loaded)."""
+    timings = []
+    for module in modules:
+        if module in sys.modules:
+            timings.append((module, 0.0))
+            continue
+
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Could not import {module}: {e}")
+            continue
+        timings.append((module, time.perf_counter() - start))
+
+    return timings
+
+
+def warmup(preload_whisper: bool = False, presynthesize: bool = False) -> List[Tuple[str, float]]:
+    """
+    Do the slow first-use work ahead of the first turn: import the SDKs,
+    open client connections and optionally load Whisper and fill the TTS cache.
+
+    Returns:
+        The import timings
+    """
+    import_timings = time_imports(WARMUP_MODULES)
+    mark("SDKs imported")
+
+    from core.clients import preconnect_clients
+
+    preconnect_clients()
+    mark("clients connected")
+
+    if presynthesize:
+        from core.voice.tts import presynthesize_stock_phrases
+
+        presynthesize_stock_phrases()
+        mark("stock phrases synthesized")
+
+    from core.voice.stt_providers import warmup_stt_providers
+
+    warmup_stt_providers()
+    mark("STT providers ready")
+
+    if preload_whisper:
+        from core.voice.stt import warmup_whisper_model
+
+        warmup_whisper_model()
+        mark("Whisper loaded")
+
+    return import_timings
+
+
+def start_background_warmup(preload_whisper: bool = False, presynthesize: bool = False) -> threading.Thread:
+    def run():
+        try:
+            warmup(preload_whisper, presynthesize)
+        except Exception as e:
+            logger.warning(f"Background warmup failed: {e}")
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def format_startup_report(import_timings: List[Tuple[str, float]]) -> str:
+    lines = ["Startup milestones (seconds since process start):"]
+    for name, elapsed in get_marks():
+        lines.append(f"  {elapsed:8.3f}  {name}")
+
+    lines.append("Deferred imports (seconds each):")
+    for module, seconds in import_timings:
+        lines.append(f"  {seconds:8.3f}  {module}")
+
+    return "\n".join(lines)
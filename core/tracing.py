@@ -0,0 +1,236 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from utils.env_utils import get_metrics_export, get_metrics_path
+
+logger = logging.getLogger(__name__)
+
+# samples kept per metric for the percentiles; counts and sums cover all time
+MAX_SAMPLES_PER_METRIC = 1000
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_NAME = "winston_stage_seconds"
+COUNTER_NAME = "winston_events_total"
+
+
+class Trace:
+    """
+    Timing of one turn.
+
+    Spans time a stage (`with trace.span("stt.request"): ...`); marks record
+    how long after the start of the turn something first happened, like the
+    first LLM token or the first audio played. All times are monotonic.
+    `outcome` says how the turn ended: completed, empty, interrupted or failed.
+    """
+
+    def __init__(self, **attributes):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.attributes = attributes
+        self.outcome: Optional[str] = None
+        self.start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def restart(self):
+        """Time the turn from now, e.g. once waiting for the user is over."""
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str):
+        span_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append({
+                    "name": name,
+                    "start": span_start - self.start,
+                    "duration": end - span_start,
+                })
+
+    def mark(self, name: str):
+        """Record the first time `name` happens in this turn; later calls are ignored."""
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = time.perf_counter() - self.start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                **self.attributes,
+                "outcome": self.outcome,
+                "spans": list(self.spans),
+                "marks": dict(self.marks),
+            }
+
+
+class MetricsStore:
+    """Per-metric latency samples with percentiles, for every finished trace, plus plain counters."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES_PER_METRIC):
+        self.max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._sums: Dict[str, float] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.max_samples)
+                self._counts[name] = 0
+                self._sums[name] = 0.0
+
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._sums[name] += seconds
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def record_trace(self, trace: Trace):
+        for span in trace.spans:
+            self.observe(span["name"], span["duration"])
+        for name, seconds in trace.marks.items():
+            self.observe(name, seconds)
+
+    def percentiles(self, name: str) -> Dict[float, float]:
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+
+        if not samples:
+            return {}
+
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in QUANTILES}
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            names = list(self._samples)
+            totals = {name: (self._counts[name], self._sums[name]) for name in names}
+
+        return {
+            name: {"count": totals[name][0], "sum": totals[name][1], "percentiles": self.percentiles(name)}
+            for name in names
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            f"# HELP {METRIC_NAME} Latency of each assistant pipeline stage",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for name, stats in sorted(self.summary().items()):
+            for q, seconds in stats["percentiles"].items():
+                lines.append(f'{METRIC_NAME}{{stage="{name}",quantile="{q}"}} {seconds:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {stats["count"]}')
+
+        counters = self.counters()
+        if counters:
+            lines.append(f"# HELP {COUNTER_NAME} Counts of assistant events")
+            lines.append(f"# TYPE {COUNTER_NAME} counter")
+            for name, value in sorted(counters.items()):
+                lines.append(f'{COUNTER_NAME}{{event="{name}"}} {value:g}')
+
+        return "\n".join(lines) + "\n"
+
+
+_metrics = MetricsStore()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_export_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsStore:
+    return _metrics
+
+
+def start_trace(**attributes) -> Trace:
+    """Start timing a turn. Code running in this context (and tasks or threads started from it) records into it."""
+    trace = Trace(**attributes)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current turn; does nothing outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    with trace.span(name):
+        yield
+
+
+def mark(name: str):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(name)
+
+
+def finish_trace(trace: Optional[Trace] = None, outcome: Optional[str] = None):
+    """
+    Record the turn's timings and export them. Call it however the turn ended;
+    only completed turns count towards the whole-turn latency.
+    """
+    trace = trace or _current_trace.get()
+    if trace is None:
+        return
+
+    trace.outcome = trace.outcome or outcome or "completed"
+    if trace.outcome == "completed":
+        trace.mark("turn")
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    _metrics.record_trace(trace)
+    _metrics.increment(f"turns.{trace.outcome}")
+
+    timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in trace.marks.items())
+    logger.info(f"Trace {trace.trace_id} ({trace.outcome}): {timings}")
+
+    try:
+        _export(trace)
+    except OSError as e:
+        logger.warning(f"Failed to export metrics: {e}")
+
+
+def _export(trace: Trace):
+    export = get_metrics_export()
+    if not export:
+        return
+
+    path = get_metrics_path()
+    with _export_lock:
+        if export == "jsonl":
+            with open(path, "a") as f:
+                f.write(json.dumps(trace.to_dict()) + "\n")
+        elif export == "prometheus":
+            # written whole and swapped in, so a scraper never sees half a file
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(_metrics.to_prometheus())
+            os.replace(temp_path, path)
+        else:
+            logger.warning(f"Unknown metrics export '{export}'")
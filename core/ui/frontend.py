@@ -0,0 +1,319 @@
+from typing import Optional
+import logging
+import socket
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRIGGER_PORT = 8765
+
+
+class Frontend:
+    """
+    Where the assistant shows its status and gets its recording triggers from.
+
+    Subclasses override what they support; the base class does nothing and
+    triggers immediately, which is what benchmarks want.
+    """
+
+    def initialize(self):
+        pass
+
+    def run(self):
+        """Block the main thread for as long as the assistant should run."""
+        threading.Event().wait()
+
+    def attach_capture(self, capture):
+        """Called once the audio capture service is running."""
+        pass
+
+    def close(self):
+        pass
+
+    def show_waiting(self):
+        pass
+
+    def show_command_detected(self, command_text: str):
+        pass
+
+    def show_recording(self):
+        pass
+
+    def show_thinking(self):
+        pass
+
+    def show_response(self, response_text: str):
+        pass
+
+    def show_speaking(self):
+        pass
+
+    def wait_for_recording_trigger(self, timeout=None) -> bool:
+        return True
+
+    def take_trigger_position(self) -> Optional[int]:
+        """
+        Capture position the last trigger's speech started at, if the trigger
+        came from the audio itself, so the recording can start from there.
+        """
+        return None
+
+    def wait_for_recording_stop(self, timeout=None) -> bool:
+        return False
+
+    def clear_recording_stop(self):
+        pass
+
+    def wait_for_interrupt(self, timeout=None) -> bool:
+        return False
+
+
+class NullFrontend(Frontend):
+    """No UI, no waiting: every recording starts right away. Meant for benchmarks."""
+
+
+class TkFrontend(Frontend):
+    """The PersistentStatusWindow GUI. Tk is only imported when this is used."""
+
+    def initialize(self):
+        from core.ui.popup import initialize_window
+
+        self.window = initialize_window()
+        # draw the window now rather than when the main loop starts
+        self.window.root.update()
+
+    def run(self):
+        self.window.run()
+
+    def close(self):
+        self.window.root.destroy()
+
+    def show_waiting(self):
+        self.window.show_waiting()
+
+    def show_command_detected(self, command_text: str):
+        self.window.show_command_detected(command_text)
+
+    def show_recording(self):
+        self.window.show_recording()
+
+    def show_thinking(self):
+        self.window.show_thinking()
+
+    def show_response(self, response_text: str):
+        self.window.show_response(response_text)
+
+    def show_speaking(self):
+        self.window.show_speaking()
+
+    def wait_for_recording_trigger(self, timeout=None) -> bool:
+        return self.window.wait_for_recording_trigger(timeout)
+
+    def wait_for_recording_stop(self, timeout=None) -> bool:
+        return self.window.wait_for_recording_stop(timeout)
+
+    def clear_recording_stop(self):
+        self.window.clear_recording_stop()
+
+    def wait_for_interrupt(self, timeout=None) -> bool:
+        return self.window.wait_for_interrupt(timeout)
+
+
+class HeadlessFrontend(Frontend):
+    """
+    Frontend for units without a display.
+
+    Status changes are logged. Triggers come from one of:
+        stdin: pressing Enter in the terminal, like in the GUI
+        socket: any line sent to localhost:<port>
+        wake_word: saying the wake word
+    A trigger while waiting starts a recording, while recording stops it, and
+    during a response interrupts it.
+    """
+
+    def __init__(self, trigger: str = "stdin", port: int = DEFAULT_TRIGGER_PORT):
+        self.trigger = trigger
+        self.port = port
+        self.current_state = "waiting"
+        self.recording_trigger = threading.Event()
+        self.recording_stop = threading.Event()
+        self.interrupt_requested = threading.Event()
+        self._capture = None
+        self._trigger_position: Optional[int] = None
+
+    def initialize(self):
+        if self.trigger == "stdin":
+            threading.Thread(target=self._read_stdin, daemon=True).start()
+        elif self.trigger == "socket":
+            threading.Thread(target=self._serve_socket, daemon=True).start()
+        elif self.trigger != "wake_word":
+            raise ValueError(f"Unknown headless trigger '{self.trigger}'")
+
+        logger.info(f"Headless mode, triggering with {self.trigger}")
+
+    def attach_capture(self, capture):
+        if self.trigger == "wake_word" and self._capture is None:
+            self._capture = capture
+            threading.Thread(target=self._listen_for_wake_word, daemon=True).start()
+
+    def _on_trigger(self):
+        if self.current_state == "waiting":
+            self.recording_trigger.set()
+        elif self.current_state == "recording":
+            self.recording_stop.set()
+            logger.info("Trigger received - stopping recording")
+        else:
+            self.interrupt_requested.set()
+            logger.info("Trigger received - interrupting response")
+
+    def _read_stdin(self):
+        for _ in sys.stdin:
+            self._on_trigger()
+
+    def _serve_socket(self):
+        server = socket.create_server(("127.0.0.1", self.port))
+        logger.info(f"Listening for triggers on 127.0.0.1:{self.port}")
+
+        while True:
+            connection, _ = server.accept()
+            with connection, connection.makefile("r") as lines:
+                for _ in lines:
+                    self._on_trigger()
+
+    def _listen_for_wake_word(self):
+        from core.voice.stt import audio_stream_generator
+        from core.voice.wake_word import StreamingWakeWordEngine
+
+        reader = self._capture.reader()
+        engine = StreamingWakeWordEngine()
+
+        for chunk in audio_stream_generator(reader):
+            if self.current_state != "waiting":
+                engine.reset()
+                reader.skip_to_latest()
+                continue
+
+            if engine.process_chunk(chunk):
+                logger.info("🎯 Wake word detected!")
+                # detection comes a hop plus the inference time after the
+                # words, the recording starts back where the matched window did
+                self._trigger_position = reader.position - engine.detection_lag_samples
+                engine.reset()
+                self.recording_trigger.set()
+
+    def _set_state(self, state: str, detail: Optional[str] = None):
+        self.current_state = state
+        if detail is not None:
+            logger.info(f"[{state}] {detail}")
+        else:
+            logger.info(f"[{state}]")
+
+    def show_waiting(self):
+        self._set_state("waiting")
+
+    def show_command_detected(self, command_text: str):
+        self._set_state("command_detected", command_text)
+
+    def show_recording(self):
+        self._set_state("recording")
+
+    def show_thinking(self):
+        self._set_state("thinking")
+
+    def show_response(self, response_text: str):
+        # streamed responses call this per token, don't log every one
+        if self.current_state != "response":
+            self._set_state("response")
+        logger.debug(f"Response so far: '{response_text}'")
+
+    def show_speaking(self):
+        logger.info("[speaking]")
+
+    def wait_for_recording_trigger(self, timeout=None) -> bool:
+        is_triggered = self.recording_trigger.wait(timeout)
+        if is_triggered:
+            self.recording_trigger.clear()
+        return is_triggered
+
+    def take_trigger_position(self) -> Optional[int]:
+        position, self._trigger_position = self._trigger_position, None
+        return position
+
+    def wait_for_recording_stop(self, timeout=None) -> bool:
+        return self.recording_stop.wait(timeout)
+
+    def clear_recording_stop(self):
+        self.recording_stop.clear()
+
+    def wait_for_interrupt(self, timeout=None) -> bool:
+        is_interrupted = self.interrupt_requested.wait(timeout)
+        if is_interrupted:
+            self.interrupt_requested.clear()
+        return is_interrupted
+
+
+def create_frontend(kind: str, trigger: str = "stdin", port: int = DEFAULT_TRIGGER_PORT) -> Frontend:
+    if kind == "tk":
+        return TkFrontend()
+    if kind == "headless":
+        return HeadlessFrontend(trigger=trigger, port=port)
+    if kind == "none":
+        return NullFrontend()
+    raise ValueError(f"Unknown frontend '{kind}'")
+
+
+_frontend: Frontend = NullFrontend()
+
+
+def set_frontend(frontend: Frontend):
+    global _frontend
+    _frontend = frontend
+
+
+def get_frontend() -> Frontend:
+    return _frontend
+
+
+def show_waiting():
+    _frontend.show_waiting()
+
+
+def show_command_detected(command_text: str):
+    _frontend.show_command_detected(command_text)
+
+
+def show_recording():
+    _frontend.show_recording()
+
+
+def show_thinking():
+    _frontend.show_thinking()
+
+
+def show_response(response_text: str):
+    _frontend.show_response(response_text)
+
+
+def show_speaking():
+    _frontend.show_speaking()
+
+
+def wait_for_recording_trigger(timeout=None) -> bool:
+    return _frontend.wait_for_recording_trigger(timeout)
+
+
+def take_trigger_position() -> Optional[int]:
+    return _frontend.take_trigger_position()
+
+
+def wait_for_recording_stop(timeout=None) -> bool:
+    return _frontend.wait_for_recording_stop(timeout)
+
+
+def clear_recording_stop():
+    _frontend.clear_recording_stop()
+
+
+def wait_for_interrupt(timeout=None) -> bool:
+    return _frontend.wait_for_interrupt(timeout)
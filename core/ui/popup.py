@@ -5,8 +5,17 @@ from typing import Optional
 import queue
 import threading
 
+from utils.env_utils import is_barge_in_enabled
+
 logger = logging.getLogger(__name__)
 
+# backstop for wake-ups that couldn't be delivered (event_generate can fail from
+# other threads); cheap, it only touches Tk when something is queued
+POLL_INTERVAL_MS = 250
+
+# updates that redraw the whole window, making everything queued before them moot
+FULL_REDRAW_METHODS = ("set_waiting", "set_recording", "set_command_detected")
+
 
 class PersistentStatusWindow:
     def __init__(self):
@@ -20,8 +29,12 @@ class PersistentStatusWindow:
         self._animation_id = None
         self.recording_trigger = threading.Event()
         self.recording_stop = threading.Event()
+        self.interrupt_requested = threading.Event()
         self.is_recording = False
         self.voice_assistant_callback = None
+        self._displayed_text = ""
+        self._flush_scheduled = False
+        self._flush_lock = threading.Lock()
         
     def create_window(self):
         self.root = tk.Tk()
@@ -99,7 +112,9 @@ class PersistentStatusWindow:
         
         self.text_widget.config(state=tk.DISABLED)
         
-        self._check_updates()
+        self.root.bind("<<FlushUpdates>>", self._on_flush_updates)
+        # picks up anything queued before the main loop started, then keeps polling
+        self.root.after(0, self._poll_updates)
         
     def _on_closing(self):
         self.root.iconify()
@@ -111,57 +126,101 @@ class PersistentStatusWindow:
         elif self.is_recording:
             self.recording_stop.set()
             logger.info("Enter pressed - stopping recording")
+        else:
+            self.interrupt_requested.set()
+            logger.info("Enter pressed - interrupting response")
+        
+    def _request_flush(self):
+        """
+        Wake the Tk loop to apply queued updates. Only one wake-up is in flight
+        at a time, so a burst of updates costs a single redraw.
+        """
+        with self._flush_lock:
+            if self._flush_scheduled or self.root is None:
+                return
+            self._flush_scheduled = True
+
+        try:
+            self.root.event_generate("<<FlushUpdates>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            # main loop not running (yet), or Tk refused a call from this thread;
+            # _poll_updates picks the queue up shortly
+            with self._flush_lock:
+                self._flush_scheduled = False
+            
+    def _on_flush_updates(self, event):
+        with self._flush_lock:
+            self._flush_scheduled = False
+        self._check_updates()
+        
+    def _poll_updates(self):
+        if not self.update_queue.empty():
+            self._check_updates()
+        self.root.after(POLL_INTERVAL_MS, self._poll_updates)
         
     def _check_updates(self):
+        updates = []
         try:
             while True:
-                update = self.update_queue.get_nowait()
-                method = update.get("method")
-                
-                if method == "set_waiting":
-                    self._set_waiting_state()
-                elif method == "set_command_detected":
-                    self._set_command_detected_state(update.get("text", ""))
-                elif method == "set_recording":
-                    self._set_recording_state()
-                elif method == "set_thinking":
-                    self._set_thinking_state()
-                elif method == "set_response":
-                    self._set_response_state(update.get("text", ""))
-                elif method == "set_speaking":
-                    self._set_speaking_state()
-                    
+                updates.append(self.update_queue.get_nowait())
         except queue.Empty:
             pass
             
-        self.root.after(50, self._check_updates)
+        for update in _coalesce_updates(updates):
+            method = update.get("method")
+            
+            if method == "set_waiting":
+                self._set_waiting_state()
+            elif method == "set_command_detected":
+                self._set_command_detected_state(update.get("text", ""))
+            elif method == "set_recording":
+                self._set_recording_state()
+            elif method == "set_thinking":
+                self._set_thinking_state()
+            elif method == "set_response":
+                self._set_response_state(update.get("text", ""))
+            elif method == "set_speaking":
+                self._set_speaking_state()
+                
+    def _replace_text(self, text: str):
+        self.text_widget.config(state=tk.NORMAL)
+        self.text_widget.delete("1.0", tk.END)
+        self.text_widget.insert("1.0", text)
+        self.text_widget.config(state=tk.DISABLED)
+        self._displayed_text = text
+        
+    def _show_text(self, text: str):
+        """Show text, only inserting the new tail when it extends what's on screen."""
+        if text == self._displayed_text:
+            return
+        
+        if not self._displayed_text or not text.startswith(self._displayed_text):
+            self._replace_text(text)
+            return
+        
+        self.text_widget.config(state=tk.NORMAL)
+        self.text_widget.insert(tk.END, text[len(self._displayed_text):])
+        self.text_widget.config(state=tk.DISABLED)
+        self.text_widget.see(tk.END)
+        self._displayed_text = text
         
     def _set_waiting_state(self):
         self.current_state = "waiting"
         self.is_recording = False
         self.status_label.config(text="⌨️ Press ENTER to record...", fg='#00ff88')
-        self.text_widget.config(state=tk.NORMAL)
-        self.text_widget.delete("1.0", tk.END)
-        self.text_widget.insert("1.0", "Press ENTER in this window to start recording your command! 🎤\n\nMake sure this window is focused and press ENTER when ready.")
-        self.text_widget.config(state=tk.DISABLED)
+        self._replace_text("Press ENTER in this window to start recording your command! 🎤\n\nMake sure this window is focused and press ENTER when ready.")
         self._stop_animation()
         
     def _set_command_detected_state(self, command_text: str):
         self.current_state = "command_detected"
         self.status_label.config(text="🎤 Command detected:", fg='#00ccff')
-        self.text_widget.config(state=tk.NORMAL)
-        self.text_widget.delete("1.0", tk.END)
-        self.text_widget.insert("1.0", f"You said:\n\n\"{command_text}\"")
-        self.text_widget.config(state=tk.DISABLED)
+        self._replace_text(f"You said:\n\n\"{command_text}\"")
         
     def _set_recording_state(self):
         self.current_state = "recording"
         self.is_recording = True
         self.status_label.config(text="🔴 Recording... Press ENTER to stop", fg='#ff0000')
-        self.text_widget.config(state=tk.NORMAL)
-        self.text_widget.delete("1.0", tk.END)
-        self.text_widget.insert("1.0", "🔴 Recording in progress...\n\nSpeak your command now!\n\nPress ENTER again to stop recording.")
-        self.text_widget.config(state=tk.DISABLED)
+        self._replace_text("🔴 Recording in progress...\n\nSpeak your command now!\n\nPress ENTER again to stop recording.")
         
     def _set_thinking_state(self):
         self.current_state = "thinking"
@@ -171,17 +230,21 @@ class PersistentStatusWindow:
         self._start_thinking_animation()
         
     def _set_response_state(self, response_text: str):
-        self.current_state = "response"
-        self._stop_animation()
-        self.status_label.config(text="💭 Here's what I think:", fg='#00aaff')
-        self.text_widget.config(state=tk.NORMAL)
-        self.text_widget.delete("1.0", tk.END)
-        self.text_widget.insert("1.0", response_text)
-        self.text_widget.config(state=tk.DISABLED)
+        if self.current_state != "response":
+            self.current_state = "response"
+            self._stop_animation()
+            self.status_label.config(text="💭 Here's what I think:", fg='#00aaff')
+            self._replace_text(response_text)
+            return
+        
+        # streamed response, most updates just extend the text
+        self._show_text(response_text)
         
     def _set_speaking_state(self):
         if self.current_state == "response":
-            self.status_label.config(text="🔊 Speaking...", fg='#ff66cc')
+            # talking over Winston only interrupts with barge-in on
+            text = "🔊 Speaking... (just talk to interrupt)" if is_barge_in_enabled() else "🔊 Speaking..."
+            self.status_label.config(text=text, fg='#ff66cc')
             
     def _start_thinking_animation(self):
         self._animate_thinking()
@@ -203,26 +266,34 @@ class PersistentStatusWindow:
         
     def show_waiting(self):
         self.update_queue.put({"method": "set_waiting"})
+        self._request_flush()
         
     def show_command_detected(self, command_text: str):
         self.update_queue.put({"method": "set_command_detected", "text": command_text})
+        self._request_flush()
         
     def show_recording(self):
         self.update_queue.put({"method": "set_recording"})
+        self._request_flush()
         
     def show_thinking(self):
         self.update_queue.put({"method": "set_thinking"})
+        self._request_flush()
         
     def show_response(self, response_text: str):
         self.update_queue.put({"method": "set_response", "text": response_text})
+        self._request_flush()
         
     def show_speaking(self):
         self.update_queue.put({"method": "set_speaking"})
+        self._request_flush()
         
-    def wait_for_recording_trigger(self):
+    def wait_for_recording_trigger(self, timeout=None):
         """Wait for the recording trigger to be set, then clear it."""
-        self.recording_trigger.wait()
-        self.recording_trigger.clear()
+        is_triggered = self.recording_trigger.wait(timeout)
+        if is_triggered:
+            self.recording_trigger.clear()
+        return is_triggered
         
     def wait_for_recording_stop(self, timeout=None):
         """Wait for the recording stop trigger."""
@@ -232,10 +303,34 @@ class PersistentStatusWindow:
         """Clear the recording stop event."""
         self.recording_stop.clear()
         
+    def wait_for_interrupt(self, timeout=None):
+        """Wait for the user to interrupt the current response, then clear it."""
+        is_interrupted = self.interrupt_requested.wait(timeout)
+        if is_interrupted:
+            self.interrupt_requested.clear()
+        return is_interrupted
+        
     def run(self):
         self.root.mainloop()
 
 
+def _coalesce_updates(updates):
+    """
+    Reduce a batch of updates to what it takes to show the latest state.
+    Everything before the last full redraw is overwritten by it, and of each
+    remaining kind only the latest matters, since text updates carry the full
+    text. Kinds keep the order they first appeared in, so e.g. the speaking
+    label still comes after the response it belongs to.
+    """
+    start = max((i for i, update in enumerate(updates) if update.get("method") in FULL_REDRAW_METHODS), default=0)
+
+    # assigning to an existing key keeps its first position in the dict
+    coalesced = {}
+    for update in updates[start:]:
+        coalesced[update.get("method")] = update
+    return list(coalesced.values())
+
+
 _window_instance: Optional[PersistentStatusWindow] = None
 
 
@@ -281,10 +376,11 @@ def show_speaking():
         _window_instance.show_speaking()
 
 
-def wait_for_recording_trigger():
+def wait_for_recording_trigger(timeout=None):
     """Wait for the user to press Enter to start recording."""
     if _window_instance:
-        _window_instance.wait_for_recording_trigger()
+        return _window_instance.wait_for_recording_trigger(timeout)
+    return True
 
 
 def wait_for_recording_stop(timeout=None):
@@ -300,5 +396,12 @@ def clear_recording_stop():
         _window_instance.clear_recording_stop()
 
 
+def wait_for_interrupt(timeout=None):
+    """Wait for the user to press Enter while a response is in progress."""
+    if _window_instance:
+        return _window_instance.wait_for_interrupt(timeout)
+    return False
+
+
 def close_popup():
     show_waiting()
\ No newline at end of file
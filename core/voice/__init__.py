@@ -1,8 +1,28 @@
-from .stt import load_whisper_model, transcribe_audio_buffer, check_wake_word
-from .tts import speak_response
+import importlib
+
+# submodules are only imported when one of their names is first used, so
+# importing e.g. core.voice.capture doesn't drag in the STT and TTS stacks
+_LAZY_EXPORTS = {
+    "warmup_whisper_model": ".stt",
+    "unload_whisper_model": ".stt",
+    "transcribe_audio_buffer": ".stt",
+    "check_wake_word": ".stt",
+    "speak_response": ".tts",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
-    "load_whisper_model",
+    "warmup_whisper_model",
+    "unload_whisper_model",
     "transcribe_audio_buffer",
     "check_wake_word",
     "speak_response",
@@ -0,0 +1,82 @@
+from io import BytesIO
+from typing import Optional
+import numpy as np
+import wave
+
+INT16_SCALE = 1.0 / 32768.0
+
+
+def int16_to_float32(samples: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Scale int16 samples to float32 in [-1, 1) in a single pass (one allocation, or none with `out`)."""
+    return np.multiply(samples, INT16_SCALE, out=out, dtype=np.float32)
+
+
+def chunk_level(samples: np.ndarray) -> float:
+    """Mean absolute amplitude of a chunk, on the same 0..1 scale as float audio."""
+    if samples.dtype == np.int16:
+        return float(np.abs(samples, dtype=np.float32).mean()) * INT16_SCALE
+    return float(np.abs(samples).mean())
+
+
+def float32_to_int16(samples: np.ndarray) -> np.ndarray:
+    samples = np.clip(samples, -1.0, 1.0)
+    return (samples * 32767).astype(np.int16)
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> BytesIO:
+    """Encode mono int16 samples as a WAV file in memory, without copying them first."""
+    wav_buffer = BytesIO()
+    with wave.open(wav_buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)  # Mono
+        wav_file.setsampwidth(2)  # 2 bytes for int16
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(memoryview(np.ascontiguousarray(samples)).cast("B"))
+
+    wav_buffer.seek(0)
+    return wav_buffer
+
+
+class AudioBuffer:
+    """
+    Growable int16 recording buffer.
+
+    Chunks are copied once into a single preallocated array (capacity doubles
+    when full), which is half the memory of keeping float32 chunks and needs no
+    concatenate at the end. Float audio is only produced when asked for.
+    """
+
+    def __init__(self, sample_rate: int, initial_seconds: float = 10.0):
+        self.sample_rate = sample_rate
+        self._data = np.empty(int(initial_seconds * sample_rate), dtype=np.int16)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def duration_seconds(self) -> float:
+        return self._size / self.sample_rate
+
+    @property
+    def samples(self) -> np.ndarray:
+        """View of the recorded int16 samples (valid until the next append)."""
+        return self._data[:self._size]
+
+    def append(self, chunk: np.ndarray):
+        needed = self._size + len(chunk)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, len(self._data) * 2), dtype=np.int16)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+        self._data[self._size:needed] = chunk
+        self._size = needed
+
+    def to_float32(self) -> np.ndarray:
+        return int16_to_float32(self.samples)
+
+    def to_wav(self) -> BytesIO:
+        return encode_wav(self.samples, self.sample_rate)
+
+    def clear(self):
+        self._size = 0
@@ -0,0 +1,154 @@
+from typing import Callable, Optional
+import numpy as np
+import logging
+import threading
+import time
+
+from core.voice.audio_buffer import int16_to_float32
+from core.voice.capture import CaptureService
+from core.voice.playback import UNMETERED_OUTPUT_LEVEL, get_output_level
+from core.voice.vad import VoiceActivityDetector
+from utils.env_utils import is_pcm_playback_enabled
+
+logger = logging.getLogger(__name__)
+
+# how long the user has to talk over the assistant before it stops, short
+# enough to feel responsive, long enough to ignore a cough or "mm-hm"
+MIN_BARGE_IN_SECONDS = 0.3
+
+CHECK_SECONDS = 0.05
+
+# mic level must be this many times what the speaker alone would explain
+ECHO_MARGIN = 2.5
+# the share of output level that shows up in the mic, learnt while the user is quiet
+INITIAL_ECHO_COUPLING = 0.5
+ECHO_COUPLING_RATE = 0.05
+# for unmetered playback the "output level" is a stand-in, so start from a
+# typical echo level instead: a speaker at normal volume a little way from
+# the mic, which with the margin lets through speech above ~0.075 RMS
+INITIAL_UNMETERED_ECHO_LEVEL = 0.03
+# only chunks this close to the expected echo teach the coupling; louder ones
+# may have the user in them, just not loud enough to get through yet
+LEARN_MARGIN = 1.5
+# nor do the chunks right after the user got through, they are likely still talking
+LEARN_HOLDOFF_SECONDS = 0.5
+# without a reference signal (MP3 playback), speech must also be this much louder than usual
+NO_REFERENCE_SPEECH_RATIO = 6.0
+
+
+class EchoGate:
+    """
+    Tells the user's voice apart from the assistant's own voice coming back
+    through the mic, using the known output level as the reference.
+
+    It learns how much of the output leaks into the mic (the coupling) from
+    chunks that are fully explained by the output, and only lets through
+    chunks well above what that echo would produce. For unmetered playback
+    the output level is a constant, so this learns the typical echo level.
+    One gate is kept for the whole session, so what it learnt carries over
+    from one response to the next.
+    """
+
+    def __init__(self, margin: float = ECHO_MARGIN, is_metered: Optional[bool] = None):
+        if is_metered is None:
+            is_metered = is_pcm_playback_enabled()
+
+        self.margin = margin
+        self.coupling = INITIAL_ECHO_COUPLING if is_metered else INITIAL_UNMETERED_ECHO_LEVEL / UNMETERED_OUTPUT_LEVEL
+        self._holdoff_until = 0.0
+
+    def is_user_speech(self, mic_level: float, output_level: float) -> bool:
+        if output_level <= 0:
+            return True
+
+        now = time.monotonic()
+        expected_echo = self.coupling * output_level
+        if mic_level > expected_echo * self.margin:
+            self._holdoff_until = now + LEARN_HOLDOFF_SECONDS
+            return True
+
+        if now >= self._holdoff_until and mic_level <= expected_echo * LEARN_MARGIN:
+            self.coupling += (mic_level / output_level - self.coupling) * ECHO_COUPLING_RATE
+        return False
+
+
+class BargeInWatcher:
+    """
+    Watches the microphone while the assistant talks and calls `on_barge_in`
+    once the user has been speaking over it for `min_speech_seconds`.
+
+    Reads from its own cursor into the capture ring, so it doesn't disturb the
+    recording path, and records when the speech started so the next recording
+    can begin from there without losing the first words. Pass the session's
+    `echo_gate` so the echo level it learnt is kept across turns.
+    """
+
+    def __init__(
+        self,
+        capture: CaptureService,
+        on_barge_in: Callable[[], None],
+        min_speech_seconds: float = MIN_BARGE_IN_SECONDS,
+        silence_threshold: float = 0.01,
+        echo_gate: Optional[EchoGate] = None,
+    ):
+        self.capture = capture
+        self.on_barge_in = on_barge_in
+        self.min_speech_seconds = min_speech_seconds
+        self.silence_threshold = silence_threshold
+        self.echo_gate = echo_gate or EchoGate()
+        self.speech_started_at: Optional[float] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def detected(self) -> bool:
+        return self.speech_started_at is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="barge-in", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _watch(self):
+        sample_rate = self.capture.sample_rate
+        reader = self.capture.reader()
+        vad = VoiceActivityDetector(sample_rate, min_threshold=self.silence_threshold)
+        if not is_pcm_playback_enabled():
+            vad.speech_ratio = max(vad.speech_ratio, NO_REFERENCE_SPEECH_RATIO)
+
+        check_frames = int(CHECK_SECONDS * sample_rate)
+        min_speech_frames = int(self.min_speech_seconds * sample_rate)
+        speech_frames = 0
+
+        while not self._stop.is_set():
+            samples = reader.read_samples(check_frames, timeout=CHECK_SECONDS * 2)
+            if samples is None:
+                continue
+
+            chunk = int16_to_float32(samples)
+            mic_level = float(np.sqrt(np.mean(chunk * chunk)))
+            output_level = get_output_level() or 0.0
+
+            is_voiced = vad.process(chunk)
+            if is_voiced and self.echo_gate.is_user_speech(mic_level, output_level):
+                speech_frames += check_frames
+            else:
+                speech_frames = 0
+
+            if speech_frames >= min_speech_frames:
+                self.speech_started_at = time.monotonic() - speech_frames / sample_rate
+                logger.info("🗣️ User started talking, interrupting the response")
+                self.on_barge_in()
+                return
@@ -0,0 +1,190 @@
+from typing import Optional
+import numpy as np
+import pyaudio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_SAMPLE_RATE = 16000
+CAPTURE_FRAMES_PER_BUFFER = 1024
+RING_BUFFER_SECONDS = 30.0
+
+# audio kept from just before a recording starts so the first syllable isn't lost
+PRE_ROLL_SECONDS = 0.5
+
+
+class CaptureService:
+    """
+    One long-lived input stream feeding a preallocated int16 ring buffer.
+
+    PyAudio calls `_on_audio` from its own thread (callback mode). The callback
+    first announces how far it is about to write, copies the samples in and
+    then publishes the new total, so readers never take a lock to read; they
+    check afterwards that the writer hasn't started overwriting what they
+    copied (seqlock style). Consumers get a `CaptureReader` positioned at any
+    point still in the buffer.
+    """
+
+    def __init__(
+        self,
+        audio: pyaudio.PyAudio,
+        sample_rate: int = CAPTURE_SAMPLE_RATE,
+        buffer_seconds: float = RING_BUFFER_SECONDS,
+        frames_per_buffer: int = CAPTURE_FRAMES_PER_BUFFER,
+    ):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.capacity = int(buffer_seconds * sample_rate)
+
+        self._ring = np.zeros(self.capacity, dtype=np.int16)
+        self._frames_written = 0
+        # where the write in progress will end; ahead of _frames_written only during a write
+        self._write_end = 0
+        self._last_write_time = 0.0
+        self._data_ready = threading.Condition()
+        self._stream: Optional[pyaudio.Stream] = None
+        self.overflow_count = 0
+
+    @property
+    def frames_written(self) -> int:
+        return self._frames_written
+
+    def start(self):
+        if self._stream is not None:
+            return
+
+        self._stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._on_audio,
+        )
+        self._stream.start_stream()
+        logger.info("Audio capture started")
+
+    def stop(self):
+        if self._stream is None:
+            return
+
+        self._stream.stop_stream()
+        self._stream.close()
+        self._stream = None
+        logger.info(f"Audio capture stopped ({self.overflow_count} input overflows)")
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paInputOverflow:
+            self.overflow_count += 1
+
+        self.write(np.frombuffer(in_data, dtype=np.int16))
+        return None, pyaudio.paContinue
+
+    def write(self, samples: np.ndarray):
+        """Append samples to the ring. Only ever called from the single writer thread."""
+        count = len(samples)
+        self._write_end = self._frames_written + count
+        if count > self.capacity:
+            samples = samples[-self.capacity:]
+            self._frames_written += count - self.capacity
+            count = self.capacity
+
+        start = self._frames_written % self.capacity
+        first = min(count, self.capacity - start)
+        self._ring[start:start + first] = samples[:first]
+        self._ring[:count - first] = samples[first:]
+
+        self._last_write_time = time.monotonic()
+        self._frames_written += count
+
+        with self._data_ready:
+            self._data_ready.notify_all()
+
+    def position_at(self, timestamp: float) -> int:
+        """Sample position captured at a `time.monotonic()` timestamp."""
+        age = self._last_write_time - timestamp
+        return self._frames_written - int(age * self.sample_rate)
+
+    def copy_range(self, start: int, end: int) -> Optional[np.ndarray]:
+        """
+        Copy samples [start, end) out of the ring.
+        Returns None if the writer has overwritten part of that range, before
+        or while it was copied.
+        """
+        if self._write_end - start > self.capacity:
+            return None
+
+        ring_start = start % self.capacity
+        count = end - start
+        first = min(count, self.capacity - ring_start)
+        out = np.empty(count, dtype=np.int16)
+        out[:first] = self._ring[ring_start:ring_start + first]
+        out[first:] = self._ring[:count - first]
+
+        # a write that started while copying may have reached the range, the
+        # copy could be torn; _write_end is set before the ring is touched
+        if self._write_end - start > self.capacity:
+            return None
+
+        return out
+
+    def wait_for_frames(self, position: int, timeout: Optional[float] = None) -> bool:
+        with self._data_ready:
+            return self._data_ready.wait_for(lambda: self._frames_written >= position, timeout)
+
+    def reader(self, pre_roll_seconds: float = 0.0, timestamp: Optional[float] = None) -> "CaptureReader":
+        """A reader starting at `timestamp` (default: now), minus the pre-roll."""
+        position = self._frames_written if timestamp is None else self.position_at(timestamp)
+        return CaptureReader(self, position - int(pre_roll_seconds * self.sample_rate))
+
+
+class CaptureReader:
+    """
+    Independent read cursor into a CaptureService.
+
+    Has the same `read`/`stop_stream` surface as a PyAudio input stream, so it can
+    be passed anywhere a stream is used today.
+    """
+
+    def __init__(self, service: CaptureService, position: int):
+        self.service = service
+        self.position = max(position, service.frames_written - service.capacity, 0)
+        self.dropped_frames = 0
+
+    def skip_to_latest(self, pre_roll_seconds: float = 0.0):
+        """Move the cursor to the newest audio, keeping `pre_roll_seconds` before it."""
+        service = self.service
+        self.seek(service.frames_written - int(pre_roll_seconds * service.sample_rate))
+
+    def seek(self, position: int):
+        """Move the cursor to a sample position, as far back as the ring still holds."""
+        service = self.service
+        self.position = min(max(position, service.frames_written - service.capacity, 0), service.frames_written)
+
+    def read_samples(self, num_frames: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        while True:
+            if not self.service.wait_for_frames(self.position + num_frames, timeout):
+                return None
+
+            samples = self.service.copy_range(self.position, self.position + num_frames)
+            if samples is not None:
+                self.position += num_frames
+                return samples
+
+            # fell more than a full ring behind, jump to the oldest audio still there
+            oldest = self.service.frames_written - self.service.capacity + num_frames
+            self.dropped_frames += oldest - self.position
+            logger.warning(f"Capture reader fell behind, dropped {oldest - self.position} frames")
+            self.position = oldest
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        return self.read_samples(num_frames).tobytes()
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
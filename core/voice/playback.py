@@ -0,0 +1,229 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterable, Optional, Tuple
+import numpy as np
+import pyaudio
+import logging
+import threading
+import time
+
+from core.tracing import mark
+from utils.env_utils import get_tts_sample_rate
+
+logger = logging.getLogger(__name__)
+
+# raw PCM rates ElevenLabs can return
+SUPPORTED_PCM_RATES = [16000, 22050, 24000, 44100]
+DEFAULT_PCM_RATE = 24000
+
+# ~20 ms of audio per write keeps cancellation responsive
+WRITE_FRAMES = 512
+
+# output written this long ago can still be coming back through the mic
+# (device buffers plus the room), and enough history to cover it
+ECHO_WINDOW_SECONDS = 0.4
+OUTPUT_LEVEL_HISTORY = 128
+
+# stands in for the level of audio played elsewhere (MP3 through the SDK),
+# only whether something is playing is known then
+UNMETERED_OUTPUT_LEVEL = 1.0
+
+
+def choose_pcm_rate(audio: pyaudio.PyAudio) -> int:
+    """
+    Pick the PCM rate to request: TTS_SAMPLE_RATE if set, otherwise the output
+    device's native rate if ElevenLabs supports it, so nothing gets resampled.
+    """
+    configured_rate = get_tts_sample_rate()
+    if configured_rate:
+        return configured_rate
+
+    try:
+        device_rate = int(audio.get_default_output_device_info()["defaultSampleRate"])
+    except (IOError, OSError, KeyError) as e:
+        logger.warning(f"Could not query output device rate: {e}")
+        return DEFAULT_PCM_RATE
+
+    if device_rate in SUPPORTED_PCM_RATES:
+        return device_rate
+
+    return DEFAULT_PCM_RATE
+
+
+class PcmPlayer:
+    """
+    Plays streamed 16-bit mono PCM straight into a long-lived PyAudio output stream.
+
+    The stream is opened once and reused, so there's no decoder or player
+    process to start per utterance. `cancel` stops playback mid-utterance and
+    keeps anything else from playing until `reset` is called for the next turn,
+    so a cancel that comes in before the first chunk isn't lost.
+    """
+
+    def __init__(self, sample_rate: Optional[int] = None):
+        self._audio = pyaudio.PyAudio()
+        self.sample_rate = sample_rate or choose_pcm_rate(self._audio)
+        self._stream: Optional[pyaudio.Stream] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self.is_playing = False
+        # (time written, RMS) of recent output blocks, the reference for echo gating
+        self._output_levels: Deque[Tuple[float, float]] = deque(maxlen=OUTPUT_LEVEL_HISTORY)
+
+    @property
+    def output_format(self) -> str:
+        return f"pcm_{self.sample_rate}"
+
+    def open(self):
+        if self._stream is not None:
+            return
+
+        self._stream = self._audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            output=True,
+            frames_per_buffer=WRITE_FRAMES,
+        )
+        logger.debug(f"Opened PCM output stream at {self.sample_rate} Hz")
+
+    def play_stream(self, chunks: Iterable[bytes]) -> bool:
+        """
+        Write PCM chunks to the speakers as they arrive.
+
+        Returns:
+            True if everything was played, False if playback was cancelled
+        """
+        with self._lock:
+            self.open()
+            self.is_playing = True
+
+            bytes_per_write = WRITE_FRAMES * 2
+            leftover = b""
+
+            try:
+                for chunk in chunks:
+                    data = leftover + chunk
+                    # keep whole int16 samples, carry an odd trailing byte over
+                    usable = len(data) - (len(data) % 2)
+                    leftover = data[usable:]
+
+                    for offset in range(0, usable, bytes_per_write):
+                        if self._cancelled.is_set():
+                            self._flush_output()
+                            _close_iterator(chunks)
+                            logger.info("Playback cancelled")
+                            return False
+
+                        block = data[offset:min(offset + bytes_per_write, usable)]
+                        self._stream.write(block)
+                        mark("playback.first_audio")
+                        self._output_levels.append((time.monotonic(), _block_rms(block)))
+
+                return True
+            finally:
+                self.is_playing = False
+
+    def recent_output_level(self, window_seconds: float = ECHO_WINDOW_SECONDS) -> float:
+        """Loudest output block written in the last `window_seconds`, 0..1."""
+        since = time.monotonic() - window_seconds
+        return max((rms for written_at, rms in list(self._output_levels) if written_at >= since), default=0.0)
+
+    def cancel(self):
+        """Stop the current utterance as soon as possible, and the rest of the turn's."""
+        self._cancelled.set()
+
+    def reset(self):
+        """Allow playback again, at the start of a new turn."""
+        self._cancelled.clear()
+
+    def _flush_output(self):
+        # dropping queued device buffers makes the cut-off immediate
+        self._stream.stop_stream()
+        self._stream.start_stream()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._audio.terminate()
+
+
+def _block_rms(block: bytes) -> float:
+    samples = np.frombuffer(block, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) / 32768.0 if len(samples) else 0.0
+
+
+def _close_iterator(chunks: Iterable[bytes]):
+    """Close a generator so the underlying HTTP download stops too."""
+    close = getattr(chunks, "close", None)
+    if close:
+        close()
+
+
+_player: Optional[PcmPlayer] = None
+_player_lock = threading.Lock()
+
+_unmetered_playback_count = 0
+_unmetered_playback_ended = 0.0
+_unmetered_lock = threading.Lock()
+
+
+def get_pcm_player() -> PcmPlayer:
+    """Get the shared PCM player, opening the output device on first use."""
+    global _player
+
+    with _player_lock:
+        if _player is None:
+            _player = PcmPlayer()
+            _player.open()
+
+        return _player
+
+
+@contextmanager
+def unmetered_playback():
+    """Mark audio as playing through something other than the PCM player."""
+    global _unmetered_playback_count, _unmetered_playback_ended
+
+    with _unmetered_lock:
+        _unmetered_playback_count += 1
+    try:
+        yield
+    finally:
+        with _unmetered_lock:
+            _unmetered_playback_count -= 1
+            _unmetered_playback_ended = time.monotonic()
+
+
+def get_output_level(window_seconds: float = ECHO_WINDOW_SECONDS) -> Optional[float]:
+    """
+    Recent speaker output level. While unmetered playback is going on it's
+    UNMETERED_OUTPUT_LEVEL, and None when no output has been seen at all.
+    """
+    if _unmetered_playback_count or time.monotonic() - _unmetered_playback_ended < window_seconds:
+        return UNMETERED_OUTPUT_LEVEL
+    if _player is None:
+        return None
+    return _player.recent_output_level(window_seconds)
+
+
+def cancel_playback():
+    """Cancel whatever the shared player is playing, and will play, until the next turn starts."""
+    if _player is not None:
+        _player.cancel()
+
+
+def reset_playback():
+    """Start a new turn: clears a cancel left over from the previous one."""
+    if _player is not None:
+        _player.reset()
+
+
+def close_pcm_player():
+    global _player
+
+    with _player_lock:
+        if _player is not None:
+            _player.close()
+            _player = None
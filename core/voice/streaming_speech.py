@@ -0,0 +1,141 @@
+from typing import Callable, Iterable, Iterator, List, Optional
+import contextvars
+import logging
+import queue
+import re
+import threading
+
+from core.voice.tts import play_audio, synthesize_speech
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+MIN_SENTENCE_CHARS = 12
+
+_END_OF_STREAM = None
+
+
+def iter_sentences(text_stream: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """
+    Re-chunk a stream of text pieces into sentences.
+
+    Very short sentences are merged with the next one so TTS isn't called for
+    a lone "Oh." and the voice doesn't sound choppy.
+    """
+    pending = ""
+
+    for piece in text_stream:
+        pending += piece
+        parts = SENTENCE_END.split(pending)
+
+        sentence = ""
+        for part in parts[:-1]:
+            sentence = f"{sentence} {part}".strip() if sentence else part.strip()
+            if len(sentence) >= min_chars:
+                yield sentence
+                sentence = ""
+
+        pending = f"{sentence} {parts[-1]}" if sentence else parts[-1]
+
+    if pending.strip():
+        yield pending.strip()
+
+
+def speak_streaming_response(
+    text_stream: Iterable[str],
+    on_text: Optional[Callable[[str], None]] = None,
+    on_first_audio: Optional[Callable[[], None]] = None,
+    max_pending: int = 4,
+    cancel_event: Optional[threading.Event] = None,
+) -> str:
+    """
+    Speak a response while it is still being generated.
+
+    Sentences are synthesized on one worker thread and played on another, so
+    the next sentence is synthesized while the current one plays.
+
+    Args:
+        text_stream: Pieces of response text, e.g. from stream_llm_with_command
+        on_text: Called with the full text so far every time a piece arrives
+        on_first_audio: Called once, right before the first sentence plays
+        max_pending: Max sentences waiting for synthesis or playback
+        cancel_event: Once set, nothing more is generated, synthesized or played
+
+    Returns:
+        The response text, up to where it was cancelled
+    """
+    cancel_event = cancel_event or threading.Event()
+    sentence_queue: queue.Queue = queue.Queue(maxsize=max_pending)
+    audio_queue: queue.Queue = queue.Queue(maxsize=max_pending)
+    errors: List[Exception] = []
+
+    def synthesize_worker():
+        try:
+            while True:
+                sentence = sentence_queue.get()
+                if sentence is _END_OF_STREAM:
+                    break
+                if cancel_event.is_set():
+                    continue
+
+                logger.debug(f"Synthesizing sentence: '{sentence}'")
+                audio_queue.put(synthesize_speech(sentence))
+        except Exception as e:
+            errors.append(e)
+            # keep draining so the producer never blocks on a full queue
+            while sentence_queue.get() is not _END_OF_STREAM:
+                pass
+        finally:
+            audio_queue.put(_END_OF_STREAM)
+
+    def playback_worker():
+        has_started = False
+        try:
+            while True:
+                audio = audio_queue.get()
+                if audio is _END_OF_STREAM:
+                    break
+                if cancel_event.is_set():
+                    continue
+
+                if not has_started and on_first_audio:
+                    on_first_audio()
+                has_started = True
+
+                play_audio(audio)
+        except Exception as e:
+            errors.append(e)
+            # keep draining so the synthesizer never blocks on a full queue
+            while audio_queue.get() is not _END_OF_STREAM:
+                pass
+
+    # run the workers in copies of this context so they record into the current trace
+    synthesizer = threading.Thread(target=contextvars.copy_context().run, args=(synthesize_worker,), daemon=True)
+    player = threading.Thread(target=contextvars.copy_context().run, args=(playback_worker,), daemon=True)
+    synthesizer.start()
+    player.start()
+
+    response_parts = []
+
+    def tracked_text():
+        for piece in text_stream:
+            response_parts.append(piece)
+            if on_text:
+                on_text("".join(response_parts))
+            yield piece
+
+    try:
+        for sentence in iter_sentences(tracked_text()):
+            if errors or cancel_event.is_set():
+                break
+            sentence_queue.put(sentence)
+    finally:
+        sentence_queue.put(_END_OF_STREAM)
+        synthesizer.join()
+        player.join()
+
+    if errors:
+        raise errors[0]
+
+    return "".join(response_parts)
@@ -0,0 +1,201 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+import numpy as np
+import logging
+import time
+
+from core.tracing import get_metrics
+from core.voice.stt import CHUNK_SIZE, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# how long `finish` waits for segments still being transcribed before
+# transcribing the whole recording instead
+FINISH_TIMEOUT_SECONDS = 10.0
+
+
+class StreamingTranscriber(ABC):
+    """
+    Interface for transcribing a command while it is still being recorded.
+
+    Call `send` for every recorded chunk, read `partial_transcript` at any time,
+    and call `finish` once recording stops to get the final text.
+    """
+
+    @abstractmethod
+    def send(self, chunk: np.ndarray, is_silent: bool):
+        pass
+
+    @abstractmethod
+    def partial_transcript(self) -> str:
+        pass
+
+    def is_caught_up(self) -> bool:
+        """Whether the partial transcript covers all the speech sent so far."""
+        return False
+
+    def flush(self):
+        """Start transcribing the speech sent so far now, e.g. at a pause the caller noticed first."""
+
+    @abstractmethod
+    def finish(self) -> Optional[str]:
+        pass
+
+    def close(self):
+        """Free background resources; safe to call more than once, and after `finish`."""
+
+
+class SegmentedStreamingTranscriber(StreamingTranscriber):
+    """
+    Splits the recording into segments at short pauses and transcribes each
+    finished segment on a background thread while the user keeps talking.
+
+    By the time the silence window closes, everything but the last segment is
+    already transcribed. Segments that are entirely silent are never sent.
+    If a segment fails or they don't all finish within `finish_timeout`, the
+    whole recording is transcribed in one go instead.
+    """
+
+    def __init__(
+        self,
+        pause_seconds: float = 0.5,
+        max_segment_seconds: float = 10.0,
+        on_partial: Optional[Callable[[str], None]] = None,
+        finish_timeout: float = FINISH_TIMEOUT_SECONDS,
+    ):
+        chunk_seconds = CHUNK_SIZE / SAMPLE_RATE
+        self.pause_chunks = max(1, int(pause_seconds / chunk_seconds))
+        self.max_segment_chunks = max(1, int(max_segment_seconds / chunk_seconds))
+        self.on_partial = on_partial
+        self.finish_timeout = finish_timeout
+
+        self._audio: List[np.ndarray] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-upload")
+        self._futures: List[Future] = []
+        self._segment: List[np.ndarray] = []
+        self._segment_voiced = False
+        self._trailing_silence = 0
+
+    @abstractmethod
+    def transcribe_segment(self, audio: np.ndarray) -> Optional[str]:
+        pass
+
+    def send(self, chunk: np.ndarray, is_silent: bool):
+        self._audio.append(chunk)
+        self._segment.append(chunk)
+
+        if is_silent:
+            self._trailing_silence += 1
+        else:
+            self._trailing_silence = 0
+            self._segment_voiced = True
+
+        paused_after_speech = self._segment_voiced and self._trailing_silence >= self.pause_chunks
+        if paused_after_speech or len(self._segment) >= self.max_segment_chunks:
+            self._flush_segment()
+
+    def _flush_segment(self):
+        segment, is_voiced = self._segment, self._segment_voiced
+        self._segment = []
+        self._segment_voiced = False
+        self._trailing_silence = 0
+
+        if not is_voiced:
+            return
+
+        audio = np.concatenate(segment)
+        logger.debug(f"Uploading {len(audio) / SAMPLE_RATE:.2f}s segment for transcription")
+        future = self._executor.submit(self.transcribe_segment, audio)
+        future.add_done_callback(self._notify_partial)
+        self._futures.append(future)
+
+    def _notify_partial(self, _future: Future):
+        if self.on_partial:
+            self.on_partial(self.partial_transcript())
+
+    def partial_transcript(self) -> str:
+        texts = []
+        for future in self._futures:
+            if not future.done():
+                break
+            if future.exception() is None and future.result():
+                texts.append(future.result().strip())
+        return " ".join(texts)
+
+    def is_caught_up(self) -> bool:
+        return not self._segment_voiced and all(future.done() for future in self._futures)
+
+    def flush(self):
+        if self._segment_voiced:
+            self._flush_segment()
+
+    def finish(self) -> Optional[str]:
+        try:
+            self._flush_segment()
+
+            try:
+                texts = self._segment_texts()
+            except Exception as e:
+                logger.warning(f"Segment transcription failed ({e!r}), transcribing the whole recording")
+                get_metrics().increment("stt.segment_fallbacks")
+                texts = [self.transcribe_segment(np.concatenate(self._audio))] if self._audio else []
+
+            texts = [text.strip() for text in texts if text and text.strip()]
+            if not texts:
+                logger.debug("No speech segments transcribed")
+                return None
+
+            return " ".join(texts)
+        finally:
+            self.close()
+
+    def _segment_texts(self) -> List[Optional[str]]:
+        _, not_done = wait(self._futures, timeout=self.finish_timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} segments not transcribed within {self.finish_timeout:.1f} seconds")
+
+        return [future.result() for future in self._futures]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ElevenLabsStreamingTranscriber(SegmentedStreamingTranscriber):
+    """
+    Segmented streaming transcription through the STT policy: ElevenLabs by
+    default, with local Whisper as the fallback when it is configured.
+    """
+
+    def transcribe_segment(self, audio: np.ndarray) -> Optional[str]:
+        from core.voice.stt_providers import transcribe_command
+
+        return transcribe_command(audio)
+
+
+class LocalStreamingTranscriber(SegmentedStreamingTranscriber):
+    """
+    Local stand-in backend for tests and offline runs.
+
+    Uses `transcribe_fn` if given, otherwise returns a deterministic placeholder
+    describing the segment. `latency_seconds` simulates network time.
+    """
+
+    def __init__(
+        self,
+        transcribe_fn: Optional[Callable[[np.ndarray], Optional[str]]] = None,
+        latency_seconds: float = 0.0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.transcribe_fn = transcribe_fn
+        self.latency_seconds = latency_seconds
+
+    def transcribe_segment(self, audio: np.ndarray) -> Optional[str]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        if self.transcribe_fn is not None:
+            return self.transcribe_fn(audio)
+
+        return f"[speech {len(audio) / SAMPLE_RATE:.2f}s]"
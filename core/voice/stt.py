@@ -1,17 +1,27 @@
-from collections import deque
 from enum import Enum
 from typing import List, Optional
-from elevenlabs import ElevenLabs
 import pyaudio
-from io import BytesIO
 import numpy as np
 import logging
-import threading
-import time
+import math
 import select
 import sys
 
-from utils.env_utils import get_environment_variable, is_development
+from core.clients import get_elevenlabs_client
+from core.resilience import call_remote
+from core.tracing import current_trace, span
+from core.voice.audio_buffer import (
+    AudioBuffer,
+    float32_to_int16,
+    int16_to_float32,
+)
+from core.voice.stt_encoding import EncodedAudio, create_upload_encoder, encode_for_upload
+from core.voice.vad import VoiceActivityDetector
+from utils.env_utils import (
+    get_whisper_device,
+    get_whisper_model_size,
+    is_development,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,58 +37,52 @@ class ListeningState(Enum):
     FINISHED = 3
 
 
-def audio_stream_generator(stream: pyaudio.Stream, chunk_size: int = CHUNK_SIZE):
+def read_audio_chunks(stream: pyaudio.Stream, chunk_size: int = CHUNK_SIZE):
     """
-    Generator that yields audio chunks from a PyAudio stream.
+    Generator that yields raw int16 audio chunks from a PyAudio stream.
+    The chunks are read-only views over the bytes PyAudio returned, no copies.
     """
     while True:
         audio_data = stream.read(chunk_size, exception_on_overflow=False)
 
-        audio_array = np.frombuffer(audio_data, dtype=np.int16)
+        yield np.frombuffer(audio_data, dtype=np.int16)
 
-        audio_array = audio_array.astype(np.float32) / 32768.0
 
-        yield audio_array
+def audio_stream_generator(stream: pyaudio.Stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Generator that yields audio chunks from a PyAudio stream.
+    """
+    for audio_array in read_audio_chunks(stream, chunk_size):
+        yield int16_to_float32(audio_array)
 
 
 def waiting_for_wake_word_handler(
-    wake_word_buffer,
+    wake_word_engine,
     chunk,
-    chunk_count,
     state,
     command_buffer,
 ):
     """
     Handle waiting for wake word if check.
     """
-    wake_word_buffer.append(chunk)
-
-    are_chunks_ready = len(wake_word_buffer) >= 4 and chunk_count % 4 == 0
-    if not are_chunks_ready:
-        return state, command_buffer
-
-    wake_word_list = list(wake_word_buffer)
-    audio_to_check = np.concatenate(wake_word_list)
-    transcription = transcribe_audio_buffer(audio_to_check)
-
-    is_transcription_ready = transcription and check_wake_word(
-        transcription, WAKE_WORDS
-    )
-
-    if not is_transcription_ready:
+    if not wake_word_engine.process_chunk(chunk):
         return state, command_buffer
 
     if is_development():
         print("🎯 Wake word detected! Recording command...")
     logger.info("🎯 Wake word detected! Switching to command recording mode")
 
-    return ListeningState.RECORDING_COMMAND, list(wake_word_buffer)
+    return ListeningState.RECORDING_COMMAND, [wake_word_engine.recent_audio()]
 
 
 def record_command_on_keypress(
     audio_source: pyaudio.Stream,
     silence_threshold: float = 0.01,
     max_silence_seconds: float = 3.0,
+    transcriber=None,
+    wait_for_trigger: bool = True,
+    speculator=None,
+    max_wait_for_speech_seconds: float = 5.0,
 ) -> Optional[str]:
     """
     Wait for GUI Enter key press, then record audio until Enter is pressed again or silence.
@@ -87,53 +91,92 @@ def record_command_on_keypress(
         audio_source: PyAudio stream
         silence_threshold: Threshold for detecting silence
         max_silence_seconds: Seconds of silence before stopping recording
+        transcriber: Optional StreamingTranscriber that transcribes while recording
+        wait_for_trigger: False to start recording right away from where the
+            source is, e.g. after the user barged in
+        speculator: Optional LlmSpeculator that starts the LLM on the
+            transcriber's interim transcript during pauses
+        max_wait_for_speech_seconds: Seconds of silence before stopping a
+            recording nobody has started talking in yet
         
     Returns:
         Transcribed command text or None if no command captured
     """
-    from core.ui.popup import wait_for_recording_trigger, show_recording, wait_for_recording_stop, clear_recording_stop
-    
-    logger.info("Waiting for Enter key press in GUI...")
+    from core.ui.frontend import (
+        wait_for_recording_trigger, take_trigger_position, show_recording, wait_for_recording_stop, clear_recording_stop
+    )
+    from core.voice.capture import PRE_ROLL_SECONDS, CaptureReader
+    from core.voice.stt_providers import transcribe_command
     
-    wait_for_recording_trigger()
+    if wait_for_trigger:
+        logger.info("Waiting for Enter key press in GUI...")
+        
+        wait_for_recording_trigger()
+        
+        if isinstance(audio_source, CaptureReader):
+            trigger_position = take_trigger_position()
+            if trigger_position is not None:
+                audio_source.seek(trigger_position - int(PRE_ROLL_SECONDS * audio_source.service.sample_rate))
+            else:
+                audio_source.skip_to_latest(PRE_ROLL_SECONDS)
     
     clear_recording_stop()
     
     show_recording()
     
-    command_buffer = []
-    consecutive_silence = 0
-    max_silence_chunks = int(max_silence_seconds / 0.25)
-    
-    audio_generator = audio_stream_generator(audio_source)
+    command_buffer = AudioBuffer(SAMPLE_RATE)
+    vad = VoiceActivityDetector(SAMPLE_RATE, min_threshold=silence_threshold)
+    # the upload is encoded as the audio comes in, so it's ready when recording stops
+    encoder = create_upload_encoder(SAMPLE_RATE) if transcriber is None else None
+    chunk_count = 0
     
     logger.info("🔴 Recording... (press Enter again to stop or wait for silence)")
     
-    for chunk in audio_generator:
-        command_buffer.append(chunk)
-        
-        if wait_for_recording_stop(timeout=0.001):
-            logger.info("Enter pressed - stopping recording")
-            break
-        
-        is_silent = np.abs(chunk).mean() < silence_threshold
-        
-        if is_silent:
-            consecutive_silence += 1
-        else:
-            consecutive_silence = 0
+    try:
+        with span("capture"):
+            for chunk in read_audio_chunks(audio_source):
+                command_buffer.append(chunk)
+                chunk_count += 1
+            
+                is_silent = not vad.process(chunk)
+            
+                if encoder is not None:
+                    encoder.send(chunk, is_silent)
             
-        if consecutive_silence >= max_silence_chunks:
-            logger.info("Silence detected, finishing recording")
-            break
+                if transcriber is not None:
+                    transcriber.send(chunk, is_silent)
+                    if speculator is not None:
+                        speculator.update(transcriber, vad.trailing_silence_seconds)
             
-        if len(command_buffer) > 120:
-            logger.info("Maximum recording time reached")
-            break
+                if wait_for_recording_stop(timeout=0.001):
+                    logger.info("Enter pressed - stopping recording")
+                    break
+            
+                if vad.has_ended(max_silence_seconds, max_wait_for_speech_seconds):
+                    logger.info("Silence detected, finishing recording")
+                    break
+                
+                if chunk_count > 120:
+                    logger.info("Maximum recording time reached")
+                    break
+    except BaseException:
+        # finish() never runs, so its upload thread has to be freed here
+        if transcriber is not None:
+            transcriber.close()
+        raise
+
+    # the rest of the turn is timed from when the user stopped speaking
+    trace = current_trace()
+    if trace is not None:
+        trace.restart()
     
-    if command_buffer:
-        full_audio = np.concatenate(command_buffer)
-        full_command = eleven_labs_stt(full_audio)
+    if transcriber is not None:
+        with span("stt"):
+            return transcriber.finish()
+    
+    if len(command_buffer):
+        with span("stt"):
+            full_command = transcribe_command(command_buffer, upload=encoder.finish())
         return full_command
     
     logger.debug("No command captured")
@@ -145,6 +188,7 @@ def check_audio_stream_for_wake_word(
     timeout_seconds: Optional[float] = None,
     silence_threshold: float = 0.01,
     max_silence_seconds: float = 2.0,
+    wake_word_detector=None,
 ) -> Optional[str]:
     """
     Check audio stream for wake word and capture the following command.
@@ -154,86 +198,89 @@ def check_audio_stream_for_wake_word(
         timeout_seconds: Maximum time to listen (None for no timeout)
         silence_threshold: Threshold for detecting silence
         max_silence_seconds: Seconds of silence before stopping command recording
+        wake_word_detector: WakeWordDetector to use (defaults to Whisper)
 
     Returns:
         Tuple of (wake_word_detected, command_text)
     """
+    from core.voice.stt_providers import transcribe_command
+    from core.voice.wake_word import StreamingWakeWordEngine
+
     logger.debug("Starting wake word detection...")
     audio_generator = audio_stream_generator(audio_source)
 
-    wake_word_buffer = deque(maxlen=12)
+    vad = VoiceActivityDetector(SAMPLE_RATE, min_threshold=silence_threshold)
+    wake_word_engine = StreamingWakeWordEngine(
+        detector=wake_word_detector,
+        silence_threshold=silence_threshold,
+        vad=vad,
+    )
     command_buffer = []
     state = ListeningState.WAITING_FOR_WAKE_WORD
 
-    consecutive_silence = 0
-    max_silence_chunks = int(max_silence_seconds / 0.25)
-
-    chunk_count = 0
-
     for chunk in audio_generator:
-        is_silent = np.abs(chunk).mean() < silence_threshold
-
         if state == ListeningState.WAITING_FOR_WAKE_WORD:
-            new_state, new_command_buffer = waiting_for_wake_word_handler(
-                wake_word_buffer, chunk, chunk_count, state, command_buffer
+            state, command_buffer = waiting_for_wake_word_handler(
+                wake_word_engine, chunk, state, command_buffer
             )
-
-            state = new_state
-            command_buffer = new_command_buffer
+            continue
 
         if state == ListeningState.RECORDING_COMMAND:
             command_buffer.append(chunk)
             logger.debug(f"Recording command chunk {len(command_buffer)}")
 
-            if not is_silent:
-                consecutive_silence = 0
-                continue
-
-            consecutive_silence += 1
+            vad.process(chunk)
 
-            if consecutive_silence >= max_silence_chunks:
+            if vad.trailing_silence_seconds >= max_silence_seconds:
                 state = ListeningState.FINISHED
                 logger.info("Silence detected, finishing command recording")
                 break
 
-        chunk_count += 1
-
     audio_source.stop_stream()
 
     if command_buffer and state == ListeningState.FINISHED:
         full_audio = np.concatenate(command_buffer)
-        full_command = eleven_labs_stt(full_audio)
+        full_command = transcribe_command(full_audio)
         return full_command
 
     logger.debug("No command captured")
     return None
 
 
-def load_whisper_model():
+def get_wake_word_service():
+    """The Whisper worker pool for the wake-word model (WHISPER_MODEL_SIZE / WHISPER_DEVICE)."""
+    from core.voice.whisper_worker import get_whisper_service
+
+    return get_whisper_service(get_whisper_model_size(), device=get_whisper_device())
+
+
+def warmup_whisper_model():
     """
-    Load the Whisper model for speech-to-text transcription.
+    Start the Whisper worker processes and run one pass on silence so the
+    first real transcription doesn't pay for loading the model.
     """
-    from whisper import load_model
+    get_wake_word_service().warmup()
+    logger.info("Whisper model warmed up")
 
-    return load_model("tiny")
 
-
-def transcribe_audio_buffer(audio_buffer, model = None):
+def unload_whisper_model():
     """
-    Transcribe audio data from a buffer using the Whisper model.
+    Stop the Whisper worker processes so the model's memory can be
+    reclaimed. The next transcription starts them again.
     """
-    logger.debug("🎤 Starting Whisper transcription...")
-    if model is None:
-        model = load_whisper_model()
+    get_wake_word_service().stop()
+    logger.info("Whisper model unloaded")
 
-    result = model.transcribe(audio_buffer, temperature=0.2, without_timestamps=True)
-    logger.debug("Whisper transcription completed")
 
-    if result["text"] is None:
-        logger.warning("Whisper returned no text")
-        return None
+def transcribe_audio_buffer(audio_buffer) -> Optional[str]:
+    """Transcribe audio data from a buffer in the Whisper worker processes."""
+    from core.voice.whisper_worker import WAKE_WORD_TEMPERATURE
 
-    return str(result["text"]).strip()
+    logger.debug("🎤 Starting Whisper transcription...")
+    # sampled like the wake-word windows, as this always has been
+    text = get_wake_word_service().transcribe(audio_buffer, temperature=WAKE_WORD_TEMPERATURE)
+    logger.debug("Whisper transcription completed")
+    return text
 
 
 def check_wake_word(transcribed_audio: str, wake_words: List[str]) -> bool:
@@ -248,33 +295,54 @@ def check_wake_word(transcribed_audio: str, wake_words: List[str]) -> bool:
     return False
 
 
-def eleven_labs_stt(audio_buffer):
+def eleven_labs_stt(
+    audio_buffer,
+    upload: Optional[EncodedAudio] = None,
+    timeout: Optional[float] = None,
+) -> Optional[str]:
+    """
+    Transcribe audio with ElevenLabs. Accepts an AudioBuffer, int16 samples,
+    or float samples in [-1, 1]; `upload` is the same audio already encoded
+    while it was recorded, otherwise it is encoded here. `timeout` bounds
+    each HTTP request, so one given up on doesn't keep uploading. Returns
+    None when there is no speech to send.
+    """
     logger.info("Starting ElevenLabs STT transcription...")
-    import numpy as np
-    import wave
-
-    elevenlabs = ElevenLabs(api_key=get_environment_variable("ELEVENLABS_API_KEY"))
-    logger.debug("Initialized ElevenLabs client for STT")
-
-    audio_buffer = np.clip(audio_buffer, -1.0, 1.0)
-    audio_int16 = (audio_buffer * 32767).astype(np.int16)
-    logger.debug("Audio buffer processed for WAV conversion")
-
-    wav_buffer = BytesIO()
-    with wave.open(wav_buffer, "wb") as wav_file:
-        wav_file.setnchannels(1)  # Mono
-        wav_file.setsampwidth(2)  # 2 bytes for int16
-        wav_file.setframerate(16000)
-        wav_file.writeframes(audio_int16.tobytes())
-    logger.debug("WAV buffer created")
-
-    wav_buffer.seek(0)
-
-    response = elevenlabs.speech_to_text.convert(
-        file=wav_buffer,
-        model_id="scribe_v1",
-        tag_audio_events=True,
+
+    elevenlabs = get_elevenlabs_client()
+
+    if upload is None:
+        with span("stt.encode"):
+            if isinstance(audio_buffer, AudioBuffer):
+                samples = audio_buffer.samples
+            elif audio_buffer.dtype == np.int16:
+                samples = audio_buffer
+            else:
+                samples = float32_to_int16(audio_buffer)
+            upload = encode_for_upload(samples, SAMPLE_RATE)
+
+    if upload.is_empty:
+        logger.info("No speech in the recording, skipping transcription")
+        return None
+
+    logger.debug(
+        f"Uploading {len(upload.data) / 1024:.0f} KB of {upload.format} "
+        f"for {upload.duration_seconds:.1f}s of audio"
     )
+
+    request_options = {"timeout_in_seconds": math.ceil(timeout)} if timeout is not None else None
+
+    def request():
+        # a fresh file per attempt, retries and hedged duplicates each read it from the start
+        return elevenlabs.speech_to_text.convert(
+            file=upload.to_file(),
+            model_id="scribe_v1",
+            tag_audio_events=True,
+            request_options=request_options,
+        )
+
+    with span("stt.request"):
+        response = call_remote("elevenlabs", "stt", request, payload_bytes=len(upload.data))
     logger.debug("ElevenLabs STT API call completed")
 
     transcribed_text = response.text
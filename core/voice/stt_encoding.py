@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Optional
+import numpy as np
+import logging
+import wave
+
+from core.voice.audio_buffer import float32_to_int16
+from core.voice.vad import VoiceActivityDetector
+from utils.env_utils import get_stt_upload_format, is_stt_silence_trimming_enabled
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FORMATS = ("wav", "flac", "ogg_opus")
+
+# libsndfile format, subtype and file extension of the compressed formats
+SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", "PCM_16", "flac"),
+    "ogg_opus": ("OGG", "OPUS", "ogg"),
+}
+
+# silence kept either side of the speech when trimming, so word edges aren't clipped
+TRIM_PAD_SECONDS = 0.25
+
+# chunk size for encoding a whole recording at once
+ENCODE_CHUNK_FRAMES = 1024
+
+_warned_formats = set()
+
+
+@dataclass
+class EncodedAudio:
+    """A recording encoded for upload."""
+
+    data: bytes
+    format: str
+    file_name: str
+    duration_seconds: float
+
+    @property
+    def is_empty(self) -> bool:
+        """True when trimming found no speech at all, so there's nothing worth uploading."""
+        return not self.data
+
+    def to_file(self) -> BytesIO:
+        """A fresh file object to upload, named so the format shows in its extension."""
+        upload = BytesIO(self.data)
+        upload.name = self.file_name
+        return upload
+
+
+class UploadEncoder:
+    """
+    Encodes a command for upload chunk by chunk while it is being recorded,
+    so there's nothing left to do when recording stops.
+
+    Feed it every recorded chunk with whether the VAD heard speech in it. With
+    `trim_silence`, silence before the first speech and after the last is left
+    out apart from a little padding. Silence in between is held back until more
+    speech follows, so the encoder is never more than a pause behind.
+    """
+
+    format = "wav"
+    extension = "wav"
+
+    def __init__(self, sample_rate: int, trim_silence: bool = False, pad_seconds: float = TRIM_PAD_SECONDS):
+        self.sample_rate = sample_rate
+        self.trim_silence = trim_silence
+        self.pad_frames = int(pad_seconds * sample_rate)
+
+        self._buffer = BytesIO()
+        self._held: List[np.ndarray] = []
+        self._held_frames = 0
+        self._has_speech = False
+        self._written_frames = 0
+        self._open()
+
+    def send(self, chunk: np.ndarray, is_silent: bool):
+        if chunk.dtype != np.int16:
+            chunk = float32_to_int16(chunk)
+
+        if not self.trim_silence:
+            self._write_frames(chunk)
+            return
+
+        if is_silent:
+            self._held.append(chunk)
+            self._held_frames += len(chunk)
+            if not self._has_speech:
+                self._drop_held_silence(keep_frames=self.pad_frames)
+            return
+
+        for held in self._held:
+            self._write_frames(held)
+        self._held.clear()
+        self._held_frames = 0
+
+        self._has_speech = True
+        self._write_frames(chunk)
+
+    def finish(self) -> EncodedAudio:
+        if self.trim_silence and self._has_speech:
+            remaining = self.pad_frames
+            for held in self._held:
+                if remaining <= 0:
+                    break
+                self._write_frames(held[:remaining])
+                remaining -= len(held)
+
+        self._close()
+        data = self._buffer.getvalue() if self._written_frames else b""
+        return EncodedAudio(
+            data=data,
+            format=self.format,
+            file_name=f"command.{self.extension}",
+            duration_seconds=self._written_frames / self.sample_rate,
+        )
+
+    def _drop_held_silence(self, keep_frames: int):
+        while self._held and self._held_frames - len(self._held[0]) >= keep_frames:
+            self._held_frames -= len(self._held.pop(0))
+
+    def _write_frames(self, samples: np.ndarray):
+        self._write(samples)
+        self._written_frames += len(samples)
+
+    def _open(self):
+        self._wav_file = wave.open(self._buffer, "wb")
+        self._wav_file.setnchannels(1)
+        self._wav_file.setsampwidth(2)
+        self._wav_file.setframerate(self.sample_rate)
+
+    def _write(self, samples: np.ndarray):
+        self._wav_file.writeframes(memoryview(np.ascontiguousarray(samples)).cast("B"))
+
+    def _close(self):
+        self._wav_file.close()
+
+
+class SoundFileUploadEncoder(UploadEncoder):
+    """FLAC or Opus in Ogg through libsndfile, roughly 2x and 10x smaller than WAV for speech."""
+
+    def __init__(self, upload_format: str, sample_rate: int, **kwargs):
+        self.format = upload_format
+        self._sf_format, self._sf_subtype, self.extension = SOUNDFILE_FORMATS[upload_format]
+        super().__init__(sample_rate, **kwargs)
+
+    def _open(self):
+        import soundfile
+
+        self._sound_file = soundfile.SoundFile(
+            self._buffer,
+            mode="w",
+            samplerate=self.sample_rate,
+            channels=1,
+            format=self._sf_format,
+            subtype=self._sf_subtype,
+        )
+
+    def _write(self, samples: np.ndarray):
+        self._sound_file.write(samples)
+
+    def _close(self):
+        self._sound_file.close()
+
+
+def is_upload_format_available(upload_format: str) -> bool:
+    if upload_format == "wav":
+        return True
+    if upload_format not in SOUNDFILE_FORMATS:
+        return False
+
+    try:
+        import soundfile
+    except (ImportError, OSError):
+        return False
+
+    sf_format, sf_subtype, _ = SOUNDFILE_FORMATS[upload_format]
+    return sf_subtype in soundfile.available_subtypes(sf_format)
+
+
+def create_upload_encoder(
+    sample_rate: int,
+    upload_format: Optional[str] = None,
+    trim_silence: Optional[bool] = None,
+) -> UploadEncoder:
+    """An encoder for the configured upload format, or WAV if that format can't be written here."""
+    upload_format = upload_format or get_stt_upload_format()
+    if trim_silence is None:
+        trim_silence = is_stt_silence_trimming_enabled()
+
+    if upload_format != "wav" and not is_upload_format_available(upload_format):
+        if upload_format not in _warned_formats:
+            _warned_formats.add(upload_format)
+            logger.warning(
+                f"STT upload format '{upload_format}' isn't available (expected one of "
+                f"{', '.join(UPLOAD_FORMATS)}, compressed ones need soundfile), uploading WAV"
+            )
+        upload_format = "wav"
+
+    if upload_format == "wav":
+        return UploadEncoder(sample_rate, trim_silence=trim_silence)
+
+    return SoundFileUploadEncoder(upload_format, sample_rate, trim_silence=trim_silence)
+
+
+def encode_for_upload(
+    samples: np.ndarray,
+    sample_rate: int,
+    upload_format: Optional[str] = None,
+    trim_silence: Optional[bool] = None,
+) -> EncodedAudio:
+    """Encode a whole recording at once, running a VAD over it if silence is trimmed."""
+    encoder = create_upload_encoder(sample_rate, upload_format, trim_silence)
+    vad = VoiceActivityDetector(sample_rate) if encoder.trim_silence else None
+
+    for start in range(0, len(samples), ENCODE_CHUNK_FRAMES):
+        chunk = samples[start:start + ENCODE_CHUNK_FRAMES]
+        encoder.send(chunk, is_silent=vad is not None and not vad.process(chunk))
+
+    return encoder.finish()
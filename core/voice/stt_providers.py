@@ -0,0 +1,310 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+import numpy as np
+import contextvars
+import logging
+import threading
+import time
+
+from core.resilience import CALL_POLICIES
+from core.voice.audio_buffer import AudioBuffer, float32_to_int16
+from core.voice.stt import SAMPLE_RATE, eleven_labs_stt
+from core.voice.stt_encoding import EncodedAudio
+from core.voice.whisper_worker import get_whisper_service
+from utils.env_utils import (
+    get_local_stt_max_seconds,
+    get_stt_policy_mode,
+    get_stt_timeout,
+    get_whisper_device,
+    get_whisper_stt_model_size,
+    is_whisper_fp16_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+STT_POLICIES = ("local_only", "cloud_only", "local_first", "cloud_first", "race")
+
+
+def as_int16_samples(audio) -> np.ndarray:
+    """Samples of an AudioBuffer, int16 array or float array in [-1, 1], as int16."""
+    if isinstance(audio, AudioBuffer):
+        return audio.samples
+    if audio.dtype == np.int16:
+        return audio
+    return float32_to_int16(audio)
+
+
+class SttProvider(ABC):
+    """
+    Interface for something that turns a recorded command into text. Providers
+    stop working on a request once `timeout` runs out rather than leaving it
+    running in the background.
+    """
+
+    name = "stt"
+
+    @abstractmethod
+    def transcribe(
+        self,
+        samples: np.ndarray,
+        timeout: Optional[float] = None,
+        upload: Optional[EncodedAudio] = None,
+    ) -> Optional[str]:
+        """`upload` is the samples already encoded for upload, for providers that send files."""
+
+    def close(self):
+        pass
+
+
+class ElevenLabsSttProvider(SttProvider):
+    name = "elevenlabs"
+
+    def transcribe(
+        self,
+        samples: np.ndarray,
+        timeout: Optional[float] = None,
+        upload: Optional[EncodedAudio] = None,
+    ) -> Optional[str]:
+        return eleven_labs_stt(samples, upload=upload, timeout=timeout)
+
+
+class WhisperSttProvider(SttProvider):
+    """Local Whisper in the worker process pool; no network needed."""
+
+    name = "whisper"
+
+    def __init__(self, model_size: str = "base", device: Optional[str] = None, fp16: bool = False):
+        self.service = get_whisper_service(model_size, device=device, fp16=fp16)
+
+    def warmup(self):
+        self.service.warmup()
+
+    def transcribe(
+        self,
+        samples: np.ndarray,
+        timeout: Optional[float] = None,
+        upload: Optional[EncodedAudio] = None,
+    ) -> Optional[str]:
+        logger.info("Starting local Whisper transcription...")
+        future = self.service.submit(samples, timeout=timeout)
+        try:
+            text = future.result(timeout=timeout)
+        except TimeoutError:
+            # still queued behind other audio, don't let it take a worker later
+            future.cancel()
+            raise
+        logger.info(f"Whisper transcription: '{text}'")
+        return text
+
+    def close(self):
+        self.service.stop()
+
+
+class SttPolicy:
+    """
+    Decides which provider transcribes a command.
+
+    local_only / cloud_only: just that provider
+    local_first / cloud_first: that provider, then the other one if it fails
+        or times out; with `local_max_seconds` set, commands at most that long
+        go to the local provider first either way
+    race: both at once, the first good answer wins
+
+    An empty transcript counts as a failure, so the next provider still gets
+    its turn; it is only returned, as None, when no provider heard anything.
+    `timeout` is for a short command, longer uploads get the same extra time
+    per MB as the STT call policy.
+    """
+
+    def __init__(
+        self,
+        local: SttProvider,
+        cloud: SttProvider,
+        mode: str = "cloud_first",
+        timeout: float = 10.0,
+        local_max_seconds: float = 0.0,
+    ):
+        if mode not in STT_POLICIES:
+            raise ValueError(f"Unknown STT policy '{mode}', expected one of {', '.join(STT_POLICIES)}")
+
+        self.local = local
+        self.cloud = cloud
+        self.mode = mode
+        self.timeout = timeout
+        self.local_max_seconds = local_max_seconds
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stt")
+
+    @property
+    def prefers_local(self) -> bool:
+        """Whether the local provider is ever tried first, i.e. worth loading ahead of time."""
+        return self.mode in ("local_only", "local_first", "race") or (
+            self.mode == "cloud_first" and self.local_max_seconds > 0
+        )
+
+    def providers_for(self, duration_seconds: float) -> List[SttProvider]:
+        if self.mode == "local_only":
+            return [self.local]
+        if self.mode == "cloud_only":
+            return [self.cloud]
+        if self.mode == "local_first" or duration_seconds <= self.local_max_seconds:
+            return [self.local, self.cloud]
+        return [self.cloud, self.local]
+
+    def timeout_for(self, samples: np.ndarray, upload: Optional[EncodedAudio] = None) -> float:
+        # without an upload, the 16-bit WAV it would be encoded to is the most it can be
+        payload_bytes = len(upload.data) if upload is not None else samples.nbytes
+        return self.timeout + CALL_POLICIES["stt"].allowance(payload_bytes)
+
+    def transcribe(self, audio, upload: Optional[EncodedAudio] = None) -> Optional[str]:
+        samples = as_int16_samples(audio)
+        if len(samples) == 0:
+            return None
+
+        timeout = self.timeout_for(samples, upload)
+        if self.mode == "race":
+            return self._race(samples, timeout, upload)
+
+        last_error: Optional[Exception] = None
+        is_empty = False
+        for provider in self.providers_for(len(samples) / SAMPLE_RATE):
+            try:
+                text = self._transcribe_with(provider, samples, timeout, upload)
+            except Exception as e:
+                logger.warning(f"{provider.name} STT failed: {e!r}")
+                last_error = e
+                continue
+
+            if text:
+                return text
+
+            logger.info(f"{provider.name} STT heard nothing")
+            is_empty = True
+
+        if is_empty:
+            return None
+        raise last_error
+
+    def _transcribe_with(
+        self,
+        provider: SttProvider,
+        samples: np.ndarray,
+        timeout: float,
+        upload: Optional[EncodedAudio] = None,
+    ) -> Optional[str]:
+        start = time.time()
+        future = self._submit(provider, samples, timeout, upload)
+        try:
+            text = future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+        logger.debug(f"{provider.name} STT took {time.time() - start:.2f} seconds")
+        return text
+
+    def _submit(
+        self,
+        provider: SttProvider,
+        samples: np.ndarray,
+        timeout: float,
+        upload: Optional[EncodedAudio] = None,
+    ):
+        # in a copy of this context so provider spans land in the current trace
+        return self._executor.submit(
+            contextvars.copy_context().run, provider.transcribe, samples, timeout, upload
+        )
+
+    def _race(self, samples: np.ndarray, timeout: float, upload: Optional[EncodedAudio] = None) -> Optional[str]:
+        futures = {
+            self._submit(provider, samples, timeout, upload): provider for provider in (self.local, self.cloud)
+        }
+
+        last_error: Optional[Exception] = None
+        is_empty = False
+        pending = set(futures)
+        deadline = time.monotonic() + timeout
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0.0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.warning(f"{futures[future].name} STT failed: {e!r}")
+                    last_error = e
+                    continue
+
+                # an empty answer only wins if the other provider has nothing better
+                if not text:
+                    is_empty = True
+                    continue
+
+                logger.debug(f"{futures[future].name} won the STT race")
+                for loser in pending:
+                    loser.cancel()
+                return text
+
+        for future in pending:
+            future.cancel()
+
+        if is_empty:
+            return None
+
+        raise last_error or TimeoutError(f"No STT provider answered within {timeout:.1f} seconds")
+
+    def close(self):
+        self.local.close()
+        self.cloud.close()
+        self._executor.shutdown(wait=False)
+
+
+_stt_policy: Optional[SttPolicy] = None
+_stt_policy_lock = threading.Lock()
+
+
+def get_stt_policy() -> SttPolicy:
+    """The process-wide STT policy, configured from the environment on first use."""
+    global _stt_policy
+
+    with _stt_policy_lock:
+        if _stt_policy is None:
+            _stt_policy = SttPolicy(
+                local=WhisperSttProvider(
+                    get_whisper_stt_model_size(),
+                    device=get_whisper_device(),
+                    fp16=is_whisper_fp16_enabled(),
+                ),
+                cloud=ElevenLabsSttProvider(),
+                mode=get_stt_policy_mode(),
+                timeout=get_stt_timeout(),
+                local_max_seconds=get_local_stt_max_seconds(),
+            )
+
+        return _stt_policy
+
+
+def transcribe_command(audio, upload: Optional[EncodedAudio] = None) -> Optional[str]:
+    """
+    Transcribe a recorded command with the configured providers. `upload` is
+    the command already encoded while it was recorded, if it was.
+    """
+    return get_stt_policy().transcribe(audio, upload)
+
+
+def warmup_stt_providers():
+    """Start and warm the local provider if the policy will use it first."""
+    policy = get_stt_policy()
+    if policy.prefers_local and isinstance(policy.local, WhisperSttProvider):
+        policy.local.warmup()
+        logger.info("Local STT ready")
+
+
+def close_stt_providers():
+    global _stt_policy
+
+    with _stt_policy_lock:
+        if _stt_policy is not None:
+            _stt_policy.close()
+            _stt_policy = None
@@ -1,23 +1,182 @@
-from elevenlabs import ElevenLabs, VoiceSettings, play
+from functools import lru_cache
+from typing import Iterator, Optional
+import logging
+import threading
 
-from utils.env_utils import get_environment_variable
+from core.clients import get_elevenlabs_client
+from core.resilience import call_remote, stream_remote
+from core.tracing import mark, span
+from core.voice.tts_cache import STOCK_PHRASES, audio_cache_key, get_audio_cache
+from utils.env_utils import is_pcm_playback_enabled
 
+logger = logging.getLogger(__name__)
 
-def speak_response(text: str):
-    """Convert text to speech using ElevenLabs."""
-    elevenlabs = ElevenLabs(api_key=get_environment_variable("ELEVENLABS_API_KEY"))
+VOICE_ID = "Fahco4VZzobUeiPqni1S"
+MODEL_ID = "eleven_turbo_v2_5"
+MP3_OUTPUT_FORMAT = "mp3_44100_128"
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 1.0,
+    "use_speaker_boost": False,
+    "speed": 1.0,
+}
+
+
+@lru_cache(maxsize=1)
+def _voice_settings():
+    # the elevenlabs SDK is slow to import, keep it off the startup path
+    from elevenlabs import VoiceSettings
+
+    return VoiceSettings(**VOICE_SETTINGS)
+
+
+def _output_format() -> str:
+    if is_pcm_playback_enabled():
+        from core.voice.playback import get_pcm_player
+
+        return get_pcm_player().output_format
+
+    return MP3_OUTPUT_FORMAT
+
+
+def _cache_key(text: str, output_format: str) -> str:
+    return audio_cache_key(
+        text,
+        voice_id=VOICE_ID,
+        model_id=MODEL_ID,
+        output_format=output_format,
+        voice_settings=VOICE_SETTINGS,
+    )
+
+
+def stream_speech(text: str) -> Iterator[bytes]:
+    """Stream synthesized audio for the text from ElevenLabs as it is generated."""
+    output_format = _output_format()
+    cache = get_audio_cache()
+
+    if cache is not None:
+        key = _cache_key(text, output_format)
+        cached_audio = cache.get(key)
+        if cached_audio is not None:
+            logger.debug(f"TTS cache hit for '{text}'")
+            return iter([cached_audio])
+
+    elevenlabs = get_elevenlabs_client()
     # TODO: add options for multiple voices, based on the name detected? :thonk: or what user selected later
-    response = elevenlabs.text_to_speech.convert(
-        voice_id="Fahco4VZzobUeiPqni1S",
-        output_format="mp3_44100_128",
+    chunks = stream_remote("elevenlabs", "tts", lambda: elevenlabs.text_to_speech.stream(
+        voice_id=VOICE_ID,
+        output_format=output_format,
         text=text,
-        model_id="eleven_turbo_v2_5",
-        voice_settings=VoiceSettings(
-            stability=0.5,
-            similarity_boost=1.0,
-            use_speaker_boost=False,
-            speed=1.0,
-        ),
-    )
+        model_id=MODEL_ID,
+        voice_settings=_voice_settings(),
+    ))
+
+    chunks = _traced_stream(chunks)
+    if cache is not None:
+        return cache.cached_stream(key, chunks)
+
+    return chunks
+
+
+def _traced_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # the request only goes out on the first next(), the span times it to the first audio
+    with span("tts"):
+        first = next(chunks, None)
+    if first is None:
+        return
+
+    mark("tts.first_audio")
+    yield first
+    yield from chunks
+
+
+def synthesize_speech(text: str, output_format: Optional[str] = None) -> bytes:
+    """Convert text to audio using ElevenLabs, in the local player's format unless one is given."""
+    output_format = output_format or _output_format()
+    cache = get_audio_cache()
+
+    if cache is not None:
+        key = _cache_key(text, output_format)
+        cached_audio = cache.get(key)
+        if cached_audio is not None:
+            logger.debug(f"TTS cache hit for '{text}'")
+            return cached_audio
+
+    elevenlabs = get_elevenlabs_client()
+    def request() -> bytes:
+        response = elevenlabs.text_to_speech.convert(
+            voice_id=VOICE_ID,
+            output_format=output_format,
+            text=text,
+            model_id=MODEL_ID,
+            voice_settings=_voice_settings(),
+        )
+        return b"".join(response)
+
+    with span("tts"):
+        audio = call_remote("elevenlabs", "tts", request)
+    mark("tts.first_audio")
+
+    if cache is not None:
+        cache.put(key, audio)
+
+    return audio
+
+
+def presynthesize_stock_phrases():
+    """Fill the audio cache with the stock phrases so they play instantly."""
+    if get_audio_cache() is None:
+        logger.warning("TTS cache is disabled, skipping stock phrase synthesis")
+        return
+
+    for phrase in STOCK_PHRASES:
+        try:
+            synthesize_speech(phrase)
+        except Exception as e:
+            logger.warning(f"Failed to pre-synthesize '{phrase}': {e}")
+
+    logger.info(f"Pre-synthesized {len(STOCK_PHRASES)} stock phrases")
+
+
+def play_audio(audio: bytes):
+    """Play synthesized audio through the speakers."""
+    with span("playback"):
+        if is_pcm_playback_enabled():
+            from core.voice.playback import get_pcm_player
+
+            get_pcm_player().play_stream([audio])
+            return
+
+        from elevenlabs import play
+        from core.voice.playback import unmetered_playback
+
+        mark("playback.first_audio")
+        with unmetered_playback():
+            play(audio)
+
+
+def speak_response(text: str, cancel_event: Optional[threading.Event] = None):
+    """
+    Convert text to speech using ElevenLabs. Once `cancel_event` is set
+    playback stops: straight away with PCM playback (through `cancel_playback`),
+    after the current sentence with MP3, which is then played one sentence
+    at a time since the SDK's player can't be stopped.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return
+
+    if is_pcm_playback_enabled():
+        from core.voice.playback import get_pcm_player
+
+        with span("playback"):
+            get_pcm_player().play_stream(stream_speech(text))
+        return
+
+    if cancel_event is not None:
+        from core.voice.streaming_speech import speak_streaming_response
+
+        speak_streaming_response([text], cancel_event=cancel_event)
+        return
 
-    play(response)
+    play_audio(synthesize_speech(text))
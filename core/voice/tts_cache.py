@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from core.brain.llm import FALLBACK_RESPONSE
+from utils.env_utils import get_tts_cache_dir, get_tts_cache_memory_mb, is_tts_cache_enabled
+
+logger = logging.getLogger(__name__)
+
+# short replies worth having ready before anyone asks
+STOCK_PHRASES = [
+    "Good morning!",
+    "Good night, sleep well.",
+    "I'm here for you.",
+    "Sorry, I didn't catch that. Could you say it again?",
+    FALLBACK_RESPONSE,
+]
+
+
+def audio_cache_key(
+    text: str,
+    voice_id: str,
+    model_id: str,
+    output_format: str,
+    voice_settings: Dict[str, Any],
+) -> str:
+    """Content address for a piece of synthesized audio."""
+    payload = json.dumps(
+        {
+            "text": text.strip(),
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "output_format": output_format,
+            "voice_settings": voice_settings,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    LRU cache of synthesized audio.
+
+    Entries live in memory up to `max_memory_bytes`; least recently used ones
+    spill to `cache_dir` and are promoted back on a hit. The disk side is pruned
+    oldest-first once it grows past `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 16 * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # disk reads, writes and pruning race each other's stat/replace otherwise
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        audio = self._read_from_disk(key)
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        self.put(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        if len(audio) > self.max_memory_bytes:
+            self._write_to_disk(key, audio)
+            return
+
+        spilled = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+
+            self._entries[key] = audio
+            self._memory_bytes += len(audio)
+
+            while self._memory_bytes > self.max_memory_bytes:
+                old_key, old_audio = self._entries.popitem(last=False)
+                self._memory_bytes -= len(old_audio)
+                spilled.append((old_key, old_audio))
+
+        for old_key, old_audio in spilled:
+            self._write_to_disk(old_key, old_audio)
+
+    def cached_stream(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass a chunk stream through and cache the audio once it has fully arrived.
+        Streams that are abandoned part way (e.g. cancelled playback) aren't stored.
+        """
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+
+        self.put(key, b"".join(received))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.audio"
+
+    def _read_from_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+
+        path = self._path(key)
+        with self._disk_lock:
+            try:
+                audio = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+
+        return audio
+
+    def _write_to_disk(self, key: str, audio: bytes):
+        if not self.cache_dir:
+            return
+
+        path = self._path(key)
+        with self._disk_lock:
+            if path.exists():
+                return
+
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(audio)
+            tmp_path.replace(path)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # other processes may share the directory, so files can still vanish under us
+        files = []
+        for path in self.cache_dir.glob("*.audio"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        files.sort(key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= size
+            path.unlink(missing_ok=True)
+
+
+_audio_cache: Optional[AudioCache] = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """Get the shared audio cache, or None if TTS caching is disabled."""
+    global _audio_cache
+
+    if not is_tts_cache_enabled():
+        return None
+
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache(
+                max_memory_bytes=get_tts_cache_memory_mb() * 1024 * 1024,
+                cache_dir=get_tts_cache_dir(),
+            )
+
+        return _audio_cache
@@ -0,0 +1,131 @@
+from typing import Optional
+import numpy as np
+
+from core.voice.audio_buffer import int16_to_float32
+from utils.env_utils import is_loud_env
+
+FRAME_MS = 20
+HANGOVER_MS = 200
+
+# a frame is speech when its RMS is this many times the noise floor
+SPEECH_RATIO = 3.0
+LOUD_ENV_SPEECH_RATIO = 4.5
+
+# the noise floor follows quiet frames quickly and loud ones slowly,
+# so a burst of speech doesn't drag the floor up with it
+FLOOR_FALL_RATE = 0.2
+FLOOR_RISE_RATE = 0.01
+# through loud frames the floor still creeps up by this factor per frame (doubling
+# in ~3 s), so a step up in background noise (a fan, traffic) is learnt
+# eventually; speech has gaps between words that pull it straight back down
+FLOOR_CREEP = 1.005
+
+
+class VoiceActivityDetector:
+    """
+    Frame-level voice activity detection with an adaptive noise floor.
+
+    Each chunk is cut into short frames and the RMS of all frames is computed in
+    one vectorized pass. A frame counts as speech when it is well above the
+    running noise-floor estimate (and above `min_threshold`). Speech needs
+    `onset_frames` loud frames in a row to start, which ignores clicks, and
+    lasts for a hangover period after the last loud frame so short gaps between
+    words don't end it.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = FRAME_MS,
+        min_threshold: float = 0.01,
+        speech_ratio: Optional[float] = None,
+        hangover_ms: int = HANGOVER_MS,
+        onset_frames: int = 2,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.min_threshold = min_threshold
+        self.speech_ratio = speech_ratio or (LOUD_ENV_SPEECH_RATIO if is_loud_env() else SPEECH_RATIO)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.onset_frames = onset_frames
+
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.is_speaking = False
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._loud_run = 0
+        self._hangover = 0
+        self._silent_frames = 0
+        self.has_heard_speech = False
+
+    @property
+    def trailing_silence_seconds(self) -> float:
+        """How long it has been since the last speech frame."""
+        return self._silent_frames * self.frame_length / self.sample_rate
+
+    def has_ended(self, max_silence_seconds: float, max_wait_seconds: float) -> bool:
+        """
+        Whether speech stopped `max_silence_seconds` ago, or none has been heard
+        for `max_wait_seconds`, the longer wait for someone to start talking.
+        """
+        if self.has_heard_speech:
+            return self.trailing_silence_seconds >= max_silence_seconds
+        return self.trailing_silence_seconds >= max_wait_seconds
+
+    def frame_rms(self, chunk: np.ndarray) -> np.ndarray:
+        """RMS of every complete frame in the chunk; a partial frame is kept for the next call."""
+        if chunk.dtype == np.int16:
+            chunk = int16_to_float32(chunk)
+
+        if len(self._leftover):
+            chunk = np.concatenate([self._leftover, chunk])
+
+        num_frames = len(chunk) // self.frame_length
+        usable = num_frames * self.frame_length
+        self._leftover = chunk[usable:]
+
+        frames = chunk[:usable].reshape(num_frames, self.frame_length)
+        return np.sqrt(np.einsum("ij,ij->i", frames, frames) / self.frame_length)
+
+    def process(self, chunk: np.ndarray) -> bool:
+        """
+        Feed a chunk of int16 or float32 audio.
+
+        Returns:
+            True if any part of the chunk was speech
+        """
+        rms_values = self.frame_rms(chunk).tolist()
+        if self.noise_floor is None and rms_values:
+            self.noise_floor = rms_values[0]
+
+        has_speech = False
+        for rms in rms_values:
+            threshold = max(self.noise_floor * self.speech_ratio, self.min_threshold)
+
+            if rms >= threshold:
+                self._loud_run += 1
+                creep_from = max(self.noise_floor, self.min_threshold / self.speech_ratio)
+                self.noise_floor = min(creep_from * FLOOR_CREEP, rms)
+            else:
+                self._loud_run = 0
+                rate = FLOOR_FALL_RATE if rms < self.noise_floor else FLOOR_RISE_RATE
+                self.noise_floor += (rms - self.noise_floor) * rate
+
+            if self._loud_run >= self.onset_frames or (self.is_speaking and self._loud_run):
+                self.is_speaking = True
+                self._hangover = self.hangover_frames
+            elif self._hangover > 0:
+                self._hangover -= 1
+            else:
+                self.is_speaking = False
+
+            if self.is_speaking:
+                has_speech = True
+                self.has_heard_speech = True
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+
+        return has_speech
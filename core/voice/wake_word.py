@@ -0,0 +1,219 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+import numpy as np
+import logging
+
+from core.voice.audio_buffer import chunk_level
+from core.voice.stt import (
+    SAMPLE_RATE,
+    WAKE_WORDS,
+    check_wake_word,
+    get_wake_word_service,
+)
+from core.voice.vad import VoiceActivityDetector
+
+logger = logging.getLogger(__name__)
+
+
+class WakeWordDetector(ABC):
+    """
+    Interface for anything that can tell whether a wake word is in a piece of audio.
+    Implement `detect` to plug in a different scorer (e.g. a keyword-spotting model),
+    and `submit` too if it can check audio in the background.
+    """
+
+    @abstractmethod
+    def detect(self, audio: np.ndarray) -> bool:
+        pass
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """Start checking `audio`, returning a Future for the result. Runs `detect` right away by default."""
+        future = Future()
+        try:
+            future.set_result(self.detect(audio))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class WhisperWakeWordDetector(WakeWordDetector):
+    """
+    Wake word detection by transcribing with Whisper in the worker processes.
+    Windows that are dropped as stale count as no wake word.
+    """
+
+    def __init__(self, wake_words: Optional[List[str]] = None):
+        self.wake_words = wake_words or WAKE_WORDS
+
+    def detect(self, audio: np.ndarray) -> bool:
+        return self.submit(audio).result()
+
+    def submit(self, audio: np.ndarray) -> Future:
+        detection = Future()
+
+        def on_transcribed(transcription: Future):
+            if transcription.cancelled():
+                detection.cancel()
+            elif transcription.exception() is not None:
+                detection.set_exception(transcription.exception())
+            else:
+                text = transcription.result()
+                detection.set_result(bool(text) and check_wake_word(text, self.wake_words))
+
+        get_wake_word_service().submit(audio, is_wake_word=True).add_done_callback(on_transcribed)
+        return detection
+
+
+class AudioRingBuffer:
+    """
+    Preallocated float32 ring buffer holding the most recent `capacity` samples.
+
+    Every sample is written twice (at i and i + capacity) so the latest N samples
+    are always one contiguous slice and can be handed out as a view, no copies.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=np.float32)
+        self._write_pos = 0
+        self._filled = 0
+
+    def __len__(self):
+        return self._filled
+
+    def write(self, samples: np.ndarray):
+        if len(samples) >= self.capacity:
+            samples = samples[-self.capacity:]
+
+        count = len(samples)
+        start = self._write_pos
+        first = min(count, self.capacity - start)
+
+        self._data[start:start + first] = samples[:first]
+        self._data[start + self.capacity:start + self.capacity + first] = samples[:first]
+
+        rest = count - first
+        if rest:
+            self._data[:rest] = samples[first:]
+            self._data[self.capacity:self.capacity + rest] = samples[first:]
+
+        self._write_pos = (start + count) % self.capacity
+        self._filled = min(self._filled + count, self.capacity)
+
+    def latest(self, num_samples: int) -> np.ndarray:
+        """Return a view of the last `num_samples` samples (valid until the next write)."""
+        num_samples = min(num_samples, self._filled)
+        end = self._write_pos + self.capacity
+        return self._data[end - num_samples:end]
+
+    def clear(self):
+        self._write_pos = 0
+        self._filled = 0
+
+
+class StreamingWakeWordEngine:
+    """
+    Streaming wake word detection over a sliding window.
+
+    Chunks go into a ring buffer. Inference only runs once per hop, only if some
+    of the new audio was speech (per the VAD, or above the silence threshold
+    without one), and only on the new audio plus a short overlap so a wake word
+    split across hops is still caught.
+
+    Windows are handed to the detector without waiting for its answer, so the
+    audio loop keeps reading; a detection is reported by the first chunk after
+    it comes back. By then the user is already past the wake word, up to a hop
+    plus the inference time later, so `detection_lag_samples` says how far
+    back from the newest chunk the window that matched started.
+    """
+
+    def __init__(
+        self,
+        detector: Optional[WakeWordDetector] = None,
+        silence_threshold: float = 0.01,
+        window_seconds: float = 3.0,
+        hop_seconds: float = 1.0,
+        overlap_seconds: float = 0.75,
+        vad: Optional[VoiceActivityDetector] = None,
+    ):
+        self.detector = detector or WhisperWakeWordDetector()
+        self.silence_threshold = silence_threshold
+        self.vad = vad
+        self.hop_samples = int(hop_seconds * SAMPLE_RATE)
+        self.overlap_samples = int(overlap_seconds * SAMPLE_RATE)
+        self.buffer = AudioRingBuffer(int(window_seconds * SAMPLE_RATE))
+
+        self._pending_samples = 0
+        self._pending_voiced = False
+        # (answer, sample position the window started at)
+        self._detections: List[Tuple[Future, int]] = []
+        self._samples_seen = 0
+        self.detection_lag_samples = 0
+        self.inference_count = 0
+        self.skipped_count = 0
+
+    def process_chunk(self, chunk: np.ndarray) -> bool:
+        """
+        Feed one chunk of float32 audio. Returns True if the wake word was detected.
+        """
+        self.buffer.write(chunk)
+        self._pending_samples += len(chunk)
+        self._samples_seen += len(chunk)
+
+        if self.vad is not None:
+            is_voiced = self.vad.process(chunk)
+        else:
+            is_voiced = chunk_level(chunk) >= self.silence_threshold
+
+        if is_voiced:
+            self._pending_voiced = True
+
+        if self._pending_samples < self.hop_samples:
+            return self._collect_detections()
+
+        audio_to_check = self.buffer.latest(self._pending_samples + self.overlap_samples)
+        is_voiced = self._pending_voiced
+
+        self._pending_samples = 0
+        self._pending_voiced = False
+
+        if not is_voiced:
+            self.skipped_count += 1
+            return self._collect_detections()
+
+        self.inference_count += 1
+        window_start = self._samples_seen - len(audio_to_check)
+        self._detections.append((self.detector.submit(audio_to_check), window_start))
+        return self._collect_detections()
+
+    def _collect_detections(self) -> bool:
+        detected = False
+        pending = []
+        for future, window_start in self._detections:
+            if not future.done():
+                pending.append((future, window_start))
+            elif future.cancelled():
+                continue
+            elif future.exception() is not None:
+                logger.warning(f"Wake word detection failed: {future.exception()}")
+            elif future.result() and not detected:
+                detected = True
+                self.detection_lag_samples = self._samples_seen - window_start
+
+        # answers still to come are about audio the command recording starts from anyway
+        self._detections = [] if detected else pending
+        return detected
+
+    def recent_audio(self, num_samples: Optional[int] = None) -> np.ndarray:
+        """Copy of the most recent audio, e.g. to seed the command recording."""
+        if num_samples is None:
+            num_samples = len(self.buffer)
+        return np.array(self.buffer.latest(num_samples))
+
+    def reset(self):
+        self.buffer.clear()
+        self._pending_samples = 0
+        self._pending_voiced = False
+        self._detections = []
+
@@ -0,0 +1,451 @@
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+import logging
+import multiprocessing
+import threading
+import time
+
+from core.tracing import get_metrics
+from core.voice.audio_buffer import int16_to_float32
+from utils.env_utils import get_whisper_workers
+
+logger = logging.getLogger(__name__)
+
+# loading a model from disk can take a while, the first request allows for it
+MODEL_LOAD_TIMEOUT_SECONDS = 120.0
+
+WORKER_SAMPLE_RATE = 16000
+# audio up to this long goes through the worker's shared memory block (float32,
+# about 3.8 MB); anything longer is rare enough to just send over the pipe
+SHARED_AUDIO_SECONDS = 60
+
+# requests waiting for a free worker; past this the oldest wake-word window is dropped
+MAX_QUEUED_REQUESTS = 4
+# a wake-word window that waited longer than this isn't worth transcribing any more
+MAX_WAKE_WORD_AGE_SECONDS = 1.5
+
+# longest a job may run when the caller gives no timeout; a worker that takes
+# longer is taken to be hung and replaced, so it doesn't hold its slot forever
+MAX_COMMAND_SECONDS = 60.0
+MAX_WAKE_WORD_SECONDS = 10.0
+# while waiting for an answer, how often to check the process is still there
+HEALTH_CHECK_SECONDS = 1.0
+
+# commands are decoded greedily; wake-word windows keep the bit of sampling
+# they always had, which helps short, mumbled names come through
+COMMAND_TEMPERATURE = 0.0
+WAKE_WORD_TEMPERATURE = 0.2
+
+
+def run_worker(
+    connection: Connection,
+    shared_memory_name: str,
+    model_size: str,
+    device: Optional[str],
+    fp16: bool,
+):
+    """
+    Entry point of the worker process: load Whisper once, then answer
+    (request_id, num_samples, audio_bytes, temperature) requests with
+    (request_id, text, error).
+
+    The audio is float32 in the shared memory block unless `audio_bytes` is
+    given. Kept in its own light module so the spawned process doesn't import
+    the audio and SDK stacks.
+    """
+    import whisper
+
+    shared = shared_memory.SharedMemory(name=shared_memory_name)
+    shared_audio = np.ndarray((shared.size // 4,), dtype=np.float32, buffer=shared.buf)
+
+    model = whisper.load_model(model_size, device=device)
+    connection.send(("ready", None, None))
+
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                return
+
+            if request is None:
+                return
+
+            request_id, num_samples, audio_bytes, temperature = request
+            if audio_bytes is None:
+                # copied out straight away, the parent may reuse the block once it gives up on us
+                audio = shared_audio[:num_samples].copy()
+            else:
+                audio = np.frombuffer(audio_bytes, dtype=np.float32)
+
+            try:
+                result = model.transcribe(audio, fp16=fp16, temperature=temperature, without_timestamps=True)
+                connection.send((request_id, str(result["text"] or "").strip(), None))
+            except Exception as e:
+                connection.send((request_id, None, repr(e)))
+    finally:
+        del shared_audio
+        shared.close()
+
+
+class WhisperWorker:
+    """
+    Handle to a Whisper model running in its own process, so inference doesn't
+    hold the GIL of the assistant's process and a crash in it doesn't take the
+    assistant down. The process is started on first use and again if it died.
+
+    Audio is written into a shared memory block that lives as long as the
+    handle, so only a request id and a length go over the pipe.
+    """
+
+    def __init__(self, model_size: str = "base", device: Optional[str] = None, fp16: bool = False):
+        self.model_size = model_size
+        self.device = device
+        self.fp16 = fp16
+
+        self._process = None
+        self._connection: Optional[Connection] = None
+        self._shared: Optional[shared_memory.SharedMemory] = None
+        self._shared_audio: Optional[np.ndarray] = None
+        self._is_ready = False
+        self._request_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._is_ready
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.is_alive:
+            return
+
+        if self._shared is None:
+            self._shared = shared_memory.SharedMemory(create=True, size=SHARED_AUDIO_SECONDS * WORKER_SAMPLE_RATE * 4)
+            self._shared_audio = np.ndarray((self._shared.size // 4,), dtype=np.float32, buffer=self._shared.buf)
+
+        # spawn rather than fork, forking a process with PyAudio and HTTP threads isn't safe
+        context = multiprocessing.get_context("spawn")
+        parent_connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=run_worker,
+            args=(child_connection, self._shared.name, self.model_size, self.device, self.fp16),
+            name="whisper-worker",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+
+        self._connection = parent_connection
+        self._is_ready = False
+        logger.info(f"Started Whisper worker process ({self.model_size}, pid {self._process.pid})")
+
+    def _request(self, request_id: int, samples: np.ndarray, temperature: float) -> tuple:
+        num_samples = len(samples)
+        if num_samples > len(self._shared_audio):
+            if samples.dtype == np.int16:
+                samples = int16_to_float32(samples)
+            return request_id, num_samples, np.ascontiguousarray(samples, dtype=np.float32).tobytes(), temperature
+
+        target = self._shared_audio[:num_samples]
+        if samples.dtype == np.int16:
+            int16_to_float32(samples, out=target)
+        else:
+            target[:] = samples
+        return request_id, num_samples, None, temperature
+
+    def transcribe(
+        self,
+        samples: np.ndarray,
+        timeout: Optional[float] = None,
+        temperature: float = COMMAND_TEMPERATURE,
+    ) -> str:
+        """
+        Transcribe int16 samples or float32 samples in [-1, 1]. Raises
+        TimeoutError if no answer comes within `timeout`, after killing the
+        process, as one that overran is either hung or still busy with the job.
+        """
+        with self._lock:
+            self._start()
+
+            self._request_id += 1
+            request_id = self._request_id
+            try:
+                self._connection.send(self._request(request_id, samples, temperature))
+            except OSError:
+                self._kill()
+                raise RuntimeError("Whisper worker process exited")
+
+            if timeout is not None and not self._is_ready:
+                timeout += MODEL_LOAD_TIMEOUT_SECONDS
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while True:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                wait = HEALTH_CHECK_SECONDS if remaining is None else min(remaining, HEALTH_CHECK_SECONDS)
+                if not self._connection.poll(wait):
+                    if not self._process.is_alive():
+                        self._kill()
+                        raise RuntimeError("Whisper worker process exited")
+                    if remaining is not None and time.monotonic() >= deadline:
+                        self._kill()
+                        raise TimeoutError(f"Whisper worker didn't answer within {timeout:.1f} seconds")
+                    continue
+
+                try:
+                    response_id, text, error = self._connection.recv()
+                except (EOFError, OSError):
+                    self._kill()
+                    raise RuntimeError("Whisper worker process exited")
+
+                if response_id == "ready":
+                    self._is_ready = True
+                    continue
+
+                # an answer to some earlier request, not this one
+                if response_id != request_id:
+                    continue
+
+                if error is not None:
+                    raise RuntimeError(f"Whisper worker failed: {error}")
+
+                return text
+
+    def _kill(self):
+        """Stop the process outright; the next request starts a fresh one."""
+        if self._process is not None:
+            self._process.kill()
+            self._process.join(timeout=2.0)
+        if self._connection is not None:
+            self._connection.close()
+
+        self._process = None
+        self._connection = None
+        self._is_ready = False
+
+    def stop(self):
+        with self._lock:
+            if self.is_alive:
+                try:
+                    self._connection.send(None)
+                except OSError:
+                    pass
+
+                self._process.join(timeout=2.0)
+                if self._process.is_alive():
+                    self._process.terminate()
+                logger.info("Whisper worker process stopped")
+
+            self._process = None
+            self._connection = None
+
+            if self._shared is not None:
+                self._shared_audio = None
+                self._shared.close()
+                self._shared.unlink()
+                self._shared = None
+
+
+class _Request:
+    def __init__(self, samples: np.ndarray, is_wake_word: bool, timeout: Optional[float], temperature: float):
+        self.samples = samples
+        self.is_wake_word = is_wake_word
+        self.timeout = timeout
+        self.temperature = temperature
+        self.submitted_at = time.monotonic()
+        self.future: Future = Future()
+
+
+class WhisperService:
+    """
+    Whisper inference for the whole process on a pool of WhisperWorkers, one
+    dispatcher thread each, so callers hand audio over and never run the
+    model themselves.
+
+    Commands always go ahead of wake-word windows. Only `MAX_QUEUED_REQUESTS`
+    wait at a time: when more arrive the oldest wake-word window is dropped,
+    as is one that waited longer than `MAX_WAKE_WORD_AGE_SECONDS`, since a
+    newer window already covers the same speech. Dropped windows resolve to
+    None. A worker that crashes, or overruns its job's timeout (by default
+    `MAX_COMMAND_SECONDS` / `MAX_WAKE_WORD_SECONDS`), is killed and started
+    again straight away; its job fails and the queue moves on to the new one.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "tiny",
+        device: Optional[str] = None,
+        fp16: bool = False,
+        num_workers: int = 1,
+        max_queued: int = MAX_QUEUED_REQUESTS,
+        max_wake_word_age: float = MAX_WAKE_WORD_AGE_SECONDS,
+    ):
+        self.model_size = model_size
+        self.max_queued = max_queued
+        self.max_wake_word_age = max_wake_word_age
+        self.workers = [WhisperWorker(model_size, device=device, fp16=fp16) for _ in range(max(num_workers, 1))]
+
+        self._commands: Deque[_Request] = deque()
+        self._wake_word_windows: Deque[_Request] = deque()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._is_stopped = False
+
+    def start(self):
+        with self._condition:
+            if self._threads:
+                return
+            self._is_stopped = False
+
+            for index, worker in enumerate(self.workers):
+                worker.start()
+                thread = threading.Thread(
+                    target=self._dispatch,
+                    args=(worker,),
+                    name=f"whisper-dispatch-{index}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def warmup(self):
+        """Start the workers and wait until each has loaded its model and run once."""
+        self.start()
+        for worker in self.workers:
+            worker.transcribe(np.zeros(WORKER_SAMPLE_RATE, dtype=np.float32), timeout=MAX_WAKE_WORD_SECONDS)
+
+    def submit(
+        self,
+        samples: np.ndarray,
+        is_wake_word: bool = False,
+        timeout: Optional[float] = None,
+        temperature: Optional[float] = None,
+    ) -> Future:
+        """
+        Queue `samples` (int16, or float32 in [-1, 1]) for transcription and
+        return a Future for the text. The samples are copied, so the caller
+        may reuse its buffer straight away. `temperature` and `timeout`
+        default to the ones for the kind of request.
+        """
+        self.start()
+        if temperature is None:
+            temperature = WAKE_WORD_TEMPERATURE if is_wake_word else COMMAND_TEMPERATURE
+        if timeout is None:
+            timeout = MAX_WAKE_WORD_SECONDS if is_wake_word else MAX_COMMAND_SECONDS
+        request = _Request(np.array(samples), is_wake_word, timeout, temperature)
+
+        with self._condition:
+            if is_wake_word:
+                self._wake_word_windows.append(request)
+            else:
+                self._commands.append(request)
+
+            while len(self._commands) + len(self._wake_word_windows) > self.max_queued and self._wake_word_windows:
+                self._drop(self._wake_word_windows.popleft())
+
+            self._condition.notify()
+
+        return request.future
+
+    def transcribe(
+        self,
+        samples: np.ndarray,
+        timeout: Optional[float] = None,
+        temperature: Optional[float] = None,
+    ) -> Optional[str]:
+        """Transcribe a command, waiting for the text."""
+        return self.submit(samples, timeout=timeout, temperature=temperature).result()
+
+    def stop(self):
+        with self._condition:
+            self._is_stopped = True
+            pending = list(self._commands) + list(self._wake_word_windows)
+            self._commands.clear()
+            self._wake_word_windows.clear()
+            threads, self._threads = self._threads, []
+            self._condition.notify_all()
+
+        for request in pending:
+            request.future.cancel()
+        for thread in threads:
+            thread.join(timeout=2.0)
+        for worker in self.workers:
+            worker.stop()
+
+    def _drop(self, request: _Request):
+        get_metrics().increment("whisper.dropped_windows")
+        request.future.set_result(None)
+
+    def _next_request(self) -> Optional[_Request]:
+        with self._condition:
+            while True:
+                if self._is_stopped:
+                    return None
+                if self._commands:
+                    return self._commands.popleft()
+
+                while self._wake_word_windows:
+                    request = self._wake_word_windows.popleft()
+                    if time.monotonic() - request.submitted_at <= self.max_wake_word_age:
+                        return request
+                    self._drop(request)
+
+                self._condition.wait()
+
+    def _dispatch(self, worker: WhisperWorker):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            if not request.future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                text = worker.transcribe(request.samples, timeout=request.timeout, temperature=request.temperature)
+            except Exception as e:
+                request.future.set_exception(e)
+                if not worker.is_alive and not self._is_stopped:
+                    get_metrics().increment("whisper.restarts")
+                    reason = "hung" if isinstance(e, TimeoutError) else "crashed"
+                    logger.warning(f"Whisper worker {reason} ({e}), restarting it")
+                    worker.start()
+                continue
+
+            request.future.set_result(text)
+
+
+_services: Dict[Tuple[str, Optional[str], bool], WhisperService] = {}
+_services_lock = threading.Lock()
+
+
+def get_whisper_service(model_size: str, device: Optional[str] = None, fp16: bool = False) -> WhisperService:
+    """The process-wide service for this model, sized by WHISPER_WORKERS."""
+    key = (model_size, device, fp16)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = WhisperService(model_size, device=device, fp16=fp16, num_workers=get_whisper_workers())
+            _services[key] = service
+
+        return service
+
+
+def stop_whisper_services():
+    """Stop every worker process and free their shared memory."""
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+
+    for service in services:
+        service.stop()
@@ -1,14 +1,28 @@
-from core.brain import call_llm_with_command
-from core.voice.stt import record_command_on_keypress
-from core.voice.tts import speak_response
-from core.ui.popup import (
-    initialize_window, show_thinking, show_response, 
+from core.startup import format_startup_report, mark, start_background_warmup, warmup
+from core.ui.frontend import (
+    create_frontend, set_frontend, get_frontend, show_thinking, show_response,
     show_speaking, show_waiting, show_command_detected
 )
 from utils.env_utils import (
     load_environment_variables,
+    should_preload_whisper,
+    is_streaming_stt_enabled,
+    is_streaming_response_enabled,
+    should_presynthesize_phrases,
+    is_async_pipeline_enabled,
+    get_max_silence_seconds,
+    get_max_wait_for_speech_seconds,
+    get_frontend_kind,
+    get_headless_trigger,
+    get_trigger_port,
+    get_server_host,
+    get_server_port,
+    get_server_max_sessions,
+    get_server_secret,
+    is_barge_in_enabled,
+    is_llm_speculation_enabled,
 )
-import pyaudio
+import argparse
 import logging
 import time
 import threading
@@ -26,60 +40,149 @@ logger = logging.getLogger(__name__)
 
 def run_interactive_assistant():
     """Run the voice assistant in interactive mode."""
+    # imported here rather than at the top so the frontend can show before
+    # the audio and SDK stacks have loaded
+    from core.brain import stream_llm_with_command
+    from core.brain.speculation import LlmSpeculator
+    from core.clients import close_clients
+    from core.voice.barge_in import BargeInWatcher, EchoGate
+    from core.voice.capture import PRE_ROLL_SECONDS, CaptureService
+    from core.voice.stt import record_command_on_keypress
+    from core.voice.streaming_stt import ElevenLabsStreamingTranscriber
+    from core.voice.playback import cancel_playback, close_pcm_player, reset_playback
+    from core.voice.stt_providers import close_stt_providers
+    from core.voice.whisper_worker import stop_whisper_services
+    from core.voice.streaming_speech import speak_streaming_response
+    from core.voice.tts import speak_response
+    from core.tracing import finish_trace, start_trace
+    import pyaudio
+
     audio = pyaudio.PyAudio()
+    capture = CaptureService(audio)
+    capture.start()
+    get_frontend().attach_capture(capture)
     
     show_waiting()
+    mark("ready")
+
+    barge_in_enabled = is_barge_in_enabled()
+    # kept from the last response, if the user talked over it the next command starts from there
+    barge_in_watcher = None
+
+    # one for the whole session, so the echo level learnt in one response carries over
+    echo_gate = EchoGate()
+
+    def watch_for_barge_in(cancel_event: threading.Event):
+        def on_barge_in():
+            cancel_event.set()
+            cancel_playback()
+
+        return BargeInWatcher(capture, on_barge_in, echo_gate=echo_gate)
+
+    def collect_response(text_stream, cancel_event: threading.Event) -> str:
+        """The whole response, or as much of it as came before the user interrupted."""
+        pieces = []
+        for piece in text_stream:
+            if cancel_event.is_set():
+                break
+            pieces.append(piece)
+        return "".join(pieces)
+
+    def turn_outcome(watcher) -> str:
+        return "interrupted" if watcher is not None and watcher.detected else "completed"
 
     try:
         while True:
-            stream = audio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=16000,
-                input=True,
-                frames_per_buffer=4000,
-            )
-
-            start_time = time.time()
+            try:
+                interrupted = barge_in_watcher is not None and barge_in_watcher.detected
+                if interrupted:
+                    stream = capture.reader(PRE_ROLL_SECONDS, timestamp=barge_in_watcher.speech_started_at)
+                else:
+                    stream = capture.reader()
+                barge_in_watcher = None
+
+                start_time = time.time()
+                start_trace(mode="interactive")
             
-            command = record_command_on_keypress(
-                stream,
-                silence_threshold=0.01,
-                max_silence_seconds=3.0,
-            )
+                transcriber = None
+                speculator = None
+                if is_streaming_stt_enabled():
+                    transcriber = ElevenLabsStreamingTranscriber(
+                        on_partial=lambda text: logger.debug(f"Partial transcript: '{text}'"),
+                    )
+                    if is_llm_speculation_enabled():
+                        speculator = LlmSpeculator()
+            
+                command = record_command_on_keypress(
+                    stream,
+                    silence_threshold=0.01,
+                    max_silence_seconds=get_max_silence_seconds(),
+                    transcriber=transcriber,
+                    wait_for_trigger=not interrupted,
+                    speculator=speculator,
+                    max_wait_for_speech_seconds=get_max_wait_for_speech_seconds(),
+                )
 
-            stream.close()
+                # a response already under way for this command, if the speculation was right
+                llm_stream = speculator.take(command) if speculator is not None else None
 
-            if command is None:
-                continue
+                if not command:
+                    finish_trace(outcome="empty")
+                    continue
 
-            logger.info(f"Command received: '{command}'")
-            
-            show_command_detected(command)
-            
-            processing_start = time.time()
-            logger.info("🤖 Processing command with LLM...")
-            
-            show_thinking()
+                logger.info(f"Command received: '{command}'")
             
-            response = call_llm_with_command(command)
-            processing_time = time.time() - processing_start
-            logger.info(f"Command processing time: {processing_time:.2f} seconds")
+                show_command_detected(command)
             
-            show_response(response)
+                processing_start = time.time()
+                logger.info("🤖 Processing command with LLM...")
             
-            logger.info("Generating and playing response...")
-            speak_start = time.time()
+                show_thinking()
             
-            show_speaking()
-            speak_response(response)
-            speak_time = time.time() - speak_start
-            logger.info(f"Response speaking time: {speak_time:.2f} seconds")
-            
-            show_waiting()
-            
-            total_time = time.time() - start_time
-            logger.info(f"Total cycle time: {total_time:.2f} seconds")
+                cancel_event = threading.Event()
+                reset_playback()
+                if barge_in_enabled:
+                    barge_in_watcher = watch_for_barge_in(cancel_event)
+                    # from here, so talking while the LLM is still thinking interrupts too
+                    barge_in_watcher.start()
+
+                try:
+                    if is_streaming_response_enabled():
+                        response = speak_streaming_response(
+                            llm_stream or stream_llm_with_command(command),
+                            on_text=show_response,
+                            on_first_audio=show_speaking,
+                            cancel_event=cancel_event,
+                        )
+                        logger.info(f"Streamed response time: {time.time() - processing_start:.2f} seconds")
+                    else:
+                        response = collect_response(llm_stream or stream_llm_with_command(command), cancel_event)
+                        processing_time = time.time() - processing_start
+                        logger.info(f"Command processing time: {processing_time:.2f} seconds")
+
+                        show_response(response)
+
+                        logger.info("Generating and playing response...")
+                        speak_start = time.time()
+
+                        show_speaking()
+                        speak_response(response, cancel_event=cancel_event if barge_in_watcher is not None else None)
+                        speak_time = time.time() - speak_start
+                        logger.info(f"Response speaking time: {speak_time:.2f} seconds")
+                finally:
+                    if barge_in_watcher is not None:
+                        barge_in_watcher.stop()
+
+                show_waiting()
+
+                total_time = time.time() - start_time
+                logger.info(f"Total cycle time: {total_time:.2f} seconds")
+                finish_trace(outcome=turn_outcome(barge_in_watcher))
+            except Exception as e:
+                # one failed turn (say, the network dropping out) shouldn't stop the assistant
+                logger.error(f"Turn failed: {e}", exc_info=True)
+                finish_trace(outcome="failed")
+                show_waiting()
             
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt, stopping assistant...")
@@ -87,11 +190,136 @@ def run_interactive_assistant():
         logger.error(f"Unexpected error in assistant: {e}", exc_info=True)
     finally:
         logger.info("Terminating PyAudio...")
+        capture.stop()
+        audio.terminate()
+        close_pcm_player()
+        close_stt_providers()
+        stop_whisper_services()
+        close_clients()
+        logger.info("Assistant shutdown complete")
+
+
+def run_async_assistant():
+    """Run the voice assistant on the asyncio pipeline."""
+    from core.clients import close_clients
+    from core.pipeline import AssistantPipeline
+    from core.voice.capture import CaptureService
+    from core.voice.streaming_stt import ElevenLabsStreamingTranscriber
+    from core.voice.playback import close_pcm_player
+    from core.voice.stt_providers import close_stt_providers
+    from core.voice.whisper_worker import stop_whisper_services
+    import asyncio
+    import pyaudio
+
+    audio = pyaudio.PyAudio()
+    capture = CaptureService(audio)
+    capture.start()
+    get_frontend().attach_capture(capture)
+    stream = capture.reader()
+    mark("ready")
+
+    transcriber_factory = None
+    if is_streaming_stt_enabled():
+        transcriber_factory = ElevenLabsStreamingTranscriber
+
+    pipeline = AssistantPipeline(
+        stream,
+        silence_threshold=0.01,
+        max_silence_seconds=get_max_silence_seconds(),
+        max_wait_for_speech_seconds=get_max_wait_for_speech_seconds(),
+        transcriber_factory=transcriber_factory,
+        barge_in_capture=capture if is_barge_in_enabled() else None,
+        speculate=is_llm_speculation_enabled(),
+    )
+
+    try:
+        asyncio.run(pipeline.run())
+    except Exception as e:
+        logger.error(f"Unexpected error in assistant: {e}", exc_info=True)
+    finally:
+        logger.info("Terminating PyAudio...")
+        capture.stop()
         audio.terminate()
+        close_pcm_player()
+        close_stt_providers()
+        stop_whisper_services()
+        close_clients()
         logger.info("Assistant shutdown complete")
 
 
+def run_server():
+    """Serve many devices from this process instead of running one locally."""
+    from core.clients import close_clients
+    from core.server import AssistantServer
+    from core.voice.stt_providers import close_stt_providers
+    from core.voice.whisper_worker import stop_whisper_services
+    import asyncio
+
+    server = AssistantServer(
+        host=get_server_host(),
+        port=get_server_port(),
+        max_sessions=get_server_max_sessions(),
+        max_silence_seconds=get_max_silence_seconds(),
+        barge_in=is_barge_in_enabled(),
+        secret=get_server_secret(),
+    )
+
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        logger.info("Received keyboard interrupt, stopping server...")
+    finally:
+        close_stt_providers()
+        stop_whisper_services()
+        close_clients()
+        logger.info("Server shutdown complete")
+
+
+def measure_startup(frontend):
+    """Go through startup in the foreground, print how long each step took and exit."""
+    import pyaudio
+    from core.voice.capture import CaptureService
+
+    audio = pyaudio.PyAudio()
+    capture = CaptureService(audio)
+    try:
+        capture.start()
+        mark("ready")
+    except Exception as e:
+        logger.error(f"Could not open the microphone: {e}")
+
+    import_timings = warmup(
+        preload_whisper=should_preload_whisper(),
+        presynthesize=should_presynthesize_phrases(),
+    )
+
+    capture.stop()
+    audio.terminate()
+    frontend.close()
+
+    print(format_startup_report(import_timings))
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Winston the Robot Bear")
+    parser.add_argument(
+        "--measure-startup",
+        action="store_true",
+        help="report how long startup and warmup take, then exit",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve many devices over websockets instead of running locally",
+    )
+    parser.add_argument(
+        "--device-token",
+        metavar="DEVICE_ID",
+        help="print the token a device needs to connect in serve mode, then exit",
+    )
+    args = parser.parse_args()
+    mark("imports done")
+
     logger.info("Starting Winston the Robot Bear...")
     logger.info("Loading environment variables...")
     
@@ -102,16 +330,52 @@ def main():
         return
 
     logger.info("Environment variables loaded successfully")
-    logger.info("Initializing GUI window...")
+    mark("environment loaded")
+
+    if args.device_token:
+        from core.server import device_token
+
+        secret = get_server_secret()
+        if secret is None:
+            logger.error("Set SERVER_SECRET to issue device tokens")
+            return
+        print(device_token(secret, args.device_token))
+        return
+
+    if args.serve:
+        start_background_warmup(presynthesize=should_presynthesize_phrases())
+        run_server()
+        return
+
+    frontend_kind = get_frontend_kind()
+    logger.info(f"Initializing {frontend_kind} frontend...")
     
-    window = initialize_window()
+    frontend = create_frontend(frontend_kind, trigger=get_headless_trigger(), port=get_trigger_port())
+    frontend.initialize()
+    set_frontend(frontend)
+    mark("frontend shown")
+
+    if args.measure_startup:
+        measure_startup(frontend)
+        return
     
-    assistant_thread = threading.Thread(target=run_interactive_assistant, daemon=True)
+    if should_preload_whisper():
+        logger.info("Preloading Whisper model in the background...")
+    start_background_warmup(
+        preload_whisper=should_preload_whisper(),
+        presynthesize=should_presynthesize_phrases(),
+    )
+    
+    assistant_target = run_async_assistant if is_async_pipeline_enabled() else run_interactive_assistant
+    assistant_thread = threading.Thread(target=assistant_target, daemon=True)
     assistant_thread.start()
     
-    logger.info("Starting main window loop...")
+    logger.info("Starting main loop...")
     
-    window.run()
+    try:
+        frontend.run()
+    except KeyboardInterrupt:
+        logger.info("Received keyboard interrupt, exiting...")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+
+import core.resilience as resilience
+from benchmarks.fakes import FakeSpeechToText
+from core.resilience import CallPolicy, CircuitBreaker, CircuitOpenError, DeadlineExceeded, call_remote, is_retryable, stream_remote
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    test_policy = CallPolicy(timeout=0.3, attempts=3, deadline=5.0)
+    monkeypatch.setitem(resilience.CALL_POLICIES, "test", test_policy)
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_SECONDS", 0.001)
+    monkeypatch.setattr(resilience, "RETRY_MAX_BACKOFF_SECONDS", 0.001)
+    return test_policy
+
+
+def failing_then(result, errors):
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_retryable_errors():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(ConnectionError())
+    assert is_retryable(ApiError(503))
+    assert is_retryable(ApiError(429))
+    assert not is_retryable(ApiError(401))
+    assert not is_retryable(CircuitOpenError())
+
+
+def test_call_returns_the_answer(policy):
+    fake_stt = FakeSpeechToText(latency=0.01, transcript="hello there")
+    response = call_remote("fake", "test", lambda: fake_stt.convert(file=SimpleNamespace(read=lambda: b""), model_id="x"))
+
+    assert response.text == "hello there"
+
+
+def test_transient_errors_are_retried(policy):
+    fn, calls = failing_then("ok", [ApiError(503), ConnectionError()])
+
+    assert call_remote("fake", "test", fn) == "ok"
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried(policy):
+    fn, calls = failing_then("ok", [ApiError(400)])
+
+    with pytest.raises(ApiError):
+        call_remote("fake", "test", fn)
+    assert len(calls) == 1
+
+
+def test_attempts_run_out(policy):
+    fn, calls = failing_then("ok", [ApiError(500)] * 5)
+
+    with pytest.raises(ApiError):
+        call_remote("fake", "test", fn)
+    assert len(calls) == policy.attempts
+
+
+def test_slow_attempt_hits_its_deadline(monkeypatch):
+    monkeypatch.setitem(resilience.CALL_POLICIES, "test", CallPolicy(timeout=0.05, attempts=1))
+    release = threading.Event()
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        call_remote("fake", "test", lambda: release.wait(1.0))
+    release.set()
+
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedged_duplicate_wins_over_a_slow_first_request(monkeypatch):
+    monkeypatch.setitem(resilience.CALL_POLICIES, "test", CallPolicy(timeout=1.0, attempts=1, hedge_after=0.05))
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            calls.append(None)
+            is_first = len(calls) == 1
+        time.sleep(0.5 if is_first else 0.01)
+        return "first" if is_first else "hedge"
+
+    started = time.monotonic()
+    assert call_remote("fake", "test", fn) == "hedge"
+    assert time.monotonic() - started < 0.4
+    assert len(calls) == 2
+
+
+def test_losing_hedged_response_is_closed(monkeypatch):
+    monkeypatch.setitem(resilience.CALL_POLICIES, "test", CallPolicy(timeout=1.0, attempts=1, hedge_after=0.05))
+    closed = threading.Event()
+    calls = []
+    lock = threading.Lock()
+
+    class Response:
+        def __init__(self, name):
+            self.name = name
+
+        def close(self):
+            closed.set()
+
+    def fn():
+        with lock:
+            calls.append(None)
+            is_first = len(calls) == 1
+        time.sleep(0.2 if is_first else 0.01)
+        return Response("first" if is_first else "hedge")
+
+    assert call_remote("fake", "test", fn).name == "hedge"
+    assert closed.wait(1.0)
+
+
+def test_big_uploads_get_more_time_and_no_hedge():
+    policy = CallPolicy(timeout=6.0, attempts=2, deadline=9.0, hedge_after=2.5, seconds_per_mb=8.0, max_hedge_bytes=100_000)
+
+    assert policy.for_payload(0) == policy
+    small = policy.for_payload(50_000)
+    assert small.hedge_after == 2.5
+    assert small.timeout == pytest.approx(6.4)
+
+    big = policy.for_payload(1_000_000)
+    assert big.hedge_after is None
+    assert big.timeout == pytest.approx(14.0)
+    assert big.deadline == pytest.approx(25.0)
+
+
+def test_stream_is_closed_when_the_consumer_stops_early(policy):
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            for chunk in range(10):
+                yield chunk
+        finally:
+            closed.set()
+
+    stream = stream_remote("fake", "test", chunks)
+    assert next(stream) == 0
+    assert next(stream) == 1
+    stream.close()
+
+    assert closed.wait(1.0)
+
+
+def test_stalled_stream_is_closed_once_its_read_returns(monkeypatch):
+    monkeypatch.setitem(resilience.CALL_POLICIES, "test", CallPolicy(timeout=1.0, attempts=1, idle_timeout=0.05))
+    release = threading.Event()
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            yield 0
+            release.wait(1.0)
+            yield 1
+        finally:
+            closed.set()
+
+    stream = stream_remote("fake", "test", chunks)
+    assert next(stream) == 0
+    with pytest.raises(DeadlineExceeded):
+        next(stream)
+    assert not closed.is_set()
+
+    release.set()
+    assert closed.wait(1.0)
+
+
+def test_circuit_opens_after_repeated_failures():
+    breaker = CircuitBreaker("fake", failure_threshold=3, reset_seconds=60)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = CircuitBreaker("fake", failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker("fake", failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_open_circuit_fails_calls_straight_away(policy):
+    breaker = resilience.get_circuit_breaker("fake")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    fn, calls = failing_then("ok", [])
+
+    with pytest.raises(CircuitOpenError):
+        call_remote("fake", "test", fn)
+    assert calls == []
+
+
+def test_client_errors_do_not_open_the_circuit(policy):
+    breaker = resilience.get_circuit_breaker("fake")
+
+    for _ in range(breaker.failure_threshold + 1):
+        fn, _ = failing_then("ok", [ApiError(404)])
+        with pytest.raises(ApiError):
+            call_remote("fake", "test", fn)
+
+    assert breaker.state == "closed"
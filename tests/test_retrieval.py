@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+import pytest
+
+import core.brain.retrieval as retrieval
+from core.brain.retrieval import BruteForceIndex, HashingEmbedder, IVFIndex, MemoryStore, get_memory_store
+
+TURNS = [
+    "User: my sister's name is Alice\nAssistant: Nice to meet Alice!",
+    "User: I had pasta for dinner\nAssistant: Sounds delicious.",
+    "User: my favourite colour is green\nAssistant: Green is lovely.",
+    "User: the dog is called Biscuit\nAssistant: What a good name.",
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    memory_store = MemoryStore(str(tmp_path), embedder=HashingEmbedder())
+    for timestamp, text in enumerate(TURNS, start=1):
+        memory_store.add(text, timestamp=float(timestamp))
+    return memory_store
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["what is my sister called", "what is my sister called", ""])
+
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+
+
+def test_search_finds_the_related_turn(store):
+    hits = store.search("what is my sister's name", k=2)
+
+    assert hits[0].text == TURNS[0]
+    assert hits[0].timestamp == 1.0
+    assert hits[0].score >= hits[1].score
+
+
+def test_search_on_an_empty_store(tmp_path):
+    assert MemoryStore(str(tmp_path)).search("anything") == []
+
+
+def test_store_is_loaded_back_from_disk(store, tmp_path):
+    reopened = MemoryStore(str(tmp_path), embedder=HashingEmbedder())
+
+    assert len(reopened) == len(TURNS)
+    assert reopened.search("the dog's name", k=1)[0].text == TURNS[3]
+
+
+def test_half_written_turn_is_cut_off_on_load(store, tmp_path):
+    with open(tmp_path / "turns.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"text": "User: cut off mid wri')
+
+    reopened = MemoryStore(str(tmp_path), embedder=HashingEmbedder())
+    reopened.add("User: I live in Leeds\nAssistant: Lovely city.")
+    reopened = MemoryStore(str(tmp_path), embedder=HashingEmbedder())
+
+    assert len(reopened) == len(TURNS) + 1
+    assert reopened.search("where do I live", k=1)[0].text.startswith("User: I live in Leeds")
+
+
+def test_changing_the_embedder_re_embeds_the_store(store, tmp_path):
+    reopened = MemoryStore(str(tmp_path), embedder=HashingEmbedder(dim=128))
+
+    assert len(reopened) == len(TURNS)
+    assert reopened.search("favourite colour", k=1)[0].text == TURNS[2]
+    assert MemoryStore(str(tmp_path), embedder=HashingEmbedder(dim=128)).search("favourite colour", k=1)
+
+
+def test_slow_store_load_only_holds_up_its_own_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "_stores", {})
+    monkeypatch.setattr(retrieval, "get_memory_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(retrieval, "get_retrieval_embedder", lambda: "hashing")
+    loading = threading.Event()
+    release = threading.Event()
+
+    class SlowEmbedder(HashingEmbedder):
+        def embed(self, texts):
+            loading.set()
+            release.wait(1.0)
+            return super().embed(texts)
+
+    existing = MemoryStore(str(tmp_path / "slow"), embedder=HashingEmbedder())
+    for text in TURNS:
+        existing.add(text)
+    monkeypatch.setattr(retrieval, "HashingEmbedder", lambda: SlowEmbedder(dim=128))
+    slow = threading.Thread(target=get_memory_store, args=("slow",))
+    slow.start()
+    try:
+        assert loading.wait(1.0)
+        monkeypatch.setattr(retrieval, "HashingEmbedder", HashingEmbedder)
+        assert len(get_memory_store("fast")) == 0
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join()
+
+    assert len(get_memory_store("slow")) == len(TURNS)
+
+
+def test_approximate_index_agrees_with_exact_search():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    exact = BruteForceIndex(32)
+    exact.add(vectors)
+    approximate = IVFIndex(exact, nprobe=4)
+
+    # every stored vector is its own best match
+    for vector_id in (0, 500, 1999):
+        ids, scores = approximate.search(vectors[vector_id], k=5)
+        assert ids[0] == vector_id
+        assert np.isclose(scores[0], 1.0)
+        exact_ids, _ = exact.search(vectors[vector_id], k=5)
+        assert exact_ids[0] == vector_id
+
+
+def test_brute_force_index_grows_past_its_capacity():
+    index = BruteForceIndex(4, initial_capacity=2)
+    index.add(np.eye(4, dtype=np.float32))
+
+    ids, scores = index.search(np.array([0, 0, 1, 0], dtype=np.float32), k=2)
+    assert len(index) == 4
+    assert ids[0] == 2
+    assert scores[0] == 1.0
@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from core.voice.capture import CaptureReader, CaptureService
+from core.voice.wake_word import AudioRingBuffer
+
+
+def make_service(capacity_seconds: float = 1.0, sample_rate: int = 1000) -> CaptureService:
+    # the PyAudio handle is only used by start(), samples are written directly
+    return CaptureService(None, sample_rate=sample_rate, buffer_seconds=capacity_seconds)
+
+
+def ramp(start: int, count: int) -> np.ndarray:
+    return (np.arange(start, start + count) % 32768).astype(np.int16)
+
+
+def test_audio_ring_buffer_latest_is_contiguous_across_the_wrap():
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(6, dtype=np.float32))
+    ring.write(np.arange(6, 11, dtype=np.float32))
+
+    assert len(ring) == 8
+    np.testing.assert_array_equal(ring.latest(5), np.arange(6, 11))
+    np.testing.assert_array_equal(ring.latest(100), np.arange(3, 11))
+
+
+def test_audio_ring_buffer_keeps_the_tail_of_an_oversized_write():
+    ring = AudioRingBuffer(4)
+    ring.write(np.arange(10, dtype=np.float32))
+
+    np.testing.assert_array_equal(ring.latest(4), np.arange(6, 10))
+
+
+def test_audio_ring_buffer_clear():
+    ring = AudioRingBuffer(4)
+    ring.write(np.ones(3, dtype=np.float32))
+    ring.clear()
+
+    assert len(ring) == 0
+    assert len(ring.latest(4)) == 0
+
+
+def test_reader_reads_what_was_written_across_the_wrap():
+    service = make_service()
+    reader = service.reader()
+
+    for start in range(0, 2500, 250):
+        service.write(ramp(start, 250))
+        np.testing.assert_array_equal(reader.read_samples(250, timeout=0), ramp(start, 250))
+
+
+def test_readers_have_independent_cursors():
+    service = make_service()
+    first = service.reader()
+    service.write(ramp(0, 300))
+    second = service.reader(pre_roll_seconds=0.1)
+
+    np.testing.assert_array_equal(first.read_samples(300, timeout=0), ramp(0, 300))
+    np.testing.assert_array_equal(second.read_samples(100, timeout=0), ramp(200, 100))
+
+
+def test_read_times_out_without_enough_audio():
+    service = make_service()
+    reader = service.reader()
+    service.write(ramp(0, 100))
+
+    assert reader.read_samples(200, timeout=0.01) is None
+    assert reader.position == 0
+
+
+def test_lapped_reader_skips_to_the_oldest_audio():
+    service = make_service()
+    reader = service.reader()
+    service.write(ramp(0, 2500))
+
+    samples = reader.read_samples(100, timeout=0)
+
+    # the ring holds 1500..2499; the jump leaves the read's length as headroom
+    np.testing.assert_array_equal(samples, ramp(1600, 100))
+    assert reader.dropped_frames == 1600
+
+
+def test_copy_overlapping_a_write_in_progress_is_rejected():
+    service = make_service()
+    service.write(ramp(0, 1000))
+    ring = service._ring
+    overwritten = threading.Event()
+    resume = threading.Event()
+
+    class PausingRing:
+        """The ring, with the writer stopped after copying in but before publishing."""
+
+        def __getitem__(self, index):
+            return ring[index]
+
+        def __setitem__(self, index, value):
+            ring[index] = value
+            overwritten.set()
+            resume.wait(1.0)
+
+    service._ring = PausingRing()
+    writer = threading.Thread(target=service.write, args=(ramp(1000, 200),))
+    writer.start()
+    try:
+        assert overwritten.wait(1.0)
+        assert service.frames_written == 1000
+        assert service.copy_range(0, 100) is None
+    finally:
+        resume.set()
+        writer.join()
+
+
+def test_seek_is_clamped_to_the_audio_in_the_ring():
+    service = make_service()
+    service.write(ramp(0, 2500))
+    reader = service.reader()
+
+    reader.seek(0)
+    assert reader.position == 1500
+    reader.seek(5000)
+    assert reader.position == 2500
+    reader.seek(2000)
+    np.testing.assert_array_equal(reader.read_samples(100, timeout=0), ramp(2000, 100))
+
+
+def test_skip_to_latest_keeps_the_pre_roll():
+    service = make_service()
+    reader = CaptureReader(service, 0)
+    service.write(ramp(0, 800))
+    reader.skip_to_latest(pre_roll_seconds=0.2)
+
+    np.testing.assert_array_equal(reader.read_samples(200, timeout=0), ramp(600, 200))
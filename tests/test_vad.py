@@ -0,0 +1,80 @@
+import numpy as np
+
+from benchmarks.fakes import SAMPLE_RATE, make_speech_like_audio
+from core.voice.vad import VoiceActivityDetector
+
+CHUNK_SIZE = 1024
+
+
+def chunks_of(samples: np.ndarray):
+    for start in range(0, len(samples) - CHUNK_SIZE + 1, CHUNK_SIZE):
+        yield samples[start:start + CHUNK_SIZE]
+
+
+def speech_flags(vad: VoiceActivityDetector, samples: np.ndarray):
+    return [vad.process(chunk) for chunk in chunks_of(samples)]
+
+
+def test_finds_speech_in_synthetic_utterance():
+    flags = speech_flags(VoiceActivityDetector(SAMPLE_RATE), make_speech_like_audio())
+    chunk_seconds = CHUNK_SIZE / SAMPLE_RATE
+
+    # 0.3 s of room noise, then the first phrase
+    assert not any(flags[:int(0.25 / chunk_seconds)])
+    assert all(flags[int(0.5 / chunk_seconds):int(1.7 / chunk_seconds)])
+    # the last second is noise again
+    assert not flags[-1]
+
+
+def test_trailing_silence_counts_up_after_speech():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    speech_flags(vad, make_speech_like_audio())
+
+    # 1 s of trailing noise minus the 200 ms hangover
+    assert 0.6 <= vad.trailing_silence_seconds <= 1.0
+
+
+def test_silence_before_speech_uses_the_longer_wait():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    samples = make_speech_like_audio()
+    silence = np.zeros(SAMPLE_RATE, dtype=np.int16)
+
+    speech_flags(vad, silence)
+    assert not vad.has_heard_speech
+    assert not vad.has_ended(max_silence_seconds=0.5, max_wait_seconds=5.0)
+    assert vad.has_ended(max_silence_seconds=0.5, max_wait_seconds=0.9)
+
+    speech_flags(vad, samples)
+    assert vad.has_heard_speech
+    assert vad.has_ended(max_silence_seconds=0.5, max_wait_seconds=5.0)
+
+
+def test_ignores_quiet_noise():
+    rng = np.random.default_rng(1)
+    noise = (rng.normal(0, 0.002, SAMPLE_RATE * 2) * 32767).astype(np.int16)
+
+    assert not any(speech_flags(VoiceActivityDetector(SAMPLE_RATE), noise))
+
+
+def test_noise_floor_learns_a_step_up_in_background_noise():
+    rng = np.random.default_rng(2)
+    quiet = (rng.normal(0, 0.002, SAMPLE_RATE) * 32767).astype(np.int16)
+    loud = (rng.normal(0, 0.05, SAMPLE_RATE * 10) * 32767).astype(np.int16)
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+
+    speech_flags(vad, quiet)
+    flags = speech_flags(vad, loud)
+
+    # a fan switching on reads as speech at first, but not for long
+    assert flags[0]
+    assert not any(flags[-20:])
+
+
+def test_reset_forgets_the_noise_floor():
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+    speech_flags(vad, make_speech_like_audio())
+    vad.reset()
+
+    assert vad.noise_floor is None
+    assert not vad.is_speaking
+    assert vad.trailing_silence_seconds == 0
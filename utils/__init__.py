@@ -3,6 +3,42 @@ from .env_utils import (
     get_environment_variable,
     is_development,
     is_loud_env,
+    get_whisper_model_size,
+    get_whisper_device,
+    should_preload_whisper,
+    is_streaming_stt_enabled,
+    is_streaming_response_enabled,
+    is_pcm_playback_enabled,
+    get_tts_sample_rate,
+    is_tts_cache_enabled,
+    get_tts_cache_dir,
+    get_tts_cache_memory_mb,
+    should_presynthesize_phrases,
+    is_long_term_memory_enabled,
+    get_memory_dir,
+    get_retrieval_embedder,
+    is_async_pipeline_enabled,
+    get_max_silence_seconds,
+    get_max_wait_for_speech_seconds,
+    get_frontend_kind,
+    get_headless_trigger,
+    get_trigger_port,
+    get_server_host,
+    get_server_port,
+    get_server_max_sessions,
+    get_server_secret,
+    get_metrics_export,
+    get_metrics_path,
+    get_stt_policy_mode,
+    get_stt_timeout,
+    get_local_stt_max_seconds,
+    get_whisper_stt_model_size,
+    is_whisper_fp16_enabled,
+    get_whisper_workers,
+    is_barge_in_enabled,
+    is_llm_speculation_enabled,
+    get_stt_upload_format,
+    is_stt_silence_trimming_enabled,
 )
 
 __all__ = [
@@ -10,4 +46,40 @@ __all__ = [
     "get_environment_variable",
     "is_development",
     "is_loud_env",
+    "get_whisper_model_size",
+    "get_whisper_device",
+    "should_preload_whisper",
+    "is_streaming_stt_enabled",
+    "is_streaming_response_enabled",
+    "is_pcm_playback_enabled",
+    "get_tts_sample_rate",
+    "is_tts_cache_enabled",
+    "get_tts_cache_dir",
+    "get_tts_cache_memory_mb",
+    "should_presynthesize_phrases",
+    "is_long_term_memory_enabled",
+    "get_memory_dir",
+    "get_retrieval_embedder",
+    "is_async_pipeline_enabled",
+    "get_max_silence_seconds",
+    "get_max_wait_for_speech_seconds",
+    "get_frontend_kind",
+    "get_headless_trigger",
+    "get_trigger_port",
+    "get_server_host",
+    "get_server_port",
+    "get_server_max_sessions",
+    "get_server_secret",
+    "get_metrics_export",
+    "get_metrics_path",
+    "get_stt_policy_mode",
+    "get_stt_timeout",
+    "get_local_stt_max_seconds",
+    "get_whisper_stt_model_size",
+    "is_whisper_fp16_enabled",
+    "get_whisper_workers",
+    "is_barge_in_enabled",
+    "is_llm_speculation_enabled",
+    "get_stt_upload_format",
+    "is_stt_silence_trimming_enabled",
 ]
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv, dotenv_values
 from typing import Optional, Dict
+from functools import lru_cache
 import os
 
 MUST_HAVE_ENV_VARS = [
@@ -50,10 +51,16 @@ def get_environment_variable(var_name: str) -> Optional[str]:
     if value:
         return value
 
-    env = dotenv_values()
+    env = _cached_dotenv_values()
     return env.get(var_name, None)
 
 
+@lru_cache(maxsize=1)
+def _cached_dotenv_values() -> Dict[str, str | None]:
+    """Parse the .env file once instead of on every lookup."""
+    return dotenv_values()
+
+
 def is_development() -> bool:
     """Check if we're running in development mode."""
     return get_environment_variable("ENVIRONMENT") == "development"
@@ -62,3 +69,185 @@ def is_development() -> bool:
 def is_loud_env() -> bool:
     """Check if we're running in a loud environment."""
     return get_environment_variable("LOUD_ENV") == "true"
+
+
+def get_whisper_model_size() -> str:
+    """Get the Whisper model size used for local transcription."""
+    return get_environment_variable("WHISPER_MODEL_SIZE") or "tiny"
+
+
+def get_whisper_device() -> Optional[str]:
+    """Get the device Whisper should run on (e.g. "cpu", "cuda"), None for auto."""
+    return get_environment_variable("WHISPER_DEVICE") or None
+
+
+def should_preload_whisper() -> bool:
+    """Check if the Whisper model should be loaded and warmed up at startup."""
+    return get_environment_variable("WHISPER_PRELOAD") == "true"
+
+
+def is_streaming_stt_enabled() -> bool:
+    """Check if commands should be transcribed while they are being recorded."""
+    return get_environment_variable("STT_STREAMING") == "true"
+
+
+def is_streaming_response_enabled() -> bool:
+    """Check if responses should be spoken sentence by sentence while generating."""
+    return get_environment_variable("STREAMING_RESPONSE") == "true"
+
+
+def is_pcm_playback_enabled() -> bool:
+    """Check if TTS should be streamed as raw PCM straight to the output device."""
+    return get_environment_variable("TTS_PCM_PLAYBACK") == "true"
+
+
+def get_tts_sample_rate() -> Optional[int]:
+    """Get the PCM sample rate to request from TTS, None to match the output device."""
+    value = get_environment_variable("TTS_SAMPLE_RATE")
+    return int(value) if value else None
+
+
+def is_tts_cache_enabled() -> bool:
+    """Check if synthesized audio should be cached and reused."""
+    return get_environment_variable("TTS_CACHE") == "true"
+
+
+def get_tts_cache_dir() -> str:
+    """Get the directory cached audio spills to once it falls out of memory."""
+    return get_environment_variable("TTS_CACHE_DIR") or ".tts_cache"
+
+
+def get_tts_cache_memory_mb() -> int:
+    """Get the in-memory size limit of the audio cache in megabytes."""
+    return int(get_environment_variable("TTS_CACHE_MEMORY_MB") or 16)
+
+
+def should_presynthesize_phrases() -> bool:
+    """Check if stock phrases should be synthesized into the cache at startup."""
+    return get_environment_variable("TTS_PRESYNTHESIZE") == "true"
+
+
+def is_long_term_memory_enabled() -> bool:
+    """Check if past conversations should be stored and retrieved into prompts."""
+    return get_environment_variable("LONG_TERM_MEMORY") == "true"
+
+
+def get_memory_dir() -> str:
+    """Get the directory long-term memory stores are kept in."""
+    return get_environment_variable("MEMORY_DIR") or ".memory"
+
+
+def get_retrieval_embedder() -> str:
+    """Get which embedder long-term memory uses: "gemini" or "hashing" (local)."""
+    return get_environment_variable("RETRIEVAL_EMBEDDER") or "gemini"
+
+
+def is_async_pipeline_enabled() -> bool:
+    """Check if the assistant should run on the asyncio pipeline."""
+    return get_environment_variable("ASYNC_PIPELINE") == "true"
+
+
+def get_max_silence_seconds() -> float:
+    """Get how long the speaker must be silent before a recording ends."""
+    return float(get_environment_variable("MAX_SILENCE_SECONDS") or 0.8)
+
+
+def get_max_wait_for_speech_seconds() -> float:
+    """Get how long a recording waits for the speaker to start before it ends."""
+    return float(get_environment_variable("MAX_WAIT_FOR_SPEECH_SECONDS") or 5.0)
+
+
+def get_frontend_kind() -> str:
+    """Get the frontend to run with: "tk" (GUI window), "headless" or "none"."""
+    return get_environment_variable("FRONTEND") or "tk"
+
+
+def get_headless_trigger() -> str:
+    """Get what starts a recording in headless mode: "stdin", "socket" or "wake_word"."""
+    return get_environment_variable("HEADLESS_TRIGGER") or "stdin"
+
+
+def get_trigger_port() -> int:
+    """Get the localhost port the headless socket trigger listens on."""
+    return int(get_environment_variable("TRIGGER_PORT") or 8765)
+
+
+def get_server_host() -> str:
+    """Get the address server mode listens on."""
+    return get_environment_variable("SERVER_HOST") or "127.0.0.1"
+
+
+def get_server_port() -> int:
+    """Get the port server mode listens on."""
+    return int(get_environment_variable("SERVER_PORT") or 8780)
+
+
+def get_server_max_sessions() -> int:
+    """Get how many devices server mode serves at once."""
+    return int(get_environment_variable("SERVER_MAX_SESSIONS") or 64)
+
+
+def get_server_secret() -> Optional[str]:
+    """Get the secret device tokens for server mode are derived from, if set."""
+    return get_environment_variable("SERVER_SECRET") or None
+
+
+def get_metrics_export() -> Optional[str]:
+    """Get where per-turn timings are exported: "prometheus" (text file), "jsonl", or None."""
+    return get_environment_variable("METRICS_EXPORT") or None
+
+
+def get_metrics_path() -> str:
+    """Get the file metrics are exported to."""
+    default_path = "traces.jsonl" if get_metrics_export() == "jsonl" else "metrics.prom"
+    return get_environment_variable("METRICS_PATH") or default_path
+
+
+def get_stt_policy_mode() -> str:
+    """Get how commands are transcribed: local_only, cloud_only, local_first, cloud_first or race."""
+    return get_environment_variable("STT_POLICY") or "cloud_first"
+
+
+def get_stt_timeout() -> float:
+    """Get how long one STT provider gets before falling back to the other."""
+    return float(get_environment_variable("STT_TIMEOUT") or 10.0)
+
+
+def get_local_stt_max_seconds() -> float:
+    """Get the length up to which commands go to local STT first, even with cloud_first (0 = off)."""
+    return float(get_environment_variable("STT_LOCAL_MAX_SECONDS") or 0.0)
+
+
+def get_whisper_stt_model_size() -> str:
+    """Get the Whisper model used to transcribe commands locally."""
+    return get_environment_variable("WHISPER_STT_MODEL_SIZE") or "base"
+
+
+def is_whisper_fp16_enabled() -> bool:
+    """Check if local command transcription should run in half precision (GPU only)."""
+    return get_environment_variable("WHISPER_FP16") == "true"
+
+
+def get_whisper_workers() -> int:
+    """Get how many worker processes each Whisper model runs in."""
+    return int(get_environment_variable("WHISPER_WORKERS") or 1)
+
+
+def is_barge_in_enabled() -> bool:
+    """Check if talking over the assistant should interrupt it."""
+    return get_environment_variable("BARGE_IN") == "true"
+
+
+def is_llm_speculation_enabled() -> bool:
+    """Check if the LLM should start on the interim transcript before recording ends."""
+    return get_environment_variable("LLM_SPECULATION") == "true"
+
+
+def get_stt_upload_format() -> str:
+    """Get how commands are encoded for cloud STT: wav, flac or ogg_opus."""
+    return (get_environment_variable("STT_UPLOAD_FORMAT") or "wav").lower()
+
+
+def is_stt_silence_trimming_enabled() -> bool:
+    """Check if silence before and after the speech should be left out of STT uploads."""
+    return get_environment_variable("STT_TRIM_SILENCE") == "true"